@@ -0,0 +1,334 @@
+import asyncio
+import random
+import threading
+import time
+import uuid
+import aiohttp
+import config
+from datetime import datetime
+from typing import Dict, List, Tuple
+from broker_client import AbstractBroker
+from contracts import OptionContract
+
+# Responses worth retrying: rate limited, or the server failed (the request may not have been applied)
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class AlpacaError(Exception):
+    def __init__(self, status: int, body):
+        message = body.get("message") if isinstance(body, dict) else body
+        super().__init__(f"Alpaca API error {status}: {message}")
+        self.status = status
+        self.body = body
+
+
+class AlpacaClient:
+    """
+    Async client for the Alpaca trading REST API on one pooled keep-alive
+    session. Retries connection errors, timeouts, 429 and 5xx with exponential
+    backoff and jitter, and reads the X-RateLimit-* headers so it waits for the
+    window to reset instead of spending requests on 429s.
+    Must be used from a single event loop.
+    """
+
+    def __init__(self, base_url: str = config.ALPACA_BASE_URL, key_id: str = config.ALPACA_KEY_ID,
+                 secret_key: str = config.ALPACA_SECRET_KEY, max_connections: int = config.ALPACA_MAX_CONNECTIONS,
+                 timeout: float = config.ALPACA_TIMEOUT_SECONDS, max_retries: int = config.ALPACA_MAX_RETRIES,
+                 backoff: float = config.ALPACA_BACKOFF_SECONDS):
+        self.base_url = base_url.rstrip("/")
+        self.headers = {"APCA-API-KEY-ID": key_id, "APCA-API-SECRET-KEY": secret_key}
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limit = None # requests per window, once the server has said
+        self.rate_limit_remaining = None
+        self.rate_limit_reset = 0.0 # epoch seconds when the current window ends
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0}
+        self._session = None
+        self._probe = None # held by the first request, so the rest learn the rate limit before firing
+        self._probed = False
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(headers=self.headers, connector=connector,
+                                                  timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _read_rate_limit(self, headers):
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        if "X-RateLimit-Limit" in headers:
+            self.rate_limit = int(headers["X-RateLimit-Limit"])
+        remaining = int(headers["X-RateLimit-Remaining"])
+        reset = float(headers.get("X-RateLimit-Reset", 0))
+        if reset == self.rate_limit_reset and self.rate_limit_remaining is not None:
+            # same window: requests reserved since this one was sent are not in the header yet
+            remaining = min(remaining, self.rate_limit_remaining)
+        self.rate_limit_remaining, self.rate_limit_reset = remaining, reset
+
+    async def _wait_for_rate_limit(self):
+        """
+        Waits for the window to reset once the budget is spent, then reserves one
+        request of it, so concurrent requests queue here instead of drawing 429s.
+        """
+        while self.rate_limit_remaining is not None and self.rate_limit_remaining <= 0:
+            delay = self.rate_limit_reset - time.time()
+            if delay <= 0:
+                self.rate_limit_remaining = self.rate_limit # new window: the full budget, if known
+                self.rate_limit_reset = time.time() + 1.0 # provisional until a response gives the real reset
+                break
+            await asyncio.sleep(delay)
+        if self.rate_limit_remaining is not None:
+            self.rate_limit_remaining -= 1
+
+    def _retry_delay(self, attempt: int, headers=None) -> float:
+        if headers is not None and "Retry-After" in headers:
+            return float(headers["Retry-After"])
+        return self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+
+    async def request(self, method: str, path: str, **kwargs):
+        """
+        JSON body of the response (None if empty). Raises AlpacaError on a
+        non-retryable error or once the retries are used up.
+        """
+        if not self._probed:
+            self._probe = self._probe or asyncio.Lock()
+            async with self._probe:
+                if not self._probed:
+                    try:
+                        return await self._request(method, path, **kwargs)
+                    finally:
+                        self._probed = True
+        return await self._request(method, path, **kwargs)
+
+    async def _request(self, method: str, path: str, **kwargs):
+        session = self._get_session()
+        for attempt in range(self.max_retries + 1):
+            await self._wait_for_rate_limit()
+            self.stats["requests"] += 1
+            try:
+                async with session.request(method, self.base_url + path, **kwargs) as resp:
+                    self._read_rate_limit(resp.headers)
+                    body = await resp.json(content_type=None) if resp.status != 204 else None
+                    if resp.status < 400:
+                        return body
+                    error = AlpacaError(resp.status, body)
+                    if resp.status not in _RETRY_STATUS:
+                        raise error
+                    if resp.status == 429:
+                        self.stats["rate_limited"] += 1
+                    # a 429 with rate limit headers waits for the reset in _wait_for_rate_limit instead
+                    delay = 0 if resp.status == 429 and self.rate_limit_remaining == 0 else self._retry_delay(attempt, resp.headers)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = AlpacaError(0, str(e) or type(e).__name__)
+                delay = self._retry_delay(attempt)
+            if attempt == self.max_retries:
+                raise error
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+    async def get_account(self) -> dict:
+        return await self.request("GET", "/v2/account")
+
+    async def get_positions(self) -> List[dict]:
+        return await self.request("GET", "/v2/positions")
+
+    async def snapshot(self) -> Tuple[dict, List[dict]]:
+        """
+        Account and positions fetched concurrently: one round trip of latency.
+        """
+        return tuple(await asyncio.gather(self.get_account(), self.get_positions()))
+
+    async def submit_order(self, order: dict) -> dict:
+        """
+        Submits one order. The client_order_id makes retries safe: if an earlier
+        attempt did reach the server, the duplicate is rejected and the original
+        order is returned instead of placing a second one.
+        """
+        order = dict(order, client_order_id=order.get("client_order_id") or uuid.uuid4().hex)
+        try:
+            return await self.request("POST", "/v2/orders", json=order)
+        except AlpacaError as e:
+            if e.status != 422 or "client_order_id" not in str(e):
+                raise
+            return await self.request("GET", "/v2/orders:by_client_order_id",
+                                      params={"client_order_id": order["client_order_id"]})
+
+    async def submit_orders(self, orders: List[dict]) -> List[object]:
+        """
+        Submits a batch concurrently over the pooled connections (the API has no
+        batch endpoint). Returns one order dict or AlpacaError per order, in order.
+        """
+        return await asyncio.gather(*(self.submit_order(o) for o in orders), return_exceptions=True)
+
+
+class AlpacaBroker(AbstractBroker):
+    """
+    AbstractBroker on the Alpaca trading API. The AlpacaClient runs on a private
+    event loop thread, so the blocking methods below can be called from plain
+    code, and coroutines can be handed to the same loop with submit().
+
+    Option contracts are sent as OCC symbols. Alpaca keeps no stop loss or take
+    profit for option positions, so they are remembered here per position;
+    positions this broker did not open report them as None.
+    """
+
+    def __init__(self, client: AlpacaClient = None):
+        self.client = client or AlpacaClient()
+        self.trade_history = []
+        self._exits = {} # OCC symbol -> (stop_loss, take_profit, entry_time)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="alpaca-broker", daemon=True)
+        self._thread.start()
+
+    def submit(self, coro):
+        """
+        Schedules a coroutine on the broker's loop; returns a concurrent.futures.Future.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def run(self, coro):
+        return self.submit(coro).result()
+
+    def close(self):
+        self.run(self.client.close())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+    def get_account_balance(self) -> float:
+        return float(self.run(self.client.get_account())["equity"])
+
+    def get_buying_power(self) -> float:
+        """
+        Options buying power (long options are paid for in full), or buying_power on accounts without it.
+        """
+        return self._buying_power(self.run(self.client.get_account()))
+
+    @staticmethod
+    def _buying_power(account: dict) -> float:
+        return float(account.get("options_buying_power") or account["buying_power"])
+
+    def get_positions(self) -> List[Dict]:
+        return [self._position(p) for p in self.run(self.client.get_positions())]
+
+    def snapshot(self) -> Tuple[float, float, List[Dict]]:
+        """
+        (equity, buying power, positions) in one round trip.
+        """
+        account, positions = self.run(self.client.snapshot())
+        return float(account["equity"]), self._buying_power(account), [self._position(p) for p in positions]
+
+    def _position(self, p: dict) -> Dict:
+        symbol = p["symbol"]
+        try:
+            contract = OptionContract.from_occ(symbol)
+        except ValueError:
+            contract = None # not an option
+        stop_loss, take_profit, entry_time = self._exits.get(symbol, (None, None, None))
+        return {
+            "id": symbol,
+            "symbol": symbol,
+            "quantity": int(float(p["qty"])),
+            "entry_price": float(p["avg_entry_price"]),
+            "current_price": float(p["current_price"]) if p.get("current_price") is not None else None,
+            "entry_time": entry_time,
+            "stop_loss": stop_loss,
+            "take_profit": take_profit,
+            "contract": contract,
+        }
+
+    @staticmethod
+    def _order_request(symbol: str, quantity: int, side: str, order_type: str, price: float, contract=None) -> dict:
+        order = {"symbol": contract.occ_symbol if contract is not None else symbol, "qty": str(quantity),
+                 "side": side, "type": order_type, "time_in_force": "day"}
+        if order_type == "limit":
+            order["limit_price"] = f"{price:.2f}"
+        return order
+
+    def place_order(self, symbol: str, quantity: int, side: str, order_type: str = "market", price: float = 0.0, **kwargs) -> Dict:
+        """
+        Same arguments as PaperBroker.place_order. Returns the position-style
+        record of the order ({} if it was rejected).
+        """
+        return self.place_orders([dict(kwargs, symbol=symbol, quantity=quantity, side=side,
+                                       order_type=order_type, price=price)])[0]
+
+    def place_orders(self, orders: List[Dict]) -> List[Dict]:
+        """
+        Batch of place_order keyword dicts, submitted concurrently in one call.
+        """
+        requests = [self._order_request(o["symbol"], o["quantity"], o["side"], o.get("order_type", "market"),
+                                        o.get("price", 0.0), o.get("contract")) for o in orders]
+        results = self.run(self.client.submit_orders(requests))
+        records = []
+        for o, request, result in zip(orders, requests, results):
+            if isinstance(result, Exception):
+                print(f"FAILED ORDER: {request['side']} {request['qty']} x {request['symbol']}: {result}")
+                records.append({})
+                continue
+            symbol = request["symbol"]
+            fill = result.get("filled_avg_price")
+            if o["side"] == "buy":
+                self._exits[symbol] = (o.get("stop_loss", 0), o.get("take_profit", 0), o.get("time", datetime.now()))
+            records.append({
+                "id": symbol,
+                "order_id": result.get("id"),
+                "status": result.get("status"),
+                "symbol": symbol,
+                "quantity": o["quantity"],
+                "entry_price": float(fill) if fill is not None else o.get("price", 0.0),
+                "entry_time": o.get("time", datetime.now()),
+                "stop_loss": o.get("stop_loss", 0),
+                "take_profit": o.get("take_profit", 0),
+                "contract": o.get("contract"),
+            })
+        return records
+
+    def close_position(self, position_id: str, price: float = None, time: datetime = None, position: Dict = None) -> Dict:
+        """
+        Sells the whole position at market (an order with a client_order_id, so
+        a retry cannot sell twice). The trade record uses the fill price if the
+        order filled at once, else `price` (the caller's mark). `position`, the
+        record from a get_positions()/snapshot() just made, saves fetching it again.
+        """
+        pos = position if position is not None else {p["id"]: p for p in self.get_positions()}.get(position_id)
+        if pos is None:
+            print(f"Error: Position {position_id} not found.")
+            return {}
+        try:
+            order = self.run(self.client.submit_order(
+                self._order_request(position_id, pos["quantity"], "sell", "market", 0.0)))
+        except AlpacaError as e:
+            print(f"FAILED CLOSE: {position_id}: {e}")
+            return {}
+
+        fill = (order or {}).get("filled_avg_price")
+        exit_price = float(fill) if fill is not None else (price if price is not None else pos["current_price"])
+        quantity, entry_price = pos["quantity"], pos["entry_price"]
+        contract = pos["contract"]
+        entry_time = pos["entry_time"] or time or datetime.now()
+        trade_record = {
+            "symbol": pos["symbol"],
+            "option_symbol": contract.id if contract else pos["symbol"],
+            "contract": contract,
+            "dte": contract.dte(entry_time) if contract else 0,
+            "stop_loss": pos["stop_loss"] or 0.0,
+            "take_profit": pos["take_profit"] or 0.0,
+            "entry_time": entry_time,
+            "exit_time": time or datetime.now(),
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "quantity": quantity,
+            "pnl": quantity * (exit_price - entry_price),
+            "pnl_percent": (exit_price - entry_price) / entry_price if entry_price else 0.0,
+        }
+        self._exits.pop(position_id, None)
+        self.trade_history.append(trade_record)
+        return trade_record
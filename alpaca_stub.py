@@ -0,0 +1,142 @@
+import asyncio
+import math
+import random
+import time
+import uuid
+import config
+from aiohttp import web
+from typing import Dict, Optional
+
+
+class AlpacaStubServer:
+    """
+    In-process stand-in for the Alpaca trading REST endpoints AlpacaClient uses
+    (account, positions, orders, order by client id), so the
+    broker can be exercised offline.
+
+    Orders fill at once: at limit_price, else at `prices[symbol]` (default 1.00).
+    Latency, random 5xx failures (before the request is handled, or after it,
+    like a response lost on the way back), and a per-window rate limit (429 with
+    X-RateLimit-* headers, like the real API) can be injected; `requests` and
+    `max_in_flight` record what the server saw.
+    """
+
+    def __init__(self, cash: float = config.INITIAL_BALANCE, latency: float = 0.0, failure_rate: float = 0.0,
+                 lost_response_rate: float = 0.0, rate_limit: Optional[int] = None, rate_window: float = 60.0,
+                 prices: Dict[str, float] = None, seed: Optional[int] = None):
+        self.cash = cash
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.lost_response_rate = lost_response_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.prices = dict(prices or {})
+        self.rng = random.Random(seed)
+        self.positions = {} # symbol -> {"qty", "avg_entry_price"}
+        self.orders = {} # client_order_id -> order
+        self.requests = 0
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._window_start = time.time()
+        self._window_count = 0
+        self._runner = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Serves on the running event loop; returns the base URL (a free port by default).
+        """
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_get("/v2/account", self._account)
+        app.router.add_get("/v2/positions", self._positions)
+        app.router.add_post("/v2/orders", self._submit_order)
+        app.router.add_get("/v2/orders:by_client_order_id", self._order_by_client_id)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.requests += 1
+        self._in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self._in_flight)
+        try:
+            now = time.time()
+            if now - self._window_start >= self.rate_window:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            headers = {}
+            if self.rate_limit is not None:
+                headers = {"X-RateLimit-Limit": str(self.rate_limit),
+                           "X-RateLimit-Remaining": str(max(0, self.rate_limit - self._window_count)),
+                           "X-RateLimit-Reset": str(math.ceil(self._window_start + self.rate_window))}
+                if self._window_count > self.rate_limit:
+                    return web.json_response({"message": "rate limit exceeded"}, status=429, headers=headers)
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self.failure_rate and self.rng.random() < self.failure_rate:
+                return web.json_response({"message": "service unavailable"}, status=503, headers=headers)
+            response = await handler(request)
+            if self.lost_response_rate and self.rng.random() < self.lost_response_rate:
+                return web.json_response({"message": "bad gateway"}, status=502, headers=headers)
+            response.headers.update(headers)
+            return response
+        finally:
+            self._in_flight -= 1
+
+    def _market_value(self) -> float:
+        return sum(p["qty"] * self.prices.get(s, p["avg_entry_price"]) for s, p in self.positions.items())
+
+    async def _account(self, request):
+        return web.json_response({"cash": str(self.cash), "equity": str(self.cash + self._market_value()),
+                                  "buying_power": str(self.cash), "options_buying_power": str(self.cash),
+                                  "status": "ACTIVE"})
+
+    async def _positions(self, request):
+        return web.json_response([
+            {"symbol": s, "qty": str(p["qty"]), "avg_entry_price": str(p["avg_entry_price"]),
+             "current_price": str(self.prices.get(s, p["avg_entry_price"]))}
+            for s, p in self.positions.items()])
+
+    def _fill(self, symbol: str, qty: int, side: str, price: float, client_order_id: str) -> dict:
+        if side == "buy":
+            pos = self.positions.setdefault(symbol, {"qty": 0, "avg_entry_price": price})
+            pos["avg_entry_price"] = (pos["qty"] * pos["avg_entry_price"] + qty * price) / (pos["qty"] + qty)
+            pos["qty"] += qty
+            self.cash -= qty * price
+        else:
+            pos = self.positions[symbol]
+            pos["qty"] -= qty
+            self.cash += qty * price
+            if pos["qty"] <= 0:
+                del self.positions[symbol]
+        order = {"id": uuid.uuid4().hex, "client_order_id": client_order_id, "symbol": symbol, "qty": str(qty),
+                 "side": side, "status": "filled", "filled_qty": str(qty), "filled_avg_price": str(price)}
+        self.orders[client_order_id] = order
+        return order
+
+    async def _submit_order(self, request):
+        body = await request.json()
+        client_order_id = body.get("client_order_id") or uuid.uuid4().hex
+        if client_order_id in self.orders:
+            return web.json_response({"message": "client_order_id must be unique"}, status=422)
+        symbol, qty, side = body["symbol"], int(body["qty"]), body["side"]
+        price = float(body["limit_price"]) if body.get("limit_price") else self.prices.get(symbol, 1.0)
+        if side == "buy" and qty * price > self.cash:
+            return web.json_response({"message": "insufficient buying power"}, status=403)
+        if side == "sell" and self.positions.get(symbol, {}).get("qty", 0) < qty:
+            return web.json_response({"message": "insufficient qty available for order"}, status=403)
+        return web.json_response(self._fill(symbol, qty, side, price, client_order_id))
+
+    async def _order_by_client_id(self, request):
+        order = self.orders.get(request.query.get("client_order_id"))
+        if order is None:
+            return web.json_response({"message": "order not found"}, status=404)
+        return web.json_response(order)
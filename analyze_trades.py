@@ -1,5 +1,6 @@
 import pandas as pd
 import config
+from contracts import parse_contract_ids
 
 file_path = config.JOURNAL_DIR / "trades.csv"
 output_path = config.JOURNAL_DIR / "trades_18_50_analysis.csv"
@@ -42,8 +43,11 @@ try:
         # Correlation with "Price" (if high priced options did better?)
         # Correlation with Direction
         
-        long_calls = subset[subset['option_symbol'].str.contains("_C_")]
-        long_puts = subset[subset['option_symbol'].str.contains("_P_")]
+        # Older journal rows left option_symbol as N/A and kept the id in symbol
+        ids = subset['option_symbol'].where(subset['option_symbol'] != "N/A", subset['symbol'])
+        rights = parse_contract_ids(ids)['right']
+        long_calls = subset[rights == 1]
+        long_puts = subset[rights == -1]
         
         print(f"\nCall PnL: ${long_calls['pnl'].sum():,.2f} ({len(long_calls)} trades)")
         print(f"Put PnL: ${long_puts['pnl'].sum():,.2f} ({len(long_puts)} trades)")
@@ -4,167 +4,307 @@ import random
 import config
 from data_loader import DataManager
 from features import FeatureEngineer
+from feature_cache import FeatureCache
+from walk_forward import load_oos_signals
 from models import SymbolModel
 from broker_client import PaperBroker
-from datetime import timedelta
+from option_chain import CALL, PUT
+from pricing import NS_PER_DAY, option_prices
+
+NS_PER_MINUTE = 60_000_000_000
+
+# Risk settings a Backtester can override per instance (defaults come from config)
+RISK_PARAMS = [
+    "MIN_STOP_LOSS_PERCENT",
+    "MAX_STOP_LOSS_PERCENT",
+    "MIN_TAKE_PROFIT_PERCENT",
+    "MAX_TAKE_PROFIT_PERCENT",
+    "MIN_RISK_PERCENT",
+    "MAX_TRADES_PER_DAY",
+]
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    """
+    Largest peak-to-trough drop of an equity curve, as a fraction of the peak.
+    """
+    if len(equity) == 0:
+        return 0.0
+    peak = np.maximum.accumulate(equity)
+    drawdown = 1 - np.divide(equity, peak, out=np.ones_like(equity), where=peak > 0)
+    return float(drawdown.max())
+
+
+def trading_window_mask(ts_ns: np.ndarray) -> np.ndarray:
+    """
+    True for bars whose wall-clock time of day falls inside any of config.TRADING_WINDOWS (inclusive).
+    """
+    time_of_day = ts_ns % NS_PER_DAY
+    mask = np.zeros(len(ts_ns), dtype=bool)
+    for window in config.TRADING_WINDOWS:
+        start_h, start_m = window["start"]
+        end_h, end_m = window["end"]
+        start_ns = (start_h * 60 + start_m) * NS_PER_MINUTE
+        end_ns = (end_h * 60 + end_m) * NS_PER_MINUTE
+        mask |= (time_of_day >= start_ns) & (time_of_day <= end_ns)
+    return mask
+
+
+class BacktestInputs:
+    """
+    Per-bar NumPy arrays the backtest event loop runs on.
+    Built once from prices, features and predictions; never mutated by a run,
+    so one instance can be shared by many Backtester runs.
+    """
+    
+    def __init__(self, symbol: str, index: pd.DatetimeIndex, close: np.ndarray, signal: np.ndarray, vol: np.ndarray):
+        self.symbol = symbol
+        self.index = index # only used to timestamp orders and trades
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        self.signal = np.ascontiguousarray(signal, dtype=np.int8) # 1=Bull, -1=Bear, 0=Neutral
+        self.vol = np.ascontiguousarray(vol, dtype=np.float64)
+        
+        # Wall-clock int64 ns (tz dropped, matching how expiries are compared)
+        ts = index.tz_localize(None) if index.tz is not None else index
+        self.ts_ns = ts.values.astype('datetime64[ns]').view('int64')
+        
+        # Day boundaries for the MAX_TRADES_PER_DAY reset
+        self.day_id = self.ts_ns // NS_PER_DAY
+        self.new_day = np.r_[True, self.day_id[1:] != self.day_id[:-1]]
+        
+        # Monday=0, Sunday=6 (1970-01-01 was a Thursday)
+        weekday = (self.day_id + 3) % 7
+        self.tradable = weekday < 5
+        self.entry_mask = self.tradable & trading_window_mask(self.ts_ns)
+
+    def __len__(self) -> int:
+        return len(self.close)
+
 
 class Backtester:
     """
     Backtesting engine integrating Data, Model, and Broker.
     """
     
-    def __init__(self, symbol: str):
+    def __init__(self, symbol: str, seed: int = None, risk: dict = None, verbose: bool = True,
+                 broker: PaperBroker = None, rng: random.Random = None, signal_source: str = None):
         self.symbol = symbol
+        self.verbose = verbose
+        # "model" (saved models) or "walk_forward" (persisted out-of-sample predictions)
+        self.signal_source = signal_source or config.BACKTEST_SIGNAL_SOURCE
+        
+        # Risk settings: config defaults, optionally overridden (e.g. by a parameter sweep)
+        unknown = set(risk or {}) - set(RISK_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown risk settings: {sorted(unknown)}")
+        self.risk = {name: getattr(config, name) for name in RISK_PARAMS}
+        self.risk.update(risk or {})
+
         self.dm = DataManager()
         self.fe = FeatureEngineer()
-        self.broker = PaperBroker(initial_balance=config.INITIAL_BALANCE)
+        # A portfolio backtest passes one broker (and RNG) shared by every symbol
+        self.broker = broker if broker is not None else PaperBroker(initial_balance=config.INITIAL_BALANCE)
         self.model = SymbolModel(symbol)
         self.journal = []
         self.trades_today = 0
         self.current_day = None
+        # Seeded runs draw SL/TP from their own stream; unseeded runs share the global one
+        self.rng = rng or (random.Random(seed) if seed is not None else random)
+        # Ids of this symbol's open positions in the broker
+        self.position_ids = []
+        # Per-position option price path: position_id -> (entry bar, prices from entry bar to expiry)
+        self.marks = {}
 
     def run(self):
         print(f"Starting backtest for {self.symbol}...")
         
+        inputs = self.prepare()
+        if inputs is None:
+            return []
+        return self.simulate(inputs)
+
+    def prepare(self) -> BacktestInputs:
+        """
+        Loads data, computes features and predictions, and packs them into BacktestInputs.
+        Returns None if there is no data or no trained model.
+        """
         # 1. Load Data
         df = self.dm.fetch_data(self.symbol)
         if df.empty:
             print("No data.")
-            return []
+            return None
 
-        # 2. Prepare Features
-        df = self.fe.compute_features(df)
+        # 2. Prepare Features (float32 matrix + validity mask, cached per unique bars)
+        fm = FeatureCache().get(df)
+        valid = fm.valid
+        if not valid.any():
+            print("Not enough bars to compute features.")
+            return None
         
         # 3. Predict across history (in a real backtest, we'd do this bar-by-bar to avoid lookahead on features if any)
         # Assuming features are properly lagged.
         
-        feature_cols = [c for c in df.columns if c not in ['Open', 'High', 'Low', 'Close', 'Volume', 'target', 'future_ret']]
-        X = df[feature_cols]
+        index = fm.index[valid]
+        close = fm.close[valid]
         
-        # Ensure model is ready
-        self.model.load()
-        if not self.model.models:
-             print("Model not trained or no horizons found. Please run training first.")
-             return []
+        if self.signal_source == "walk_forward":
+            # Out-of-sample predictions from walk_forward.py: no bar is scored by a model that saw it
+            preds = load_oos_signals(self.symbol, index, horizon=1)
+            if preds is None:
+                print("No walk-forward predictions found. Please run walk-forward first.")
+                return None
+        else:
+            # Ensure model is ready
+            self.model.load()
+            if not self.model.models:
+                 print("Model not trained or no horizons found. Please run training first.")
+                 return None
 
-        preds_dict = self.model.predict(X)
-        # probs_dict = self.model.predict_proba(X) # Not used in loop currently
+            preds_dict = self.model.predict_matrix(fm)
+            
+            # Use 1H as primary signal for backtest flow, or combine.
+            # Let's assume user wants to trade if ANY valid signal, or specific?
+            # Defaulting to 1H for this run logic.
+            preds = preds_dict.get(1, np.zeros(len(index)))
         
-        # Use 1H as primary signal for backtest flow, or combine.
-        # Let's assume user wants to trade if ANY valid signal, or specific?
-        # Defaulting to 1H for this run logic.
-        preds = preds_dict.get(1, np.zeros(len(X)))
+        vol = self.fe.compute_volatility(fm.volatility_frame())
+        return BacktestInputs(self.symbol, index, close, preds, vol.to_numpy())
+
+    def simulate(self, inputs: BacktestInputs):
+        """
+        Runs the event loop over precomputed arrays and returns the trade history.
+        """
+        self.bind(inputs)
         
-        df['prediction'] = preds
+        new_day = inputs.new_day
+        tradable = inputs.tradable
+        entry_mask = inputs.entry_mask
+        signal = inputs.signal
+        positions = self.position_ids
         
-        # 4. Loop Bar-by-Bar
-        for i in range(len(df)):
-            # Check for Blow Up
+        # Mark-to-market equity per bar (cash + open contracts at their simulated price)
+        self.equity_curve = np.full(len(inputs), self.broker.cash, dtype=np.float64)
+        equity = self.equity_curve
+        
+        # Loop Bar-by-Bar
+        for i in range(config.LOOKBACK_PERIOD, len(inputs)):
+            # Check for Blow Up (equity: cash plus open positions at their last mark)
             if self.broker.get_account_balance() <= 0:
-                print(f"!!! ACCOUNT BLOWN UP at {df.index[i]} !!! Balance: ${self.broker.get_account_balance():.2f}")
+                if self.verbose:
+                    print(f"!!! ACCOUNT BLOWN UP at {inputs.index[i]} !!! Balance: ${self.broker.get_account_balance():.2f}")
+                equity[i:] = equity[i - 1]
                 break
-
-            if i < config.LOOKBACK_PERIOD: continue
-            
-            row = df.iloc[i]
-            timestamp = row.name
             
             # Day tracking for trade limits
-            if self.current_day != timestamp.date():
-                self.current_day = timestamp.date()
+            if new_day[i] or i == config.LOOKBACK_PERIOD:
                 self.trades_today = 0
             
-            # Monday=0, Sunday=6
-            if timestamp.weekday() >= 5:
-                continue
-
-            # Check Trading Hours
-            is_in_window = False
-            current_time = timestamp.time()
-            from datetime import time
-            
-            for window in config.TRADING_WINDOWS:
-                start_h, start_m = window["start"]
-                end_h, end_m = window["end"]
-                
-                start_time = time(start_h, start_m)
-                end_time = time(end_h, end_m)
-                
-                if start_time <= current_time <= end_time:
-                    is_in_window = True
-                    break
-            
-            if not is_in_window:
-                # We still process exits even outside windows? 
-                # Usually yes, but user said "Trade option from...", implying entry.
-                # Exits are usually allowed anytime market is open, but for simplicity let's allow exits processing
-                # but SKIP ENTRY.
-                self._process_exits(row['Close'], timestamp)
-                continue
-
-            current_price = row['Close']
-            signal = row['prediction'] # 1=Bull, -1=Bear, 0=Neutral
+            # Skip weekends entirely; exits are processed on every market bar, entries only inside trading windows
+            if tradable[i]:
+                if positions:
+                    self._process_exits(i)
+                if entry_mask[i] and signal[i] != 0:
+                    self._process_entry(i)
             
-            self._process_exits(current_price, timestamp)
-            self._process_entry(signal, current_price, timestamp, None)
+            if positions:
+                self.mark(i)
+            equity[i] = self.broker.equity()
 
-        print(f"Backtest complete. Final Balance: ${self.broker.get_account_balance():.2f}")
+        if self.verbose:
+            print(f"Backtest complete. Final Balance: ${self.broker.get_account_balance():.2f}")
         return self.broker.trade_history
 
-    def _process_entry(self, signal, current_price, timestamp, prob=None):
+    def bind(self, inputs: BacktestInputs):
+        """
+        Points the entry/exit logic at a set of inputs without running the loop.
+        """
+        self.inputs = inputs
+        self.ts_ns = inputs.ts_ns
+        self.close = inputs.close
+        self.vol = inputs.vol
+
+    def summary(self) -> dict:
+        """
+        One-row summary of the last simulate() call.
+        """
+        trades = self.broker.trade_history
+        return {
+            "final_balance": self.broker.get_account_balance(),
+            "final_equity": float(self.equity_curve[-1]) if len(self.equity_curve) else self.broker.cash,
+            "trades": len(trades),
+            "win_rate": float(np.mean([t['pnl'] > 0 for t in trades])) if trades else 0.0,
+            "max_drawdown": max_drawdown(self.equity_curve),
+            "blown_up": bool(self.broker.get_account_balance() <= 0),
+        }
+
+    def mark(self, i):
+        """
+        Marks this symbol's open positions to their precomputed price paths at bar i
+        (entry price outside the path) in one broker call.
+        """
+        slots, prices = [], []
+        for position_id in self.position_ids:
+            pos = self.broker.positions[position_id]
+            start, path = self.marks.get(pos['id'], (i, ()))
+            j = i - start
+            slots.append(pos['slot'])
+            prices.append(path[j] if 0 <= j < len(path) else pos['entry_price'])
+        self.broker.mark(slots, prices)
+
+    def _process_entry(self, i) -> bool:
+        """
+        Opens a position on bar i if the signal and limits allow it. Returns True if an order was placed.
+        """
         # Check daily trade limit
-        if self.trades_today >= config.MAX_TRADES_PER_DAY:
-            return
+        if self.trades_today >= self.risk["MAX_TRADES_PER_DAY"]:
+            return False
 
         # Only one position at a time per symbol for simplicity
-        if len(self.broker.get_positions()) > 0:
-            return
+        if self.position_ids:
+            return False
 
+        signal = self.inputs.signal[i]
         if signal == 0:
-            return
+            return False
 
-        # Position Sizing
+        current_price = self.close[i]
+        timestamp = self.inputs.index[i]
+
+        # Position Sizing (on equity, so open positions elsewhere in the account count)
         balance = self.broker.get_account_balance()
-        risk_pct = config.MIN_RISK_PERCENT # Can scale with confidence
+        risk_pct = self.risk["MIN_RISK_PERCENT"] # Can scale with confidence
         position_size_usd = balance * risk_pct
         
         # Select Option
-        option_chain = self.dm.generate_option_chain(self.symbol, current_price, timestamp)
+        option_chain = self.dm.get_option_chain(self.symbol, current_price, timestamp, vol=self.vol[i])
         
         if signal == 1: # Bullish -> Call
-            contract_type = "call"
+            right = CALL
         else: # Bearish -> Put
-            contract_type = "put"
+            right = PUT
             
         # Filter by DTE
-        # Naive selection: First one in list (usually lowest DTE, ATM)
-        candidates = option_chain[
-            (option_chain['type'] == contract_type) & 
-            (abs(option_chain['strike'] - current_price) / current_price < 0.01) # Near Money
-        ]
-        
-        if candidates.empty:
-            # Try wider
-             candidates = option_chain[option_chain['type'] == contract_type]
-        
-        if candidates.empty:
-            return 
+        # Naive selection: First one in list (usually lowest DTE, ATM), else widen to any strike
+        idx = option_chain.select(right, current_price, near_money=0.01)
+        if idx < 0:
+            return False
 
-        contract = candidates.iloc[0]
-        price = contract['price']
+        contract = option_chain.contract(idx)
+        price = option_chain.price_of(idx)
         
-        # Quantity
-        qty = int(position_size_usd / price)
-        if qty < 1: return
+        # Quantity (no more than the cash on hand can pay for)
+        qty = min(int(position_size_usd / price), int(self.broker.cash / price))
+        if qty < 1: return False
         
         # Risk Config
-        sl_pct = random.uniform(config.MIN_STOP_LOSS_PERCENT, config.MAX_STOP_LOSS_PERCENT)
+        sl_pct = self.rng.uniform(self.risk["MIN_STOP_LOSS_PERCENT"], self.risk["MAX_STOP_LOSS_PERCENT"])
         # proper randomization of TP
-        tp_pct = random.uniform(config.MIN_TAKE_PROFIT_PERCENT, config.MAX_TAKE_PROFIT_PERCENT)
+        tp_pct = self.rng.uniform(self.risk["MIN_TAKE_PROFIT_PERCENT"], self.risk["MAX_TAKE_PROFIT_PERCENT"])
         
         # Execute
         order = self.broker.place_order(
-            symbol=contract['id'],
+            symbol=contract.id,
+            contract=contract,
             quantity=qty,
             side='buy',
             price=price,
@@ -173,55 +313,47 @@ class Backtester:
             take_profit=price * (1 + tp_pct)
         )
         
-        if order:
-            self.trades_today += 1
-
-    def _process_exits(self, underlying_price, timestamp):
-        positions = self.broker.get_positions()
-        if not positions:
-             return
-             
-        # Generate current theoretical option prices for SL/TP check
-        chain = self.dm.generate_option_chain(self.symbol, underlying_price, timestamp)
-        
-        for pos in positions:
-            # Check for expiration FIRST
-            expiry_str = pos['symbol'].split('_')[-1]
-            try:
-                expiry_date = pd.to_datetime(expiry_str)
-                # Normalize expiry to EOD
-                expiry_date = expiry_date.replace(hour=16, minute=0, second=0)
-                
-                # Ensure timestamp is comparable
-                curr_ts = timestamp.replace(tzinfo=None) if hasattr(timestamp, 'replace') else timestamp
-                
-                if curr_ts >= expiry_date:
-                    # Expired: Calculate Intrinsic
-                    is_call = "_C_" in pos['symbol']
-                    is_put = "_P_" in pos['symbol']
-                    strike = float(pos['symbol'].split('_')[-2])
-                    
-                    intrinsic = 0.0
-                    if is_call: intrinsic = max(0, underlying_price - strike)
-                    if is_put: intrinsic = max(0, strike - underlying_price)
-                    
-                    self.broker.close_position(pos['id'], intrinsic, time=timestamp)
-                    continue
-            except Exception as e:
-                print(f"Error parsing expiry: {e}")
+        if not order:
+            return False
+            
+        self.trades_today += 1
+        self.position_ids.append(order['id'])
+        self._price_path(order['id'], i, contract)
+        return True
+
+    def _price_path(self, position_id, i, contract):
+        """
+        Prices the contract for every bar from entry until its expiry close in one vectorized call.
+        """
+        end = np.searchsorted(self.ts_ns, contract.expiry_close_ns, side='left')
+        path = option_prices(
+            self.close[i:end], contract.strike, contract.right,
+            self.ts_ns[i:end], contract.expiry_ns, self.vol[i:end]
+        )
+        self.marks[position_id] = (i, path)
+
+    def _close_position(self, position_id, price, timestamp):
+        self.marks.pop(position_id, None)
+        self.position_ids.remove(position_id)
+        self.broker.close_position(position_id, price, time=timestamp)
+
+    def _process_exits(self, i):
+        now_ns = self.ts_ns[i]
+        
+        for position_id in list(self.position_ids):
+            pos = self.broker.positions[position_id]
+            contract = pos['contract']
+            
+            # Check for expiration FIRST: settle at intrinsic from the close on expiry day
+            if now_ns >= contract.expiry_close_ns:
+                self._close_position(pos['id'], contract.intrinsic(self.close[i]), self.inputs.index[i])
+                continue
                 
-            # Check SL/TP using simulated chain prices
-            match = chain[chain['id'] == pos['id']]
-            if not match.empty:
-                current_opt_price = match.iloc[0]['price']
+            # Check SL/TP against the contract's precomputed price path
+            start, path = self.marks.get(pos['id'], (i, ()))
+            j = i - start
+            if 0 <= j < len(path):
+                current_opt_price = path[j]
                 
-                if current_opt_price <= pos['stop_loss']:
-                    self.broker.close_position(pos['id'], current_opt_price, time=timestamp)
-                elif current_opt_price >= pos['take_profit']:
-                    self.broker.close_position(pos['id'], current_opt_price, time=timestamp)
-            else:
-                 # If not in chain (e.g. DTE logic excluded it), estimate price or hold?
-                 # Fallback: Estimate using Intrinsic + Time Decay? 
-                 # Or just force close if we can't price it.
-                 # Let's force close to be safe if data is missing, or just wait.
-                 pass
+                if current_opt_price <= pos['stop_loss'] or current_opt_price >= pos['take_profit']:
+                    self._close_position(pos['id'], current_opt_price, self.inputs.index[i])
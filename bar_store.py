@@ -0,0 +1,88 @@
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import config
+from pathlib import Path
+from typing import Optional
+
+class BarStore:
+    """
+    On-disk columnar OHLCV store keyed by (symbol, interval).
+    Each series is a single .npz file with one array per column plus the
+    UTC timestamps as int64 nanoseconds. Writes go to a temp file in the same
+    directory and are swapped in with os.replace, so readers never see a
+    half-written series.
+    """
+
+    COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+    def __init__(self, root: Path = config.BAR_STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path(self, symbol: str, interval: str) -> Path:
+        return self.root / f"{symbol}_{interval}.npz"
+
+    def read(self, symbol: str, interval: str) -> Optional[pd.DataFrame]:
+        """
+        Returns the stored bars, or None if nothing is stored yet.
+        The start date the series was downloaded from is kept in df.attrs['covered_from'].
+        """
+        path = self.path(symbol, interval)
+        if not path.exists():
+            return None
+
+        with np.load(path, allow_pickle=False) as data:
+            tz = str(data['tz'])
+            index = pd.DatetimeIndex(data['ts'].astype('datetime64[ns]'))
+            if tz:
+                index = index.tz_localize('UTC').tz_convert(tz)
+            df = pd.DataFrame({c: data[c] for c in self.COLUMNS}, index=index)
+            df.attrs['covered_from'] = str(data['covered_from'])
+        return df
+
+    def write(self, symbol: str, interval: str, df: pd.DataFrame, covered_from: str):
+        """
+        Atomically replaces the stored series for (symbol, interval).
+        """
+        index = df.index
+        tz = str(index.tz) if index.tz is not None else ""
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+
+        columns = {c: df[c].to_numpy(dtype=np.float64) for c in self.COLUMNS}
+        path = self.path(symbol, interval)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(
+                    f,
+                    ts=index.values.astype('datetime64[ns]').view('int64'),
+                    tz=np.array(tz),
+                    covered_from=np.array(str(covered_from)),
+                    **columns
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def append(self, symbol: str, interval: str, stored: pd.DataFrame, new_bars: pd.DataFrame) -> pd.DataFrame:
+        """
+        Merges new_bars into the stored series and persists the result.
+        Overlapping timestamps take the newer value, so a bar that was still
+        forming at the last download gets replaced by its final version.
+        """
+        if new_bars.empty:
+            return stored
+
+        if stored.index.tz is not None and new_bars.index.tz is not None:
+            new_bars = new_bars.tz_convert(stored.index.tz)
+
+        merged = pd.concat([stored[self.COLUMNS], new_bars[self.COLUMNS]])
+        merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+        merged.attrs['covered_from'] = stored.attrs.get('covered_from', "")
+        self.write(symbol, interval, merged, merged.attrs['covered_from'])
+        return merged
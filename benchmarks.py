@@ -0,0 +1,209 @@
+import time
+import numpy as np
+import pandas as pd
+import config
+from typing import List
+from data_loader import DataManager
+from feature_cache import FeatureCache
+from features import FEATURE_COLUMNS
+from models import SymbolModel, MODEL_TYPES
+from multi_horizon import target_columns
+from alpaca_broker import AlpacaBroker, AlpacaClient
+from alpaca_stub import AlpacaStubServer
+from contracts import OptionContract
+from sklearn.metrics import accuracy_score
+
+# Single-row predictions timed per backend (the live loop scores one bar at a time)
+LATENCY_CALLS = 200
+
+
+def _median_latency(fn, calls: int = LATENCY_CALLS) -> float:
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def compare_backends(symbol: str, model_types: List[str] = MODEL_TYPES) -> pd.DataFrame:
+    """
+    Side-by-side report of the model backends on one symbol's data.
+    For each horizon and backend: fit time on the first 80% of rows, accuracy on
+    the last 20%, batch prediction time per row, and median single-row latency.
+    Models are fitted in memory only; nothing in MODELS_DIR is touched.
+    """
+    df = DataManager().fetch_data(symbol)
+    if df.empty:
+        print(f"Error: No data for {symbol}")
+        return pd.DataFrame()
+    df = FeatureCache().get(df).training_frame()
+    X = df[FEATURE_COLUMNS]
+    split_idx = int(len(X) * 0.8)
+    X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
+    last_row = X_test.iloc[[-1]]
+
+    rows = []
+    for h in config.TARGET_HORIZONS:
+        y = df[f"target_{h}h"]
+        y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
+        for model_type in model_types:
+            sm = SymbolModel(symbol, model_type=model_type)
+            start = time.perf_counter()
+            model = sm._fit(X_train, y_train, h)
+            fit_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            preds = model.predict(X_test)
+            batch_seconds = time.perf_counter() - start
+
+            rows.append({
+                "horizon": h,
+                "model_type": model_type,
+                "fit_s": fit_seconds,
+                "batch_us_per_row": batch_seconds / len(X_test) * 1e6,
+                "single_row_ms": _median_latency(lambda: model.predict(last_row)) * 1e3,
+                "accuracy": accuracy_score(y_test, preds),
+                "trees": getattr(model, "n_iter_", getattr(model, "n_estimators", None)),
+            })
+            print(f"[{symbol} {h}h] {model_type}: fit {fit_seconds:.2f}s, accuracy {rows[-1]['accuracy']:.4f}")
+
+    return pd.DataFrame(rows)
+
+
+def compare_horizon_designs(symbol: str, model_types: List[str] = MODEL_TYPES) -> pd.DataFrame:
+    """
+    One model per horizon vs one shared multi-horizon model, per backend.
+    Fit time covers all horizons on the first 80% of rows; prediction times are
+    for all horizons through SymbolModel.predict (batch over the last 20%, and
+    one row), plus the compiled ensemble on one row. Accuracy is per horizon.
+    """
+    df = DataManager().fetch_data(symbol)
+    if df.empty:
+        print(f"Error: No data for {symbol}")
+        return pd.DataFrame()
+    df = FeatureCache().get(df).training_frame()
+    X = df[FEATURE_COLUMNS]
+    Y = df[target_columns(config.TARGET_HORIZONS)]
+    split_idx = int(len(X) * 0.8)
+    X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
+    Y_train, Y_test = Y.iloc[:split_idx], Y.iloc[split_idx:]
+    last_row = X_test.iloc[[-1]]
+
+    rows = []
+    for model_type in model_types:
+        for design in ("per_horizon", "shared"):
+            sm = SymbolModel(symbol, model_type=model_type, shared=design == "shared")
+            start = time.perf_counter()
+            if sm.shared:
+                model = sm._fit(X_train, Y_train)
+                sm.models = {h: model for h in config.TARGET_HORIZONS}
+            else:
+                sm.models = {h: sm._fit(X_train, Y_train[f"target_{h}h"], h) for h in config.TARGET_HORIZONS}
+            fit_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            preds = sm.predict(X_test)
+            batch_seconds = time.perf_counter() - start
+            compiled = sm.compiled()
+            row = {
+                "model_type": model_type,
+                "design": design,
+                "fit_s": fit_seconds,
+                "batch_us_per_row": batch_seconds / len(X_test) * 1e6,
+                "single_row_ms": _median_latency(lambda: sm.predict(last_row)) * 1e3,
+                "compiled_row_ms": _median_latency(lambda: compiled.predict(last_row.to_numpy()[0])) * 1e3,
+            }
+            for h in config.TARGET_HORIZONS:
+                row[f"accuracy_{h}h"] = accuracy_score(Y_test[f"target_{h}h"], preds[h])
+            rows.append(row)
+            accuracy = ", ".join(f"{h}h {row[f'accuracy_{h}h']:.4f}" for h in config.TARGET_HORIZONS)
+            print(f"[{symbol}] {model_type} {design}: fit {fit_seconds:.2f}s, accuracy {accuracy}")
+
+    return pd.DataFrame(rows)
+
+
+def inference_latency(symbol: str, calls: int = LATENCY_CALLS) -> pd.DataFrame:
+    """
+    Single-bar latency of the symbol's saved models: SymbolModel.predict on a
+    one-row DataFrame vs the compiled ensemble on a feature vector. Also checks
+    that both give the same labels on every row of the history.
+    """
+    df = DataManager().fetch_data(symbol)
+    if df.empty:
+        print(f"Error: No data for {symbol}")
+        return pd.DataFrame()
+    sm = SymbolModel(symbol)
+    sm.load()
+    if not sm.models:
+        print("Model not trained. Please run training first.")
+        return pd.DataFrame()
+
+    fm = FeatureCache().get(df)
+    compiled = sm.compiled()
+    batch = compiled.predict(fm.rows())
+    reference = sm.predict_matrix(fm)
+    identical = all(np.array_equal(batch[h], reference[h]) for h in reference)
+
+    row = fm.rows()[-1]
+    row_frame = fm.frame().iloc[[-1]]
+    sklearn_ms = _median_latency(lambda: sm.predict(row_frame), calls) * 1e3
+    compiled_ms = _median_latency(lambda: compiled.predict(row), calls) * 1e3
+    return pd.DataFrame([
+        {"path": "sklearn", "horizons": len(sm.models), "single_row_ms": sklearn_ms, "speedup": 1.0, "identical": True},
+        {"path": "compiled", "horizons": len(sm.models), "single_row_ms": compiled_ms,
+         "speedup": sklearn_ms / compiled_ms, "identical": identical},
+    ])
+
+
+def broker_latency(orders: int = 40, latency: float = 0.02, failure_rate: float = 0.1,
+                   lost_response_rate: float = 0.05, rate_limit: int = None, seed: int = 0) -> pd.DataFrame:
+    """
+    AlpacaBroker against an in-process AlpacaStubServer with `latency` seconds
+    per request, injected failures and optionally `rate_limit` requests per second. Times sequential vs batched order
+    submission and separate vs one-round-trip account/positions reads, and
+    checks that retries never placed an order twice.
+    """
+    expiry_ns = pd.Timestamp("2030-01-18").value
+    contracts = [OptionContract("SPY", 1, 400.0 + k, expiry_ns) for k in range(orders)]
+    rows = []
+    for mode in ("sequential", "batched"):
+        server = AlpacaStubServer(cash=1e9, latency=latency, failure_rate=failure_rate,
+                                  lost_response_rate=lost_response_rate, rate_limit=rate_limit,
+                                  rate_window=1.0, seed=seed)
+        broker = AlpacaBroker(AlpacaClient(base_url="http://127.0.0.1", key_id="stub", secret_key="stub", backoff=0.01))
+        try:
+            broker.client.base_url = broker.run(server.start())
+            requests = [{"symbol": c.id, "contract": c, "quantity": 1, "side": "buy", "order_type": "limit", "price": 1.0}
+                        for c in contracts]
+            start = time.perf_counter()
+            if mode == "sequential":
+                placed = [broker.place_order(**r) for r in requests]
+            else:
+                placed = broker.place_orders(requests)
+            order_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            if mode == "sequential":
+                broker.get_account_balance()
+                positions = broker.get_positions()
+            else:
+                _, _, positions = broker.snapshot()
+            read_seconds = time.perf_counter() - start
+            rows.append({
+                "mode": mode,
+                "orders": orders,
+                "orders_s": order_seconds,
+                "account_positions_ms": read_seconds * 1e3,
+                "placed": sum(bool(p) for p in placed),
+                "positions": len(positions),
+                "duplicates": sum(p["quantity"] > 1 for p in positions),
+                "retries": broker.client.stats["retries"],
+                "rate_limited": broker.client.stats["rate_limited"],
+                "server_requests": server.requests,
+                "max_in_flight": server.max_in_flight,
+            })
+        finally:
+            broker.run(server.stop())
+            broker.close()
+    return pd.DataFrame(rows)
@@ -1,5 +1,6 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Sequence, Tuple
+import numpy as np
 import pandas as pd
 import config
 from datetime import datetime
@@ -9,6 +10,10 @@ class AbstractBroker(ABC):
     def get_account_balance(self) -> float:
         pass
 
+    @abstractmethod
+    def get_buying_power(self) -> float:
+        pass
+
     @abstractmethod
     def get_positions(self) -> List[Dict]:
         pass
@@ -18,34 +23,98 @@ class AbstractBroker(ABC):
         pass
         
     @abstractmethod
-    def close_position(self, position_id: str, price: float) -> Dict:
+    def close_position(self, position_id: str, price: float, position: Dict = None) -> Dict:
         pass
 
+    def snapshot(self) -> Tuple[float, float, Sequence[Dict]]:
+        """
+        (equity, buying power, positions); remote brokers fetch them in one round trip.
+        """
+        return self.get_account_balance(), self.get_buying_power(), self.get_positions()
+
 class PaperBroker(AbstractBroker):
     """
     Simulates a broker for backtesting and paper trading.
     Tracks cash and open positions in memory.
+
+    Quantities and prices of open positions live in slot arrays (freed slots are
+    reused), with the market value and cost basis kept as running totals, so
+    equity, exposure and unrealized PnL are O(1) however many contracts are open.
+    mark() reprices any set of positions in one vectorized call.
     """
     
-    def __init__(self, initial_balance: float = config.INITIAL_BALANCE):
+    def __init__(self, initial_balance: float = config.INITIAL_BALANCE, capacity: int = 16):
         self.cash = initial_balance
-        self.positions = {} # Key: position_id, Value: Dict
+        self.positions = {} # Key: position_id, Value: Dict (fixed fields; prices are in the slot arrays)
         self.trade_history = []
+        self._quantity = np.zeros(capacity)
+        self._entry_price = np.zeros(capacity)
+        self._mark_price = np.zeros(capacity)
+        self._free = list(range(capacity - 1, -1, -1))
+        self._market_value = 0.0 # sum of quantity * mark price over open positions
+        self._cost_basis = 0.0 # sum of quantity * entry price over open positions
+        self._position_list = None # get_positions() result until the next open/close
         
     def get_account_balance(self) -> float:
-        # Equity = Cash + Unrealized PnL (simplified here as just Cash + Position Value at entry or current?)
-        # For simplicity in this method, return Cash. 
-        # Real equity calculation requires current market prices for all positions.
+        """
+        Equity: cash plus open positions at their last mark (entry price until marked).
+        """
+        return self.equity()
+
+    def get_buying_power(self) -> float:
+        """
+        Cash available for new positions (options are paid for in full).
+        """
         return self.cash
+
+    def equity(self) -> float:
+        return self.cash + self._market_value
+
+    def exposure(self) -> float:
+        """
+        Market value of open positions.
+        """
+        return self._market_value
+
+    def unrealized_pnl(self) -> float:
+        return self._market_value - self._cost_basis
+
+    def mark(self, slots, prices):
+        """
+        Sets the current price of the positions in `slots` (pos['slot']) and
+        refreshes the market value with one dot product over the slot arrays.
+        """
+        if len(slots):
+            self._mark_price[np.asarray(slots, dtype=np.intp)] = prices
+        self._market_value = float(self._quantity @ self._mark_price) if self.positions else 0.0
+
+    def mark_price(self, position_id: str) -> float:
+        return float(self._mark_price[self.positions[position_id]['slot']])
         
-    def get_positions(self) -> List[Dict]:
-        return list(self.positions.values())
+    def get_positions(self) -> Sequence[Dict]:
+        """
+        Open positions, cached until the next open/close. A tuple, so callers
+        can't change the broker's view (copy it to a list to add to it).
+        """
+        if self._position_list is None:
+            self._position_list = tuple(self.positions.values())
+        return self._position_list
+
+    def _take_slot(self) -> int:
+        if not self._free:
+            # Full: double the arrays (amortized O(1) per position)
+            size = len(self._quantity)
+            for name in ("_quantity", "_entry_price", "_mark_price"):
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros(size)]))
+            self._free = list(range(2 * size - 1, size - 1, -1))
+        return self._free.pop()
         
     def place_order(self, symbol: str, quantity: int, side: str, order_type: str = "market", price: float = 0.0, **kwargs) -> Dict:
         """
         Executes a simulated order.
         side: 'buy' or 'sell'
         symbol: Option symbol id (e.g. SPY_C_400_2023-01-01)
+        contract: optional OptionContract with the parsed fields of symbol
         """
         cost = quantity * price
         
@@ -61,18 +130,26 @@ class PaperBroker(AbstractBroker):
             # Here we assume unique ID per trade instance or simple aggregation
             
             if position_id in self.positions:
-                # Average price logic would go here
-                pass 
+                # Average price logic would go here; for now the new lot replaces the old one
+                self._release(position_id)
                 
+            slot = self._take_slot()
+            self._quantity[slot] = quantity
+            self._entry_price[slot] = price
+            self._mark_price[slot] = price
+            self._market_value += cost
+            self._cost_basis += cost
+            self._position_list = None
             self.positions[position_id] = {
                 "id": position_id,
+                "slot": slot,
                 "symbol": symbol,
                 "quantity": quantity,
                 "entry_price": price,
-                "current_price": price,
                 "entry_time": kwargs.get("time", datetime.now()),
                 "stop_loss": kwargs.get("stop_loss", 0),
-                "take_profit": kwargs.get("take_profit", 0)
+                "take_profit": kwargs.get("take_profit", 0),
+                "contract": kwargs.get("contract") # OptionContract, if known
             }
             
             # print(f"[PaperBroker] BOUGHT {quantity} x {symbol} @ {price}. Cash left: {self.cash:.2f}")
@@ -84,7 +161,10 @@ class PaperBroker(AbstractBroker):
             
         return {}
 
-    def close_position(self, position_id: str, price: str, time: datetime = None) -> Dict:
+    def close_position(self, position_id: str, price: str, time: datetime = None, position: Dict = None) -> Dict:
+        """
+        `position` (the caller's record of it) is not needed here: the broker holds the positions itself.
+        """
         if position_id not in self.positions:
             print(f"Error: Position {position_id} not found.")
             return {}
@@ -98,8 +178,14 @@ class PaperBroker(AbstractBroker):
         pnl = proceeds - (quantity * pos['entry_price'])
         pnl_percent = (price - pos['entry_price']) / pos['entry_price']
         
+        contract = pos.get('contract')
         trade_record = {
             "symbol": pos['symbol'],
+            "option_symbol": contract.id if contract else pos['symbol'],
+            "contract": contract,
+            "dte": contract.dte(pos['entry_time']) if contract else 0,
+            "stop_loss": pos['stop_loss'],
+            "take_profit": pos['take_profit'],
             "entry_time": pos['entry_time'],
             "exit_time": time or datetime.now(),
             "entry_price": pos['entry_price'],
@@ -111,6 +197,18 @@ class PaperBroker(AbstractBroker):
         
         # print(f"[PaperBroker] SOLD {quantity} x {pos['symbol']} @ {price}. PnL: {pnl:.2f} ({pnl_percent*100:.1f}%)")
         
-        del self.positions[position_id]
+        self._release(position_id)
         self.trade_history.append(trade_record)
         return trade_record
+
+    def _release(self, position_id: str):
+        pos = self.positions.pop(position_id)
+        slot = pos['slot']
+        self._market_value -= self._quantity[slot] * self._mark_price[slot]
+        self._cost_basis -= self._quantity[slot] * self._entry_price[slot]
+        self._quantity[slot] = self._entry_price[slot] = self._mark_price[slot] = 0.0
+        self._free.append(slot)
+        self._position_list = None
+        if not self.positions:
+            # Flat: drop rounding left over from the running totals
+            self._market_value = self._cost_basis = 0.0
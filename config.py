@@ -6,6 +6,10 @@ BASE_DIR = Path(__file__).parent.resolve()
 DATA_DIR = BASE_DIR / "data"
 MODELS_DIR = BASE_DIR / "models"
 JOURNAL_DIR = DATA_DIR / "journal"
+BAR_STORE_DIR = DATA_DIR / "bars"
+FEATURE_CACHE_DIR = DATA_DIR / "features"
+MODEL_REGISTRY_DIR = MODELS_DIR / "registry"
+LOGS_DIR = DATA_DIR / "logs"
 
 # Create directories if they don't exist
 DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -30,6 +34,27 @@ MAX_TAKE_PROFIT_PERCENT = 5.0   # 500% gain
 
 MAX_TRADES_PER_DAY = 5
 
+# Portfolio backtest (all SYMBOLS from one account): limits across symbols.
+# MAX_TRADES_PER_DAY above still applies per symbol.
+PORTFOLIO_MAX_OPEN_POSITIONS = 3
+PORTFOLIO_MAX_TRADES_PER_DAY = 10
+
+# Parameter Sweep (main.py sweep): values to try for each risk setting.
+# Lists are searched exhaustively (or sampled with --samples); (low, high) tuples are sampled uniformly.
+SWEEP_GRID = {
+    "MIN_STOP_LOSS_PERCENT": [0.05, 0.10, 0.15],
+    "MAX_STOP_LOSS_PERCENT": [0.20, 0.30],
+    "MIN_TAKE_PROFIT_PERCENT": [0.25, 0.50, 1.0],
+    "MAX_TAKE_PROFIT_PERCENT": [2.0, 5.0],
+    "MIN_RISK_PERCENT": [0.05, 0.10, 0.20],
+    "MAX_TRADES_PER_DAY": [1, 3, 5]
+}
+SWEEP_SEED = 42
+
+# Monte Carlo (main.py monte-carlo): independently seeded replications of the SL/TP draws
+MONTE_CARLO_RUNS = 200
+MONTE_CARLO_SEED = 2024
+
 # DTE Rules (Days to Expiration)
 # Swing Trading: 0-4 DTE
 DTE_RULES = {
@@ -38,7 +63,32 @@ DTE_RULES = {
     "DEFAULT": (0, 4)
 }
 
+# Simulated option chains: number of (symbol, price band, date) grids kept in memory
+OPTION_CHAIN_CACHE_SIZE = 4096
+
+# Option Pricing
+OPTION_PRICING_MODEL = "black_scholes" # or "intrinsic" for the legacy intrinsic + time value placeholder
+OPTION_EXPIRY_TIME = (16, 0) # contracts expire at the close
+RISK_FREE_RATE = 0.04
+DEFAULT_VOLATILITY = 0.20 # used when no realized volatility is available
+MIN_VOLATILITY = 0.05
+MIN_TIME_TO_EXPIRY = 1.0 / (365 * 24 * 60) # one minute, in years
+VOLATILITY_SOURCE = "std" # "std" (rolling std of log returns) or "atr"
+VOLATILITY_WINDOW = 20
+# Bars per year used to annualize per-bar volatility (yfinance hourly bars: 7 per session)
+BARS_PER_YEAR = {
+    "1m": 252 * 390,
+    "5m": 252 * 78,
+    "15m": 252 * 26,
+    "30m": 252 * 13,
+    "1h": 252 * 7,
+    "1d": 252
+}
+
 # Trading Hours (ET)
+MARKET_TIMEZONE = "America/New_York"
+MARKET_OPEN = (9, 30) # intraday bars start here and close every INTERVAL after
+MARKET_CLOSE = (16, 0)
 TRADING_WINDOWS = [
     {"start": (9, 30), "end": (11, 0)},
     {"start": (14, 0), "end": (16, 0)}
@@ -52,10 +102,65 @@ TARGET_THRESHOLDS = {
     1: 0.001, # 0.1% for 1h
     4: 0.003  # 0.3% for 4h
 }
+# Model backend: "rf" (random forest), "gb" (gradient boosting) or "hgb" (histogram gradient boosting)
+MODEL_TYPE = "gb"
+HGB_VALIDATION_FRACTION = 0.1 # most recent share of training rows used for early stopping
+SHARED_HORIZON_MODEL = False # one multi-output model for all TARGET_HORIZONS instead of one per horizon
+# Hyperparameter search (main.py tune): values per backend, sampled like SWEEP_GRID.
+# The best parameters per symbol and horizon go to models/{symbol}_params.json and are used by train.
+TUNE_GRIDS = {
+    "rf": {"n_estimators": [100, 200, 400], "max_depth": [None, 8, 16], "min_samples_leaf": [1, 5, 20],
+           "max_features": ["sqrt", 0.5]},
+    "gb": {"n_estimators": [50, 100, 200], "learning_rate": [0.03, 0.1, 0.3], "max_depth": [2, 3, 4],
+           "subsample": [0.7, 1.0], "min_samples_leaf": [1, 20]},
+    "hgb": {"learning_rate": [0.03, 0.1, 0.3], "max_leaf_nodes": [15, 31, 63], "min_samples_leaf": [20, 50, 100],
+            "l2_regularization": [0.0, 1.0]},
+}
+TUNE_CANDIDATES = 27 # random draws per backend (None: full grid)
+TUNE_FOLDS = 4 # expanding-window time-series folds
+TUNE_HALVING_FACTOR = 3 # each round keeps the best 1/3 and triples the training rows
+TUNE_MIN_TRAIN_ROWS = 300 # floor on training rows in the early, cheap rounds
+TUNE_SEED = 42
+# Walk-forward training (main.py walk-forward): retrain every STEP bars on an expanding or rolling window
+WALK_FORWARD_WINDOW = "expanding" # or "rolling"
+WALK_FORWARD_TRAIN_BARS = 1000 # first training window (and rolling window / warm-start refit size)
+WALK_FORWARD_STEP_BARS = 70 # about two weeks of 1h bars
+# Backtest signals: "model" (saved models over the whole history) or "walk_forward" (out-of-sample predictions)
+BACKTEST_SIGNAL_SOURCE = "model"
+# Feature/label matrices cached on disk, keyed by a hash of the bars + feature and target config
+USE_FEATURE_CACHE = True
+FEATURE_CACHE_MAX_BYTES = 2 * 1024**3 # least recently used entries are evicted past this size
 
 # Data Download Config
 START_DATE = "2025-01-01"
 INTERVAL = "1h" # using 1 hour bars for this example to have enough history quickly
+USE_BAR_STORE = True # Cache bars locally and only download what is new
 
 # Broker / Live Config
 PAPER_TRADING = True
+# Alpaca REST API (AlpacaBroker, used when PAPER_TRADING is False). Keys are read from the environment.
+ALPACA_BASE_URL = os.environ.get("APCA_API_BASE_URL", "https://paper-api.alpaca.markets")
+ALPACA_KEY_ID = os.environ.get("APCA_API_KEY_ID", "")
+ALPACA_SECRET_KEY = os.environ.get("APCA_API_SECRET_KEY", "")
+ALPACA_MAX_CONNECTIONS = 8 # pooled keep-alive connections (also the cap on requests in flight)
+ALPACA_TIMEOUT_SECONDS = 10
+ALPACA_MAX_RETRIES = 4 # on connection errors, timeouts, 429 and 5xx
+ALPACA_BACKOFF_SECONDS = 0.25 # first retry delay, doubled per attempt (with jitter)
+# Alpaca market data websocket (main.py live --stream); streams 1-minute bars, folded into INTERVAL bars
+ALPACA_STREAM_URL = os.environ.get("APCA_STREAM_URL", "wss://stream.data.alpaca.markets/v2/iex")
+STREAM_BUFFER_BARS = 512 # completed bars kept in memory per symbol (volatility needs SMA_200 + VOLATILITY_WINDOW)
+STREAM_RECONNECT_SECONDS = 1.0 # first reconnect delay, doubled per failed attempt (max 60s)
+REPLAY_SPEED = 3600.0 # replay server: replayed seconds per wall-clock second (0: as fast as possible)
+# Live metrics: per-stage latency histograms and counters, served locally, plus a JSON-lines event log
+METRICS_HOST = "127.0.0.1" # local only
+METRICS_PORT = 9108 # http://METRICS_HOST:METRICS_PORT/metrics (and /metrics.json); None: no endpoint
+METRICS_LOG_PATH = LOGS_DIR / "live_events.jsonl"
+METRICS_LOG_MAX_BYTES = 10_000_000 # rotated at this size
+METRICS_LOG_BACKUPS = 5 # rotated files kept
+# Live engine (main.py live): wakes once per bar, LIVE_BAR_GRACE_SECONDS after the close
+LIVE_BAR_GRACE_SECONDS = 5 # time for the data provider to publish the closed bar
+LIVE_FETCH_TIMEOUT_SECONDS = 30 # per symbol; a symbol that times out skips the bar
+LIVE_SIGNAL_TIMEOUT_SECONDS = 10 # features + inference
+LIVE_ORDER_TIMEOUT_SECONDS = 20 # exits and entry through the broker
+LIVE_IO_WORKERS = 8 # threads for downloads and broker calls
+LIVE_CPU_WORKERS = 4 # threads for features and inference
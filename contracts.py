@@ -0,0 +1,92 @@
+import re
+import pandas as pd
+from datetime import datetime
+from pricing import CALL, PUT, NS_PER_DAY, EXPIRY_CLOSE_NS
+
+class OptionContract:
+    """
+    Parsed option contract carried from chain selection through the broker and journal.
+    Expiry is midnight of the expiry date as int64 ns (wall clock), so hot loops compare
+    integers instead of parsing the id string and building datetimes.
+    """
+
+    __slots__ = ("underlying", "right", "strike", "expiry_ns", "id")
+
+    def __init__(self, underlying: str, right: int, strike: float, expiry_ns: int, contract_id: str = None):
+        self.underlying = underlying
+        self.right = int(right)
+        self.strike = float(strike)
+        self.expiry_ns = int(expiry_ns)
+        if contract_id is None:
+            contract_id = f"{underlying}_{'C' if self.right == CALL else 'P'}_{self.strike}_{self.expiry.date()}"
+        self.id = contract_id
+
+    @classmethod
+    def from_id(cls, contract_id: str) -> "OptionContract":
+        """
+        Parses the legacy id format, e.g. SPY_C_400.0_2025-01-01.
+        """
+        underlying, right, strike, expiry = contract_id.rsplit('_', 3)
+        expiry_ns = pd.Timestamp(expiry).value
+        return cls(underlying, CALL if right == 'C' else PUT, float(strike), expiry_ns, contract_id)
+
+    @classmethod
+    def from_occ(cls, symbol: str) -> "OptionContract":
+        """
+        Parses an OCC option symbol as brokers report it, e.g. SPY250117C00480000.
+        """
+        match = re.match(r'^([A-Z.]{1,6})(\d{6})([CP])(\d{8})$', symbol)
+        if match is None:
+            raise ValueError(f"Not an OCC option symbol: {symbol}")
+        underlying, expiry, right, strike = match.groups()
+        expiry_ns = pd.Timestamp(datetime.strptime(expiry, "%y%m%d")).value
+        return cls(underlying, CALL if right == 'C' else PUT, int(strike) / 1000, expiry_ns)
+
+    @property
+    def occ_symbol(self) -> str:
+        """
+        OCC symbol (root, YYMMDD expiry, C/P, strike x 1000 in 8 digits) used by broker APIs.
+        """
+        return f"{self.underlying}{self.expiry:%y%m%d}{'C' if self.right == CALL else 'P'}{round(self.strike * 1000):08d}"
+
+    @property
+    def is_call(self) -> bool:
+        return self.right == CALL
+
+    @property
+    def expiry(self) -> pd.Timestamp:
+        return pd.Timestamp(self.expiry_ns)
+
+    @property
+    def expiry_close_ns(self) -> int:
+        return self.expiry_ns + EXPIRY_CLOSE_NS
+
+    def intrinsic(self, underlying_price: float) -> float:
+        return max(0.0, self.right * (underlying_price - self.strike))
+
+    def dte(self, when: datetime) -> int:
+        """
+        Calendar days from when until expiry.
+        """
+        ts = pd.Timestamp(when)
+        if ts.tz is not None:
+            ts = ts.tz_localize(None)
+        return int((self.expiry_ns - ts.normalize().value) // NS_PER_DAY)
+
+    def __repr__(self) -> str:
+        return f"OptionContract({self.id})"
+
+
+def parse_contract_ids(ids: pd.Series) -> pd.DataFrame:
+    """
+    Vectorized parse of a column of legacy contract ids into
+    underlying, right (1 call / -1 put), strike and expiry columns.
+    Unparseable ids come back as NaN/NaT.
+    """
+    parts = ids.astype(str).str.extract(r'^(?P<underlying>.+)_(?P<right>[CP])_(?P<strike>[\d.]+)_(?P<expiry>\d{4}-\d{2}-\d{2})$')
+    return pd.DataFrame({
+        "underlying": parts['underlying'],
+        "right": parts['right'].map({'C': CALL, 'P': PUT}),
+        "strike": pd.to_numeric(parts['strike'], errors='coerce'),
+        "expiry": pd.to_datetime(parts['expiry'], errors='coerce')
+    }, index=ids.index)
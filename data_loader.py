@@ -1,9 +1,10 @@
 import yfinance as yf
 import pandas as pd
-import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import config
-from typing import List, Optional
+from bar_store import BarStore
+from option_chain import OptionChain
+from typing import Dict, List, Optional
 
 class DataManager:
     """
@@ -12,16 +13,47 @@ class DataManager:
 
     def __init__(self):
         self.data_dir = config.DATA_DIR
+        self.store = BarStore()
 
     def fetch_data(self, symbol: str, start_date: str = config.START_DATE, interval: str = config.INTERVAL) -> pd.DataFrame:
+        """
+        Returns OHLCV bars from start_date, reading the local bar store first.
+        Only bars newer than the last stored timestamp are downloaded; the full
+        history is fetched once per (symbol, interval), or again if an earlier
+        start_date is requested than the store covers.
+        """
+        if not config.USE_BAR_STORE:
+            return self._download(symbol, start_date, interval)
+
+        stored = self.store.read(symbol, interval)
+        covered_from = stored.attrs.get('covered_from') if stored is not None else None
+
+        if stored is None or stored.empty or pd.Timestamp(start_date) < pd.Timestamp(covered_from):
+            df = self._download(symbol, start_date, interval)
+            if df.empty:
+                return df
+            self.store.write(symbol, interval, df, start_date)
+        else:
+            print(f"Updating stored bars for {symbol} ({interval}) since {stored.index[-1]}...")
+            new_bars = self._download(symbol, stored.index[-1], interval, quiet=True)
+            df = self.store.append(symbol, interval, stored, new_bars)
+
+        start = pd.Timestamp(start_date)
+        if df.index.tz is not None:
+            start = start.tz_localize(df.index.tz)
+        return df[df.index >= start]
+
+    def _download(self, symbol: str, start_date, interval: str, quiet: bool = False) -> pd.DataFrame:
         """
         Downloads OHLCV data from yfinance.
         """
-        print(f"Fetching data for {symbol}...")
+        if not quiet:
+            print(f"Fetching data for {symbol}...")
         df = yf.download(symbol, start=start_date, interval=interval, progress=False)
         
         if df.empty:
-            print(f"Warning: No data found for {symbol}")
+            if not quiet:
+                print(f"Warning: No data found for {symbol}")
             return df
             
         # Standardize columns (yfinance returns MultiIndex usually, sometimes needs flattening)
@@ -33,6 +65,60 @@ class DataManager:
         df.dropna(inplace=True)
         return df
 
+    def fetch_many(self, symbols: List[str], start_date: str = config.START_DATE, interval: str = config.INTERVAL) -> Dict[str, pd.DataFrame]:
+        """
+        fetch_data for several symbols with batched downloads: one request for
+        the symbols with no usable stored bars (full history) and one for the
+        rest (new bars since the oldest of their last stored timestamps).
+        """
+        if not config.USE_BAR_STORE:
+            return self._download_many(symbols, start_date, interval)
+
+        stored = {s: self.store.read(s, interval) for s in symbols}
+        fresh = [s for s in symbols if stored[s] is None or stored[s].empty
+                 or pd.Timestamp(start_date) < pd.Timestamp(stored[s].attrs.get('covered_from'))]
+        update = [s for s in symbols if s not in fresh]
+
+        frames = {}
+        if fresh:
+            for s, df in self._download_many(fresh, start_date, interval).items():
+                if not df.empty:
+                    self.store.write(s, interval, df, start_date)
+                frames[s] = df
+        if update:
+            since = min(stored[s].index[-1] for s in update)
+            print(f"Updating stored bars for {len(update)} symbols ({interval}) since {since}...")
+            new_bars = self._download_many(update, since, interval, quiet=True)
+            for s in update:
+                frames[s] = self.store.append(s, interval, stored[s], new_bars[s])
+
+        start = pd.Timestamp(start_date)
+        for s, df in frames.items():
+            if not df.empty:
+                since = start.tz_localize(df.index.tz) if df.index.tz is not None else start
+                frames[s] = df[df.index >= since]
+        return {s: frames[s] for s in symbols}
+
+    def _download_many(self, symbols: List[str], start_date, interval: str, quiet: bool = False) -> Dict[str, pd.DataFrame]:
+        """
+        OHLCV bars for several symbols from one yfinance request.
+        """
+        if not quiet:
+            print(f"Fetching data for {', '.join(symbols)}...")
+        df = yf.download(list(symbols), start=start_date, interval=interval, progress=False, group_by='ticker')
+
+        frames = {}
+        tickers = set(df.columns.get_level_values(0)) if isinstance(df.columns, pd.MultiIndex) else set()
+        for s in symbols:
+            if s not in tickers:
+                if not quiet:
+                    print(f"Warning: No data found for {s}")
+                frames[s] = pd.DataFrame()
+                continue
+            # Bars of the other symbols leave NaN rows in this one's columns
+            frames[s] = df[s][['Open', 'High', 'Low', 'Close', 'Volume']].dropna()
+        return frames
+
     def get_latest_price(self, symbol: str) -> float:
         """
         Gets the latest real-time price (approximate via yfinance).
@@ -48,74 +134,21 @@ class DataManager:
                 return df['Close'].iloc[-1]
             return 0.0
 
-    def generate_option_chain(self, symbol: str, current_price: float, current_date: datetime) -> pd.DataFrame:
+    def generate_option_chain(self, symbol: str, current_price: float, current_date: datetime, vol: Optional[float] = None) -> pd.DataFrame:
         """
         Simulates an options chain for backtesting/paper trading usage if real API is missing.
         Creates Calls and Puts with strikes around current_price and various DTEs.
+        DataFrame view of get_option_chain, kept for callers that want one row per contract.
         """
-        
-        # Determine DTE range based on symbol config
-        dte_min, dte_max = config.DTE_RULES.get(symbol, config.DTE_RULES["DEFAULT"])
-        
-        chain_data = []
-        
-        # Generate strikes: +/- 5% range, step 1.0 (approx)
-        strike_step = 1.0 if current_price < 100 else 5.0
-        min_strike = int(current_price * 0.95)
-        max_strike = int(current_price * 1.05)
-        strikes = np.arange(min_strike, max_strike + strike_step, strike_step)
-        
-        # Generate varied DTEs
-        # For simplicity in simulation, we issue contracts expiring today, tomorrow, etc.
-        # until max_dte.
-        
-        for dte in range(dte_min, dte_max + 1):
-             # Hypothetical expiry date
-            expiry_date = current_date + timedelta(days=dte)
-            
-            for strike in strikes:
-                # Approximate generic option price used for simulation entry
-                # This is NOT Black-Scholes, just a placeholder for paper-trading logic
-                # Real implementation would query an API.
-                
-                # Check moneyness for sensible simulated prices
-                # Call Price ~ max(0, S - K) + TimeValue
-                # Put Price ~ max(0, K - S) + TimeValue
-                
-                time_value = (dte + 1) * 0.5 # Dummy time value
-                
-                call_intrinsic = max(0, current_price - strike)
-                put_intrinsic = max(0, strike - current_price)
-                
-                call_price = call_intrinsic + time_value
-                put_price = put_intrinsic + time_value
-                
-                if call_price < 0.01: call_price = 0.01
-                if put_price < 0.01: put_price = 0.01
-
-                # Add Call
-                chain_data.append({
-                    "symbol": symbol,
-                    "type": "call",
-                    "strike": strike,
-                    "expiry": expiry_date,
-                    "dte": dte,
-                    "price": call_price,
-                    "id": f"{symbol}_C_{strike}_{expiry_date.date()}"
-                })
-                
-                # Add Put
-                chain_data.append({
-                    "symbol": symbol,
-                    "type": "put",
-                    "strike": strike,
-                    "expiry": expiry_date,
-                    "dte": dte,
-                    "price": put_price,
-                    "id": f"{symbol}_P_{strike}_{expiry_date.date()}"
-                })
-                
-        return pd.DataFrame(chain_data)
+        return self.get_option_chain(symbol, current_price, current_date, vol).to_frame()
+
+    def get_option_chain(self, symbol: str, current_price: float, current_date: datetime, vol: Optional[float] = None) -> OptionChain:
+        """
+        Array-backed simulated chain (see option_chain.OptionChain).
+        Preferred in hot loops: no per-contract dicts or id strings are built.
+        Pass an annualized vol to price contracts with Black-Scholes.
+        """
+        return OptionChain(symbol, current_price, current_date, vol)
 
 if __name__ == "__main__":
     # Quick test
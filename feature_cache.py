@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import config
+from pathlib import Path
+from typing import Iterable, Optional
+from features import FEATURE_COLUMNS, FEATURE_SCHEMA_VERSION
+from feature_kernel import FeatureMatrix, compute_feature_matrix, compute_labels
+
+_BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+# Arrays stored per entry (one .npy each, memory-mapped on read)
+_ARRAYS = ['values', 'valid', 'close', 'log_ret', 'atr', 'labels', 'ts']
+
+
+def bars_digest(df: pd.DataFrame) -> str:
+    """
+    sha256 of the bar timestamps (UTC ns) and OHLCV values.
+    """
+    index = df.index
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    h = hashlib.sha256()
+    h.update(index.values.astype('datetime64[ns]').view('int64').tobytes())
+    h.update(np.ascontiguousarray(df[_BAR_COLUMNS].to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def feature_config() -> dict:
+    """
+    Everything besides the bars that changes the cached arrays. Indicator
+    periods are part of the schema: changing one means bumping FEATURE_SCHEMA_VERSION.
+    """
+    return {
+        "schema_version": FEATURE_SCHEMA_VERSION,
+        "columns": FEATURE_COLUMNS,
+        "horizons": list(config.TARGET_HORIZONS),
+        "thresholds": [config.TARGET_THRESHOLDS.get(h, 0.002) for h in config.TARGET_HORIZONS],
+    }
+
+
+class FeatureCache:
+    """
+    Content-addressed on-disk cache of feature matrices and labels.
+    An entry is keyed by bars_digest + feature_config, so the same bars
+    featurized by training, a backtest or a prediction are computed once.
+    Entries are directories of .npy files read with mmap_mode='r', written to a
+    temp directory and renamed into place; the least recently used entries are
+    evicted once the cache grows past FEATURE_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, root: Path = config.FEATURE_CACHE_DIR, max_bytes: int = config.FEATURE_CACHE_MAX_BYTES,
+                 enabled: bool = config.USE_FEATURE_CACHE):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+
+    def key(self, df: pd.DataFrame) -> str:
+        cfg = json.dumps(feature_config(), sort_keys=True).encode()
+        return hashlib.sha256(bars_digest(df).encode() + cfg).hexdigest()[:32]
+
+    def get(self, df: pd.DataFrame, pinned: Iterable[str] = ()) -> FeatureMatrix:
+        """
+        Feature matrix (with labels attached) for df, from the cache if present.
+        Entries in `pinned` (keys still in use, e.g. by training workers) are
+        not evicted to make room for this one.
+        """
+        if not self.enabled:
+            return self.compute(df)
+
+        key = self.key(df)
+        fm = self.read(key)
+        if fm is None:
+            fm = self.compute(df)
+            self.write(key, fm)
+            self.evict(keep={key, *pinned})
+        return fm
+
+    def compute(self, df: pd.DataFrame) -> FeatureMatrix:
+        fm = compute_feature_matrix(df)
+        fm.labels = compute_labels(fm.close[fm.valid])
+        fm.horizons = list(config.TARGET_HORIZONS)
+        return fm
+
+    def read(self, key: str) -> Optional[FeatureMatrix]:
+        entry = self.root / key
+        meta_path = entry / "meta.json"
+        if not meta_path.exists():
+            return None
+
+        meta = json.loads(meta_path.read_text())
+        arrays = {name: np.load(entry / f"{name}.npy", mmap_mode='r') for name in _ARRAYS}
+        os.utime(meta_path) # mark as recently used
+
+        index = pd.DatetimeIndex(np.asarray(arrays['ts']).astype('datetime64[ns]'), name=meta['index_name'])
+        if meta['tz']:
+            index = index.tz_localize('UTC').tz_convert(meta['tz'])
+        return FeatureMatrix(
+            arrays['values'], np.asarray(arrays['valid']), index, arrays['close'],
+            arrays['log_ret'], arrays['atr'], meta['schema_version'], meta['columns'],
+            arrays['labels'], meta['horizons']
+        )
+
+    def write(self, key: str, fm: FeatureMatrix):
+        self.root.mkdir(parents=True, exist_ok=True)
+        index = fm.index
+        tz = str(index.tz) if index.tz is not None else ""
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+
+        arrays = {
+            'values': fm.values, 'valid': fm.valid, 'close': fm.close, 'log_ret': fm.log_ret,
+            'atr': fm.atr, 'labels': fm.labels, 'ts': index.values.astype('datetime64[ns]').view('int64'),
+        }
+        meta = {
+            "schema_version": fm.schema_version, "columns": fm.columns, "horizons": fm.horizons,
+            "tz": tz, "index_name": fm.index.name, "rows": len(fm),
+        }
+
+        tmp_dir = Path(tempfile.mkdtemp(dir=self.root, prefix=".tmp-"))
+        try:
+            for name, values in arrays.items():
+                np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(values), allow_pickle=False)
+            (tmp_dir / "meta.json").write_text(json.dumps(meta))
+            os.replace(tmp_dir, self.root / key)
+        except OSError:
+            # Another process stored the same entry first; its content is identical
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def evict(self, keep: Iterable[str] = ()):
+        """
+        Removes least recently used entries (other than those in `keep`) until
+        the cache fits in max_bytes.
+        """
+        keep = set(keep)
+        entries = []
+        total = 0
+        for entry in self.root.iterdir():
+            meta_path = entry / "meta.json"
+            if not meta_path.exists():
+                continue
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            total += size
+            if entry.name not in keep:
+                entries.append((meta_path.stat().st_mtime, size, entry))
+
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,193 @@
+import numpy as np
+import pandas as pd
+import config
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+from features import FEATURE_COLUMNS, FEATURE_SCHEMA_VERSION
+from labels import label_matrix, threshold_row
+
+_COL = {name: k for k, name in enumerate(FEATURE_COLUMNS)}
+
+
+class FeatureMatrix:
+    """
+    Indicators for every bar in one contiguous float32 (n_bars x n_features) array.
+    Columns follow FEATURE_COLUMNS (schema FEATURE_SCHEMA_VERSION); `valid` marks
+    the rows compute_features would keep (all inputs and indicators finite).
+    """
+
+    def __init__(self, values: np.ndarray, valid: np.ndarray, index: pd.DatetimeIndex, close: np.ndarray,
+                 log_ret: np.ndarray = None, atr: np.ndarray = None,
+                 schema_version: int = FEATURE_SCHEMA_VERSION, columns=None,
+                 labels: np.ndarray = None, horizons=None):
+        self.values = values
+        self.valid = valid
+        self.index = index
+        # float64 inputs of option pricing, kept at full precision
+        self.close = close
+        self.log_ret = log_ret
+        self.atr = atr
+        self.schema_version = schema_version
+        self.columns = list(columns or FEATURE_COLUMNS)
+        # int8 labels per valid row and horizon (see compute_labels), when attached
+        self.labels = labels
+        self.horizons = list(horizons) if horizons is not None else None
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[:, self.columns.index(name)]
+
+    def rows(self) -> np.ndarray:
+        """
+        Valid rows only (what a model should see), still float32 and C-contiguous.
+        """
+        return self.values[self.valid]
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Valid rows as a DataFrame with the trained column names, for sklearn models.
+        """
+        return pd.DataFrame(self.rows(), index=self.index[self.valid], columns=self.columns)
+
+    def training_frame(self) -> pd.DataFrame:
+        """
+        Features plus 'target_{h}h' columns for the valid rows that have a label
+        for every horizon: the frame generate_targets produces from compute_features.
+        """
+        n = max(int(self.valid.sum()) - max(self.horizons), 0)
+        df = self.frame().iloc[:n]
+        for k, h in enumerate(self.horizons):
+            df[f"target_{h}h"] = self.labels[:n, k]
+        return df
+
+    def label_grid(self, horizons, thresholds) -> np.ndarray:
+        """
+        Labels of the valid rows for other horizons and threshold sets (see
+        labels.label_matrix), from the cached closes without refeaturizing.
+        """
+        return label_matrix(self.close[self.valid], horizons, thresholds)
+
+    def volatility_frame(self) -> pd.DataFrame:
+        """
+        Valid rows of the float64 columns FeatureEngineer.compute_volatility reads.
+        """
+        valid = self.valid
+        return pd.DataFrame({'log_ret': self.log_ret[valid], 'ATR': self.atr[valid], 'Close': self.close[valid]},
+                            index=self.index[valid])
+
+
+def _rolling_mean(x: np.ndarray, period: int) -> np.ndarray:
+    """
+    Window means from one cumulative sum. Values are taken relative to the first
+    bar so the running sum stays small on long histories.
+    """
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        cs = np.concatenate(([0.0], np.cumsum(x - x[0])))
+        out[period - 1:] = (cs[period:] - cs[:-period]) / period + x[0]
+    return out
+
+
+def _rolling_std(x: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if len(x) >= period:
+        out[period - 1:] = sliding_window_view(x, period).std(axis=1, ddof=1)
+    return out
+
+
+def _ewm(x: np.ndarray, span: int) -> np.ndarray:
+    """
+    pandas ewm(span=span, adjust=False).mean() as a first-order IIR filter.
+    """
+    if len(x) == 0:
+        return x.copy()
+    alpha = 2.0 / (span + 1)
+    y, _ = lfilter([alpha], [1.0, alpha - 1.0], x, zi=[(1.0 - alpha) * x[0]])
+    return y
+
+
+def _shift_ratio(x: np.ndarray, lag: int) -> np.ndarray:
+    """
+    x[t] / x[t - lag], NaN for the first `lag` bars (inf where x[t - lag] == 0).
+    """
+    out = np.full(len(x), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        out[lag:] = x[lag:] / x[:-lag]
+    return out
+
+
+def compute_feature_matrix(df: pd.DataFrame) -> FeatureMatrix:
+    """
+    NumPy kernel for the indicators of FeatureEngineer.compute_features.
+    Each indicator is computed in float64 and written straight into a
+    preallocated float32 matrix; no DataFrame columns are inserted or copied.
+    """
+    o, h, l, c, v = (df[col].to_numpy(dtype=np.float64) for col in ['Open', 'High', 'Low', 'Close', 'Volume'])
+    n = len(c)
+    out = np.empty((n, len(FEATURE_COLUMNS)), dtype=np.float32)
+
+    def put(name, values):
+        out[:, _COL[name]] = values
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # 1. log Returns
+        log_ret = np.log(_shift_ratio(c, 1))
+        put('log_ret', log_ret)
+
+        # 2. Moving Averages
+        for period in [9, 20, 50, 200]:
+            put(f'SMA_{period}', _rolling_mean(c, period))
+
+        # 3. RSI (first diff is NaN and counts as zero gain/loss, like pandas where())
+        delta = np.concatenate(([np.nan], np.diff(c)))
+        gain = _rolling_mean(np.where(delta > 0, delta, 0.0), 14)
+        loss = _rolling_mean(np.where(delta < 0, -delta, 0.0), 14)
+        rsi = 100 - (100 / (1 + gain / loss))
+        put('RSI', rsi)
+
+        # 4. MACD
+        macd = _ewm(c, 12) - _ewm(c, 26)
+        put('MACD', macd)
+        put('MACD_Signal', _ewm(macd, 9))
+
+        # 5. Bollinger Bands
+        bb_mid = _rolling_mean(c, 20)
+        bb_std = _rolling_std(c, 20)
+        bb_upper = bb_mid + 2 * bb_std
+        bb_lower = bb_mid - 2 * bb_std
+        put('BB_Mid', bb_mid)
+        put('BB_Std', bb_std)
+        put('BB_Upper', bb_upper)
+        put('BB_Lower', bb_lower)
+        put('BB_Width', (bb_upper - bb_lower) / bb_mid)
+
+        # 6. ATR (first bar has no previous close: true range is High - Low)
+        prev_close = np.concatenate(([np.nan], c[:-1]))
+        tr = np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+        atr = _rolling_mean(tr, 14)
+        put('ATR', atr)
+
+        # 7. Volume Change
+        put('Vol_Change', _shift_ratio(v, 1) - 1)
+
+        # 8. Momentum (ROC)
+        put('Momentum_10', _shift_ratio(c, 10) - 1)
+
+        # 9. Volatility Ratio (Short term / Long term)
+        put('Vol_Ratio', _rolling_std(c, 5) / bb_std)
+
+    valid = np.isfinite(out).all(axis=1) & np.isfinite(np.column_stack([o, h, l, c, v])).all(axis=1)
+    return FeatureMatrix(out, valid, df.index, c, log_ret, atr)
+
+
+def compute_labels(close: np.ndarray, horizons=None, thresholds=None) -> np.ndarray:
+    """
+    int8 (n_rows x n_horizons) labels like generate_targets: 1 if the return over
+    the next h rows exceeds the horizon's threshold, -1 if below minus it, else 0.
+    The last h rows of each column have no future bar and are left at 0.
+    """
+    horizons = horizons or config.TARGET_HORIZONS
+    thresholds = thresholds or config.TARGET_THRESHOLDS
+    return label_matrix(close, horizons, threshold_row(horizons, thresholds))
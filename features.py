@@ -1,6 +1,18 @@
 import pandas as pd
 import numpy as np
 import config
+from labels import label_matrix, threshold_row
+
+# Indicator columns added by compute_features, in the order they are added
+# (the column order the models are trained on).
+FEATURE_COLUMNS = [
+    'log_ret', 'SMA_9', 'SMA_20', 'SMA_50', 'SMA_200', 'RSI', 'MACD', 'MACD_Signal',
+    'BB_Mid', 'BB_Std', 'BB_Upper', 'BB_Lower', 'BB_Width', 'ATR', 'Vol_Change',
+    'Momentum_10', 'Vol_Ratio'
+]
+# Bump whenever FEATURE_COLUMNS or an indicator definition changes; models and
+# cached feature matrices built against another version must not be reused.
+FEATURE_SCHEMA_VERSION = 1
 
 class FeatureEngineer:
     """
@@ -77,37 +89,34 @@ class FeatureEngineer:
         atr = tr.rolling(window=period).mean()
         return atr
 
-    def generate_targets(self, df: pd.DataFrame) -> pd.DataFrame:
+    def compute_volatility(self, df: pd.DataFrame, interval: str = config.INTERVAL, source: str = config.VOLATILITY_SOURCE) -> pd.Series:
         """
-        Creates 'target_N' columns for each horizon in config.
+        Annualized volatility per bar, derived from features already computed by
+        compute_features: rolling std of 'log_ret' ("std") or 'ATR' / Close ("atr").
+        Used to price the simulated option chain.
         """
-        valid_rows = df.index
+        bars_per_year = config.BARS_PER_YEAR.get(interval, config.BARS_PER_YEAR["1d"])
         
-        for h in config.TARGET_HORIZONS:
-            threshold = config.TARGET_THRESHOLDS.get(h, 0.002)
-            
-            # Future return over 'h' bars
-            col_ret = f'future_ret_{h}h'
-            col_target = f'target_{h}h'
-            
-            df[col_ret] = df['Close'].shift(-h) / df['Close'] - 1
-            
-            conditions = [
-                (df[col_ret] > threshold),
-                (df[col_ret] < -threshold)
-            ]
-            choices = [1, -1] # 1=Bull, -1=Bear
+        if source == "atr":
+            # For a random walk, E[true range] ~ 1.596 * sigma (Parkinson), so sigma ~ ATR * sqrt(pi / 8)
+            per_bar = (df['ATR'] / df['Close']) * np.sqrt(np.pi / 8)
+        else:
+            per_bar = df['log_ret'].rolling(window=config.VOLATILITY_WINDOW).std()
             
-            df[col_target] = np.select(conditions, choices, default=0)
-            
-            # Update valid rows to ensure we don't train on NaNs
-            # The last 'h' rows will have NaN for this horizon
-            valid_rows = valid_rows.intersection(df.dropna(subset=[col_ret]).index)
+        vol = per_bar * np.sqrt(bars_per_year)
+        return vol.bfill().fillna(config.DEFAULT_VOLATILITY).clip(lower=config.MIN_VOLATILITY)
 
-        # We drop rows that have NaN in ANY target (intersection of validity)
-        # Or we can keep them and handle NaNs during training selection.
-        # For simplicity, let's just drop the max horizon Nans to support all targets.
+    def generate_targets(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Creates 'target_N' columns for each horizon in config.
+        """
+        horizons = config.TARGET_HORIZONS
+        # 1=Bull, -1=Bear, 0=flat; one int8 column per horizon from a single pass over Close
+        labels = label_matrix(df['Close'].to_numpy(), horizons, threshold_row(horizons, config.TARGET_THRESHOLDS))
+        for k, h in enumerate(horizons):
+            df[f'target_{h}h'] = labels[:, k]
         
+        # The last max_h rows have no future bar for every horizon; drop them.
         max_h = max(config.TARGET_HORIZONS)
         df = df.iloc[:-max_h] 
         
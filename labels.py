@@ -0,0 +1,43 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import List
+
+
+def forward_returns(close: np.ndarray, horizons: List[int]) -> np.ndarray:
+    """
+    float64 (n_rows x n_horizons) returns from each row's close to the close h
+    rows later, NaN where there is no such row. All horizons are read from one
+    strided (n_rows x max_h+1) view of the closes; nothing is shifted or copied per horizon.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    n, max_h = len(close), max(horizons)
+    if n == 0:
+        return np.full((0, len(horizons)), np.nan) # too short for the strided view
+    padded = np.concatenate([close, np.full(max_h, np.nan)])
+    windows = sliding_window_view(padded, max_h + 1)[:n] # row i: close[i], ..., close[i + max_h]
+    return windows[:, list(horizons)] / close[:, None] - 1
+
+
+def label_matrix(close: np.ndarray, horizons: List[int], thresholds) -> np.ndarray:
+    """
+    int8 ternary labels for every (threshold set, horizon): 1 if the forward
+    return exceeds the threshold, -1 if below minus it, else 0 (also where the
+    return is unknown, i.e. the last h rows).
+
+    thresholds is (n_sets x n_horizons), one row per set, or a single row.
+    Returns (n_rows x n_sets * n_horizons); column s * n_horizons + k is set s, horizon k.
+    """
+    thresholds = np.atleast_2d(np.asarray(thresholds, dtype=np.float64))
+    if thresholds.shape[1] != len(horizons):
+        raise ValueError(f"Expected {len(horizons)} thresholds per set, got {thresholds.shape[1]}")
+    ret = forward_returns(close, horizons)[:, None, :] # (rows, 1, horizons) against (sets, horizons)
+    labels = (ret > thresholds).astype(np.int8)
+    labels -= ret < -thresholds
+    return labels.reshape(len(ret), thresholds.shape[0] * len(horizons))
+
+
+def threshold_row(horizons: List[int], thresholds: dict, default: float = 0.002) -> List[float]:
+    """
+    A config-style {horizon: threshold} dict as one threshold set for label_matrix.
+    """
+    return [thresholds.get(h, default) for h in horizons]
@@ -0,0 +1,232 @@
+import asyncio
+import time
+import pandas as pd
+import config
+from concurrent.futures import ThreadPoolExecutor
+from metrics import METRICS, stage_of, tag_stage
+from datetime import timedelta
+from typing import List
+
+_UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def interval_seconds(interval: str) -> int:
+    """
+    Bar length of a yfinance-style interval ("5m", "1h", "1d") in seconds.
+    """
+    return int(interval[:-1]) * _UNIT_SECONDS[interval[-1]]
+
+
+def session_closes(day: pd.Timestamp, interval: str = config.INTERVAL) -> List[pd.Timestamp]:
+    """
+    Bar close times of one session: every interval from MARKET_OPEN, the last
+    (possibly shorter) bar closing at MARKET_CLOSE. Daily bars close at MARKET_CLOSE.
+    """
+    open_ = day.replace(hour=config.MARKET_OPEN[0], minute=config.MARKET_OPEN[1], second=0, microsecond=0, nanosecond=0)
+    close = day.replace(hour=config.MARKET_CLOSE[0], minute=config.MARKET_CLOSE[1], second=0, microsecond=0, nanosecond=0)
+    step = pd.Timedelta(seconds=interval_seconds(interval))
+    closes = []
+    t = open_ + step
+    while step < pd.Timedelta(days=1) and t < close:
+        closes.append(t)
+        t += step
+    closes.append(close)
+    return closes
+
+
+def next_bar_close(now: pd.Timestamp, interval: str = config.INTERVAL) -> pd.Timestamp:
+    """
+    First bar close after `now` (tz-aware), on weekdays; exchange holidays are
+    not known here, so on those the engine wakes and finds no new bar.
+    """
+    now = now.tz_convert(config.MARKET_TIMEZONE)
+    day = now.normalize()
+    while True:
+        if day.weekday() < 5:
+            for close in session_closes(day, interval):
+                if close > now:
+                    return close
+        day = pd.Timestamp(day.date() + timedelta(days=1)).tz_localize(config.MARKET_TIMEZONE)
+
+
+def closed_bars(data, close: pd.Timestamp):
+    """
+    A trader's downloaded bars (one frame, or {symbol: frame}) without the rows
+    starting at or after `close`: the download may already hold the bar that just opened.
+    """
+    def before(df):
+        if df.empty:
+            return df
+        cutoff = close if df.index.tz is not None else close.tz_convert(config.MARKET_TIMEZONE).tz_localize(None)
+        return df[df.index < cutoff]
+    return {s: before(df) for s, df in data.items()} if isinstance(data, dict) else before(data)
+
+
+def newest_bar(data):
+    """
+    Timestamp of the newest bar in a trader's bars (one frame, or {symbol: frame}); None if empty.
+    """
+    frames = data.values() if isinstance(data, dict) else [data]
+    stamps = [df.index[-1] for df in frames if not df.empty]
+    return max(stamps) if stamps else None
+
+
+class LiveEngine:
+    """
+    Runs LiveTraders (or a MultiSymbolTrader) on one asyncio loop that sleeps
+    until each bar closes (plus a grace period for the data to be published)
+    instead of polling.
+
+    Each bar, every symbol runs concurrently: the download and the model
+    refresh, then features/inference and the volatility estimate, then exits
+    and entry. The blocking calls (yfinance, sklearn, broker) run on thread
+    pools, downloads and broker calls apart from the CPU work, each stage under
+    its own timeout, so one slow symbol skips its bar without stalling the others.
+    """
+
+    def __init__(self, traders, interval: str = config.INTERVAL, grace: float = config.LIVE_BAR_GRACE_SECONDS,
+                 io_workers: int = config.LIVE_IO_WORKERS, cpu_workers: int = config.LIVE_CPU_WORKERS):
+        self.traders = list(traders)
+        self.interval = interval
+        self.grace = grace
+        self.io = ThreadPoolExecutor(io_workers, thread_name_prefix="live-io")
+        self.cpu = ThreadPoolExecutor(cpu_workers, thread_name_prefix="live-cpu")
+        self._last_bar = {} # symbol -> timestamp of the newest bar acted on
+        self._running = {} # symbol -> futures of its latest stages (a thread may outlive its timeout)
+        self.bar_latency = [] # run_stream: seconds from a bar's first arrival to every trader having acted
+
+    async def run(self, bars: int = None):
+        """
+        Runs forever, or for `bars` bar closes.
+        """
+        try:
+            n = 0
+            while bars is None or n < bars:
+                now = pd.Timestamp.now(tz=config.MARKET_TIMEZONE)
+                close = next_bar_close(now, self.interval)
+                await asyncio.sleep((close - now).total_seconds() + self.grace)
+                await self.run_bar(close)
+                n += 1
+        finally:
+            self._shutdown()
+
+    async def run_stream(self, stream, bars: int = None, warm_up: bool = True):
+        """
+        Event-driven alternative to run(): acts on each completed bar from a
+        MarketStream as it arrives. After the first symbol's bar, waits up to the
+        grace period for the other symbols' bars, so one step covers them all.
+        Runs forever, or for `bars` bars; raises if the feed stops (e.g. StreamError
+        on rejected keys).
+        """
+        loop = asyncio.get_running_loop()
+        if warm_up:
+            # Indicator history from stored/downloaded bars, before the feed starts
+            await asyncio.gather(*(loop.run_in_executor(self.io, t.warm_up, None, stream) for t in self.traders))
+        feed = asyncio.create_task(stream.run())
+        try:
+            n, last = 0, 0
+            while bars is None or n < bars:
+                _, start_ns = await self._next_bar(stream, feed)
+                if start_ns <= last:
+                    continue # already handled with another symbol's bar
+                await stream.wait_for_bar(start_ns, self.grace)
+                last = start_ns
+                await self.run_bar(pd.Timestamp(start_ns, tz="UTC"), stream)
+                received = stream.received_at.pop(start_ns, None)
+                for stale in [k for k in stream.received_at if k < start_ns]:
+                    stream.received_at.pop(stale)
+                if received is not None:
+                    self.bar_latency.append(time.perf_counter() - received)
+                    METRICS.observe("stream_bar", "all", self.bar_latency[-1])
+                n += 1
+        finally:
+            feed.cancel()
+            self._shutdown()
+
+    async def _next_bar(self, stream, feed: asyncio.Task):
+        """
+        The next bar event, or the feed's exception if it stopped first.
+        """
+        get = asyncio.ensure_future(stream.bars.get())
+        await asyncio.wait({get, feed}, return_when=asyncio.FIRST_COMPLETED)
+        if get.done():
+            return get.result()
+        get.cancel()
+        error = feed.exception() if not feed.cancelled() else None
+        error = error or RuntimeError("Market stream stopped")
+        label = ",".join(stream.symbols)
+        METRICS.error(label, "stream", error)
+        print(f"Market stream for {label} stopped: {error}")
+        raise error
+
+    def _shutdown(self):
+        self.io.shutdown(wait=False)
+        self.cpu.shutdown(wait=False)
+
+    async def run_bar(self, close: pd.Timestamp, stream=None):
+        """
+        One bar for every trader, concurrently: the bar closing at `close`,
+        downloaded, or from `stream` if given (`close` is then the start of the
+        completed bar). A failure or timeout only skips that symbol.
+        """
+        results = await asyncio.gather(*(self._on_bar(t, close, stream) for t in self.traders), return_exceptions=True)
+        for trader, result in zip(self.traders, results):
+            if isinstance(result, asyncio.TimeoutError):
+                METRICS.missed(trader.symbol, "timeout", stage_of(result))
+                print(f"[{close}] {trader.symbol}: {stage_of(result)} timed out, skipping this bar")
+            elif isinstance(result, Exception):
+                METRICS.error(trader.symbol, stage_of(result), result)
+                print(f"[{close}] {trader.symbol}: Error in {stage_of(result)}: {result}")
+
+    async def _call(self, trader, executor, timeout: float, stage: str, fn, *args):
+        """
+        fn(*args) on the executor under a timeout. Exceptions (and the timeout)
+        are tagged with `stage`, unless a finer METRICS.timer stage inside fn
+        (e.g. "inference" within "predict") already tagged them.
+        """
+        future = executor.submit(fn, *args)
+        self._running.setdefault(trader.symbol, []).append(future)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except Exception as e:
+            tag_stage(e, stage)
+            raise
+
+    async def _on_bar(self, trader, close: pd.Timestamp, stream=None):
+        running = [f for f in self._running.get(trader.symbol, []) if not f.done()]
+        self._running[trader.symbol] = running
+        if running:
+            # a stage that timed out last bar is still using this trader's state
+            METRICS.missed(trader.symbol, "busy")
+            print(f"{trader.symbol}: previous bar still running, skipping this bar")
+            return
+
+        with METRICS.timer("bar", trader.symbol):
+            await self._stages(trader, close, stream)
+
+    async def _stages(self, trader, close: pd.Timestamp, stream=None):
+        timeout = config.LIVE_FETCH_TIMEOUT_SECONDS
+        if stream is not None:
+            # Completed bars are already in memory (up to this bar, if more came in since)
+            data = trader.stream_bars(stream, close.value)
+            await self._call(trader, self.io, timeout, "model_refresh", trader._refresh_model)
+        else:
+            data, _ = await asyncio.gather(self._call(trader, self.io, timeout, "fetch", trader.fetch_bars),
+                                           self._call(trader, self.io, timeout, "model_refresh", trader._refresh_model))
+            data = closed_bars(data, close)
+        newest = newest_bar(data)
+        if newest is None or newest == self._last_bar.get(trader.symbol):
+            METRICS.missed(trader.symbol, "no_new_bar")
+            return # no new bar (e.g. a market holiday)
+        self._last_bar[trader.symbol] = newest
+        METRICS.incr("bars", trader.symbol)
+
+        timeout = config.LIVE_SIGNAL_TIMEOUT_SECONDS
+        prediction, vol = await asyncio.gather(
+            self._call(trader, self.cpu, timeout, "predict", trader.predict, data, True),
+            self._call(trader, self.cpu, timeout, "volatility", trader._volatility, data))
+        if prediction is None:
+            return
+
+        await self._call(trader, self.io, config.LIVE_ORDER_TIMEOUT_SECONDS, "act",
+                         trader.act, prediction, data, vol)
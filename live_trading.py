@@ -1,66 +1,199 @@
-import time
+import asyncio
+import random
+import numpy as np
 import pandas as pd
-import schedule
 from datetime import datetime
+from typing import Dict, List
 import config
 from data_loader import DataManager
-from features import FeatureEngineer
+from features import FEATURE_COLUMNS, FeatureEngineer
 from models import SymbolModel
+from model_registry import ModelRegistry
 from broker_client import PaperBroker
+from alpaca_broker import AlpacaBroker
+from feature_kernel import compute_feature_matrix
+from option_chain import CALL, PUT
+from pricing import option_prices
+from tree_export import EnsembleBatch
 from journal import TradeJournal
+from streaming_features import IncrementalFeatures
+from live_engine import LiveEngine
+from market_stream import MarketStream
+from metrics import METRICS, start_metrics
+
+
+def new_broker():
+    return PaperBroker(initial_balance=config.INITIAL_BALANCE) if config.PAPER_TRADING else AlpacaBroker()
+
+
+def account_snapshot(broker) -> dict:
+    """
+    Equity, buying power and open positions from one broker snapshot. Entries
+    add their orders to it, so symbols handled after them see what is left.
+    """
+    equity, buying_power, positions = broker.snapshot()
+    return {"equity": equity, "buying_power": buying_power, "positions": list(positions)}
+
+
+def bar_time(df: pd.DataFrame) -> datetime:
+    """
+    Exchange wall-clock time (tz dropped, as in the backtest) of the newest bar,
+    the "now" for trading windows and expiries, so replayed bars trade on their own dates.
+    """
+    ts = df.index[-1]
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert(config.MARKET_TIMEZONE).tz_localize(None)
+    return ts.to_pydatetime()
+
 
 class LiveTrader:
-    def __init__(self, symbol: str):
+    def __init__(self, symbol: str, dm: DataManager = None, fe: FeatureEngineer = None, broker=None):
+        """
+        dm, fe and broker can be shared with other traders (see MultiSymbolTrader).
+        """
         self.symbol = symbol
-        self.dm = DataManager()
-        self.fe = FeatureEngineer()
+        self.dm = dm or DataManager()
+        self.fe = fe or FeatureEngineer()
         self.model = SymbolModel(symbol)
-        self.broker = PaperBroker(initial_balance=config.INITIAL_BALANCE)
+        self.registry = ModelRegistry()
+        self.broker = broker or new_broker()
         self.journal = TradeJournal(symbol)
+        # Incremental indicator state, warmed up from stored history on the first bar
+        self.stream = None
         
         self.model.load()
         if not self.model.models:
             raise ValueError(f"Model for {symbol} not found. Train first.")
 
-    def trading_loop(self):
+    def trading_loop(self, stream: bool = False):
         print(f"Started Live/Sim Trading for {self.symbol}...")
-        
-        while True:
-            try:
-                self.on_bar()
-            except Exception as e:
-                print(f"Error in loop: {e}")
-            
-            # Wait for next check (e.g. 1 minute or 1 hour)
-            time.sleep(60) 
+        start_metrics()
+        engine = LiveEngine([self])
+        asyncio.run(engine.run_stream(MarketStream([self.symbol])) if stream else engine.run())
 
     def on_bar(self):
+        """
+        One synchronous pass over the newest bar (LiveEngine runs the same
+        stages concurrently, with timeouts).
+        """
+        # 0. Pick up a model version activated (or rolled back) since the last bar
+        self._refresh_model()
+        
         # 1. Get latest data
-        df = self.dm.fetch_data(self.symbol, interval="1h") # Fetch recent
+        df = self.fetch_bars()
         if df.empty: return
 
-        # 2. Features
-        df = self.fe.compute_features(df)
-        
-        # 3. Predict (Last bar)
-        feature_cols = [c for c in df.columns if c not in ['Open', 'High', 'Low', 'Close', 'Volume', 'target', 'future_ret']]
-        last_row = df.iloc[[-1]][feature_cols]
+        # 2-3. Features and prediction
+        prediction = self.predict(df)
+        if prediction is None: return
+
+        # 4. Execute
+        self.act(prediction, df, self._volatility(df))
+
+    def fetch_bars(self) -> pd.DataFrame:
+        with METRICS.timer("fetch", self.symbol):
+            return self.dm.fetch_data(self.symbol, interval=config.INTERVAL) # Fetch recent
+
+    def warm_up(self, df: pd.DataFrame = None, stream=None):
+        """
+        Feeds the bars that have closed (default: the stored and downloaded
+        history) to the incremental features, and to the MarketStream's buffer
+        if given, before streamed bars arrive.
+        """
+        df = self.fetch_bars() if df is None else df
+        closed = df.iloc[:-1] # the newest bar may still be forming
+        self.stream = IncrementalFeatures().warm_up(closed)
+        if stream is not None:
+            stream.seed(self.symbol, closed)
+
+    def stream_bars(self, stream, until: int = None) -> pd.DataFrame:
+        return stream.frame(self.symbol, until)
+
+    def predict(self, df: pd.DataFrame, completed: bool = False):
+        """
+        Signal for the newest bar (None while the features warm up, or if a
+        completed bar brought nothing new).
+        """
+        # Features (O(1) per new bar after the first call)
+        with METRICS.timer("features", self.symbol):
+            features = self._latest_features(df, completed)
+        if features is None: return None
         
-        preds_dict = self.model.predict(last_row)
+        # Predict (Last bar): compiled trees, same labels as self.model.predict
+        with METRICS.timer("inference", self.symbol):
+            preds_dict = self.model.compiled().predict(features)
         # Use 1H as primary
         prediction = preds_dict.get(1, [0])[0]
         # proba = self.model.predict_proba(last_row)[0]
 
-        print(f"[{datetime.now()}] Signal: {prediction}")
+        print(f"[{datetime.now()}] {self.symbol} Signal: {prediction}")
+        self._decided(prediction)
+        return prediction
 
-        # 4. Execute
-        current_price = df['Close'].iloc[-1]
-        self._manage_positions(current_price)
-        self._execute_entry(prediction, current_price)
+    def act(self, prediction, df: pd.DataFrame, vol):
+        """
+        Exits on the open positions, then a new entry on the signal, at the newest bar's time.
+        """
+        current_price, now = df['Close'].iloc[-1], bar_time(df)
+        self._manage_positions(current_price, vol, now=now)
+        self._execute_entry(prediction, current_price, vol, now=now)
+
+    def _positions(self, positions=None):
+        """
+        This symbol's open positions, out of `positions` if the caller already fetched the account's.
+        """
+        positions = self.broker.get_positions() if positions is None else positions
+        return [p for p in positions
+                if (p['contract'].underlying if p.get('contract') is not None else p['symbol']) == self.symbol]
         
-    def _execute_entry(self, signal, current_price):
+    def _refresh_model(self):
+        """
+        Swaps in the registry's current version if it changed. The new models are
+        fully loaded before the single assignment, so a bar is always scored by
+        one complete version, old or new.
+        """
+        current = self.registry.current_version(self.symbol)
+        if current is None or current == self.model.version:
+            return
+        model = SymbolModel(self.symbol)
+        model.load(current)
+        if model.models:
+            previous, self.model = self.model.version, model
+            self.registry.release(self.symbol, current)
+            print(f"[{datetime.now()}] Switched {self.symbol} models from v{previous} to v{current}")
+
+    def _latest_features(self, df: pd.DataFrame, completed: bool = False):
+        """
+        Commits bars that closed since the last call to the incremental feature
+        state and previews the newest (possibly still forming) bar; with
+        completed=True (streamed bars) the newest bar is committed too.
+        Same values as compute_features(df).iloc[-1]; None while warming up.
+        """
+        if self.stream is None:
+            self.stream = IncrementalFeatures().warm_up(df.iloc[:-1])
+            closed = df.iloc[-1:] if completed else df.iloc[:0]
+        else:
+            closed = df[df.index > self.stream.last_timestamp]
+            closed = closed if completed else closed.iloc[:-1]
+        features = None
+        for ts, bar in closed.iterrows():
+            features = self.stream.update(bar, ts)
+        return features if completed else self.stream.preview(df.iloc[-1])
+
+    def _decided(self, signal):
+        METRICS.incr("decisions", self.symbol, signal=int(signal))
+        METRICS.event("decision", self.symbol, signal=int(signal), model_version=self.model.version)
+
+    def _volatility(self, df: pd.DataFrame) -> float:
+        """
+        Annualized volatility of the newest bar, used to price the option chain.
+        """
+        with METRICS.timer("volatility", self.symbol):
+            return float(self.fe.compute_volatility(compute_feature_matrix(df).volatility_frame()).iloc[-1])
+
+    def _execute_entry(self, signal, current_price, vol, account: dict = None, now: datetime = None):
         # Time Check
-        now = datetime.now()
+        now = now or datetime.now()
         if now.weekday() >= 5: # Sat/Sun
              return
 
@@ -82,28 +215,178 @@ class LiveTrader:
             # print("Outside trading hours.") # Optional noise reduction
             return
 
-        if len(self.broker.get_positions()) > 0 or signal == 0:
+        if signal == 0:
             return
 
-        # Simple Paper Entry Logic (Copy of Backtest essentially)
-        print(f"Entering trade {signal}...")
-        # ... logic similar to backtest ...
-        # For brevity, placeholders:
-        
-        contract_id = f"{self.symbol}_{'C' if signal==1 else 'P'}_SIM"
-        price = 1.00 # Dummy
-        
-        self.broker.place_order(contract_id, 10, 'buy', price=price, time=datetime.now())
-        print("Order Placed.")
-
-    def _manage_positions(self, current_price):
-        # Check TP/SL
-        for pos in self.broker.get_positions():
-             # Logic to check real option price would accept API client here
-             # Simulation: Close after 1 minute for test
-             self.broker.close_position(pos['id'], pos['entry_price'] * 1.1, time=datetime.now())
-             
-             # Log
-             last_trade = self.broker.trade_history[-1]
-             self.journal.log_trade(last_trade)
-             print("Position Closed and Logged.")
+        # One position per symbol, PORTFOLIO_MAX_OPEN_POSITIONS across the account
+        # (`account` is the caller's account_snapshot; the new order is added to it for the next symbol)
+        account = account_snapshot(self.broker) if account is None else account
+        positions = account["positions"]
+        if self._positions(positions) or len(positions) >= config.PORTFOLIO_MAX_OPEN_POSITIONS:
+            return
+
+        # Same entry as Backtester._process_entry: size on equity, nearest-to-money contract
+        position_size_usd = account["equity"] * config.MIN_RISK_PERCENT
+        option_chain = self.dm.get_option_chain(self.symbol, current_price, now, vol=vol)
+        idx = option_chain.select(CALL if signal == 1 else PUT, current_price, near_money=0.01)
+        if idx < 0:
+            return
+
+        contract = option_chain.contract(idx)
+        price = option_chain.price_of(idx)
+        # No more than the cash on hand (buying power at Alpaca) can pay for; the account is shared across symbols
+        qty = min(int(position_size_usd / price), int(account["buying_power"] / price))
+        if qty < 1:
+            return
+
+        sl_pct = random.uniform(config.MIN_STOP_LOSS_PERCENT, config.MAX_STOP_LOSS_PERCENT)
+        tp_pct = random.uniform(config.MIN_TAKE_PROFIT_PERCENT, config.MAX_TAKE_PROFIT_PERCENT)
+
+        print(f"Entering trade {signal}: {qty} x {contract.id} @ {price:.2f}")
+        with METRICS.timer("order", self.symbol):
+            order = self.broker.place_order(
+                symbol=contract.id,
+                contract=contract,
+                quantity=qty,
+                side='buy',
+                order_type='limit',
+                price=price,
+                time=now,
+                stop_loss=price * (1 - sl_pct),
+                take_profit=price * (1 + tp_pct)
+            )
+        METRICS.incr("orders", self.symbol, side="buy", filled=bool(order))
+        if order:
+            positions.append(order)
+            account["buying_power"] -= qty * price
+            METRICS.event("entry", self.symbol, contract=contract.id, quantity=qty, price=price)
+            print("Order Placed.")
+
+    def _manage_positions(self, current_price, vol, positions=None, now: datetime = None):
+        """
+        Closes positions at expiry (intrinsic value) or when the option price
+        crosses the stop loss / take profit. The price is the broker's mark when
+        it reports one, else the model price of the contract. Positions without
+        a known stop loss / take profit (opened elsewhere) only close at expiry.
+        """
+        now = now or datetime.now()
+        now_ns = pd.Timestamp(now).value
+        for pos in self._positions(positions):
+            contract = pos['contract']
+            if contract is None:
+                continue
+
+            if now_ns >= contract.expiry_close_ns:
+                exit_price = contract.intrinsic(current_price)
+            elif pos['stop_loss'] is None or pos['take_profit'] is None:
+                continue
+            else:
+                option_price = pos.get('current_price')
+                if option_price is None:
+                    option_price = float(option_prices(current_price, contract.strike, contract.right,
+                                                       now_ns, contract.expiry_ns, vol))
+                if pos['stop_loss'] < option_price < pos['take_profit']:
+                    continue
+                exit_price = option_price
+
+            with METRICS.timer("order", self.symbol):
+                trade = self.broker.close_position(pos['id'], exit_price, time=now, position=pos)
+            METRICS.incr("orders", self.symbol, side="sell", filled=bool(trade))
+            if trade:
+                with METRICS.timer("journal", self.symbol):
+                    self.journal.log_trade(trade)
+                METRICS.event("exit", self.symbol, contract=contract.id, price=exit_price, pnl=trade.get('pnl'))
+                print("Position Closed and Logged.")
+
+
+class MultiSymbolTrader:
+    """
+    Every symbol in one process against one account. The symbols share one
+    DataManager, FeatureEngineer and broker; bars come from batched downloads,
+    models from the process-wide registry cache, and each bar scores all
+    symbols in one EnsembleBatch call. Runs on LiveEngine like a LiveTrader.
+    """
+
+    def __init__(self, symbols: List[str], broker=None):
+        self.symbols = list(symbols)
+        self.symbol = ",".join(self.symbols) # label in LiveEngine logs
+        self.dm = DataManager()
+        self.fe = FeatureEngineer()
+        self.broker = broker or new_broker()
+        self.traders = [LiveTrader(s, dm=self.dm, fe=self.fe, broker=self.broker) for s in self.symbols]
+        self._batch = None
+
+    def trading_loop(self, stream: bool = False):
+        print(f"Started Live/Sim Trading for {', '.join(self.symbols)}...")
+        start_metrics()
+        engine = LiveEngine([self])
+        asyncio.run(engine.run_stream(MarketStream(self.symbols)) if stream else engine.run())
+
+    def fetch_bars(self) -> Dict[str, pd.DataFrame]:
+        with METRICS.timer("fetch", self.symbol):
+            return self.dm.fetch_many(self.symbols, interval=config.INTERVAL)
+
+    def warm_up(self, data: Dict[str, pd.DataFrame] = None, stream=None):
+        data = self.fetch_bars() if data is None else data
+        for trader in self.traders:
+            if not data[trader.symbol].empty:
+                trader.warm_up(data[trader.symbol], stream)
+
+    def stream_bars(self, stream, until: int = None) -> Dict[str, pd.DataFrame]:
+        return {s: stream.frame(s, until) for s in self.symbols}
+
+    def _refresh_model(self):
+        for trader in self.traders:
+            trader._refresh_model()
+
+    def batch(self) -> EnsembleBatch:
+        """
+        The symbols' compiled models merged into one; rebuilt when any symbol switches version.
+        """
+        compiled = [trader.model.compiled() for trader in self.traders]
+        if self._batch is None or any(a is not b for a, b in zip(compiled, self._batch.ensembles)):
+            self._batch = EnsembleBatch(compiled)
+        return self._batch
+
+    def predict(self, data: Dict[str, pd.DataFrame], completed: bool = False):
+        """
+        {symbol: signal} for the symbols with a new feature row (None if there are none).
+        """
+        rows, ready = [], []
+        for trader in self.traders:
+            df = data.get(trader.symbol)
+            features = None
+            if df is not None and not df.empty:
+                with METRICS.timer("features", trader.symbol):
+                    features = trader._latest_features(df, completed)
+            ready.append(features is not None)
+            rows.append(features if features is not None else np.full(len(FEATURE_COLUMNS), np.nan))
+        if not any(ready):
+            return None
+
+        with METRICS.timer("inference", self.symbol):
+            preds = self.batch().predict(np.vstack(rows))
+        signals = {trader.symbol: int(p.get(1, [0])[0]) for trader, p, ok in zip(self.traders, preds, ready) if ok}
+        print(f"[{datetime.now()}] Signals: {signals}")
+        for trader in self.traders:
+            if trader.symbol in signals:
+                trader._decided(signals[trader.symbol])
+        return signals
+
+    def _volatility(self, data: Dict[str, pd.DataFrame]) -> Dict[str, float]:
+        return {t.symbol: t._volatility(data[t.symbol]) for t in self.traders if not data[t.symbol].empty}
+
+    def act(self, signals: Dict[str, int], data: Dict[str, pd.DataFrame], vol: Dict[str, float]):
+        """
+        Exits for every symbol, then entries, each from one broker request for the whole account.
+        """
+        active = [t for t in self.traders if t.symbol in signals]
+        positions = self.broker.get_positions()
+        for trader in active:
+            trader._manage_positions(data[trader.symbol]['Close'].iloc[-1], vol[trader.symbol], positions,
+                                     now=bar_time(data[trader.symbol]))
+
+        account = account_snapshot(self.broker) # entries add their orders to it
+        for trader in active:
+            trader._execute_entry(signals[trader.symbol], data[trader.symbol]['Close'].iloc[-1],
+                                  vol[trader.symbol], account, now=bar_time(data[trader.symbol]))
@@ -1,15 +1,24 @@
 import argparse
 import sys
 import config
-from training import run_training_pipeline
+from training import run_training_pipeline, run_training_all
 from backtest import Backtester
-from live_trading import LiveTrader
+from live_trading import LiveTrader, MultiSymbolTrader
 from visualization import Visualizer
 from data_loader import DataManager
-from features import FeatureEngineer
+from feature_cache import FeatureCache
 from models import SymbolModel
 from journal import TradeJournal
 from plot_all_trades import plot_all_trades
+from sweep import run_sweep
+from monte_carlo import run_monte_carlo
+from portfolio_backtest import PortfolioBacktester
+from benchmarks import broker_latency, compare_backends, compare_horizon_designs, inference_latency
+from walk_forward import run_walk_forward
+from tuning import run_tuning_all
+from models import MODEL_TYPES
+from model_registry import ModelRegistry
+from stream_replay import replay_live
 import pandas as pd
 
 def main():
@@ -20,18 +29,92 @@ def main():
     # Train
     train_parser = subparsers.add_parser("train", help="Train ML models")
     train_parser.add_argument("--symbol", type=str, default="SPY", help="Symbol to train")
+    train_parser.add_argument("--model-type", type=str, default=config.MODEL_TYPE, choices=MODEL_TYPES, help="Model backend")
+    train_parser.add_argument("--shared", action="store_true", default=config.SHARED_HORIZON_MODEL, help="One model for all horizons")
 
+    # Train All (every symbol and horizon in parallel)
+    train_all_parser = subparsers.add_parser("train-all", help="Train all symbols and horizons in parallel")
+    train_all_parser.add_argument("--symbols", type=str, nargs="+", default=config.SYMBOLS, help="Symbols to train (default: config.SYMBOLS)")
+    train_all_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    train_all_parser.add_argument("--model-type", type=str, default=config.MODEL_TYPE, choices=MODEL_TYPES, help="Model backend")
+    train_all_parser.add_argument("--shared", action="store_true", default=config.SHARED_HORIZON_MODEL, help="One model per symbol for all horizons")
+
+    # Benchmark model backends
+    bench_parser = subparsers.add_parser("benchmark", help="Compare fit time, predict latency and accuracy of model backends")
+    bench_parser.add_argument("--symbol", type=str, default="SPY", help="Symbol whose data to benchmark on")
+    bench_parser.add_argument("--model-types", type=str, nargs="+", default=list(MODEL_TYPES), choices=MODEL_TYPES, help="Backends to compare")
+    bench_parser.add_argument("--inference", action="store_true", help="Time the saved models' single-bar prediction: sklearn vs compiled trees")
+    bench_parser.add_argument("--shared", action="store_true", help="Compare one model per horizon with one shared multi-horizon model")
+    bench_parser.add_argument("--broker", action="store_true", help="Time the Alpaca broker against the local stub server (sequential vs batched)")
+    bench_parser.add_argument("--rate-limit", type=int, default=None, help="With --broker: stub requests allowed per second")
+
+    # Tune
+    tune_parser = subparsers.add_parser("tune", help="Time-series CV hyperparameter search; train uses the best parameters")
+    tune_parser.add_argument("--symbols", type=str, nargs="+", default=config.SYMBOLS, help="Symbols to tune (default: config.SYMBOLS)")
+    tune_parser.add_argument("--model-type", type=str, default=config.MODEL_TYPE, choices=MODEL_TYPES, help="Model backend")
+    tune_parser.add_argument("--candidates", type=int, default=config.TUNE_CANDIDATES, help="Random parameter draws (0: full grid)")
+    tune_parser.add_argument("--folds", type=int, default=config.TUNE_FOLDS, help="Time-series CV folds")
+    tune_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    tune_parser.add_argument("--seed", type=int, default=config.TUNE_SEED, help="Seed for sampling candidates")
+    
     # Backtest
     bt_parser = subparsers.add_parser("backtest", help="Run backtest")
     bt_parser.add_argument("--symbol", type=str, default="SPY", help="Symbol to backtest")
+    bt_parser.add_argument("--seed", type=int, default=None, help="Seed for SL/TP draws (e.g. a Monte Carlo replication seed)")
+    bt_parser.add_argument("--walk-forward", action="store_true", help="Trade on walk-forward out-of-sample predictions")
+    
+    # Walk-forward training
+    wf_parser = subparsers.add_parser("walk-forward", help="Walk-forward training with warm-started refits")
+    wf_parser.add_argument("--symbol", type=str, default="SPY", help="Symbol to train")
+    wf_parser.add_argument("--model-type", type=str, default=config.MODEL_TYPE, choices=MODEL_TYPES, help="Model backend")
+    wf_parser.add_argument("--window", type=str, default=config.WALK_FORWARD_WINDOW, choices=["expanding", "rolling"], help="Training window")
+    wf_parser.add_argument("--train-bars", type=int, default=config.WALK_FORWARD_TRAIN_BARS, help="Initial (or rolling) training window in bars")
+    wf_parser.add_argument("--step", type=int, default=config.WALK_FORWARD_STEP_BARS, help="Bars between retrains")
+    
+    # Portfolio Backtest
+    portfolio_parser = subparsers.add_parser("portfolio", help="Backtest several symbols from one account")
+    portfolio_parser.add_argument("--symbols", type=str, nargs="+", default=config.SYMBOLS, help="Symbols to trade (default: config.SYMBOLS)")
+    portfolio_parser.add_argument("--seed", type=int, default=None, help="Seed for SL/TP draws")
+    portfolio_parser.add_argument("--workers", type=int, default=None, help="Processes for per-symbol feature/prediction prep")
+    
+    # Sweep
+    sweep_parser = subparsers.add_parser("sweep", help="Backtest a grid of risk settings in parallel")
+    sweep_parser.add_argument("--symbol", type=str, default="SPY", help="Symbol to backtest")
+    sweep_parser.add_argument("--samples", type=int, default=None, help="Random configurations to draw (default: full grid)")
+    sweep_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    sweep_parser.add_argument("--seed", type=int, default=config.SWEEP_SEED, help="Seed for sampling and SL/TP draws")
+    
+    # Monte Carlo
+    mc_parser = subparsers.add_parser("monte-carlo", help="Run seeded backtest replications and report percentiles")
+    mc_parser.add_argument("--symbol", type=str, default="SPY", help="Symbol to backtest")
+    mc_parser.add_argument("--runs", type=int, default=config.MONTE_CARLO_RUNS, help="Number of replications")
+    mc_parser.add_argument("--seed", type=int, default=config.MONTE_CARLO_SEED, help="Base seed the replication seeds are spawned from")
+    mc_parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    
+    # Model registry
+    models_parser = subparsers.add_parser("models", help="List, activate or roll back model versions")
+    models_parser.add_argument("--symbol", type=str, default="SPY", help="Symbol whose models to manage")
+    models_parser.add_argument("--activate", type=int, default=None, help="Make version N current")
+    models_parser.add_argument("--rollback", action="store_true", help="Make the previous version current")
     
     # Live
     live_parser = subparsers.add_parser("live", help="Run live/simulated trading")
     live_parser.add_argument("--symbol", type=str, default="SPY", help="Symbol to trade")
+    live_parser.add_argument("--symbols", type=str, nargs="+", help="Trade several symbols in one process on one account")
+    live_parser.add_argument("--stream", action="store_true", help="Act on bars from the Alpaca market data websocket instead of polling")
+
+    # Replay
+    replay_parser = subparsers.add_parser("replay", help="Replay stored bars through the streaming live path (paper account)")
+    replay_parser.add_argument("--symbols", type=str, nargs="+", default=config.SYMBOLS, help="Symbols to replay (default: config.SYMBOLS)")
+    replay_parser.add_argument("--start", type=str, required=True, help="First bar to replay (YYYY-MM-DD); earlier bars warm up the indicators")
+    replay_parser.add_argument("--speed", type=float, default=config.REPLAY_SPEED, help="Times faster than real time (0: as fast as possible)")
+    replay_parser.add_argument("--bars", type=int, default=None, help="Replay at most this many bars per symbol")
     
     # Run All (Train + Backtest + Plot)
     run_all_parser = subparsers.add_parser("run-all", help="Train, Backtest, and Plot")
     run_all_parser.add_argument("--symbol", type=str, default="SPY", help="Symbol to process")
+    run_all_parser.add_argument("--model-type", type=str, default=config.MODEL_TYPE, choices=MODEL_TYPES, help="Model backend")
+    run_all_parser.add_argument("--shared", action="store_true", default=config.SHARED_HORIZON_MODEL, help="One model for all horizons")
 
     # Plot
     plot_parser = subparsers.add_parser("plot", help="Generate performance charts")
@@ -48,12 +131,33 @@ def main():
     args = parser.parse_args()
     
     if args.command == "train":
-        run_training_pipeline(args.symbol)
+        run_training_pipeline(args.symbol, model_type=args.model_type, shared=args.shared)
+        
+    elif args.command == "train-all":
+        run_training_all(args.symbols, workers=args.workers, model_type=args.model_type, shared=args.shared)
+        
+    elif args.command == "benchmark":
+        if args.inference:
+            report = inference_latency(args.symbol)
+        elif args.broker:
+            report = broker_latency(rate_limit=args.rate_limit)
+        elif args.shared:
+            report = compare_horizon_designs(args.symbol, args.model_types)
+        else:
+            report = compare_backends(args.symbol, args.model_types)
+        if not report.empty:
+            print(report.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        
+    elif args.command == "tune":
+        report = run_tuning_all(args.symbols, model_type=args.model_type, candidates=args.candidates or None,
+                                n_folds=args.folds, workers=args.workers, seed=args.seed)
+        if not report.empty:
+            print(report[report["rank"] == 1][["symbol", "horizon", "cv_accuracy", "params"]].to_string(index=False))
         
     elif args.command == "run-all":
         print(f"--- Running Full Pipeline for {args.symbol} ---")
         # 1. Train
-        run_training_pipeline(args.symbol)
+        run_training_pipeline(args.symbol, model_type=args.model_type, shared=args.shared)
         
         # 2. Backtest
         bt = Backtester(args.symbol)
@@ -79,14 +183,13 @@ def main():
         dm = DataManager()
         df = dm.fetch_data(args.symbol)
         if not df.empty:
-            fe = FeatureEngineer()
-            df = fe.compute_features(df)
+            fm = FeatureCache().get(df)
+            df = df[fm.valid]
             model = SymbolModel(args.symbol)
             # Prepare last row
-            feature_cols = [c for c in df.columns if c not in ['Open', 'High', 'Low', 'Close', 'Volume'] and not c.startswith('target') and not c.startswith('future_ret')]
-            last_row = df.iloc[[-1]][feature_cols]
+            last_row = fm.rows()[-1]
             
-            predictions = model.predict(last_row)
+            predictions = model.compiled().predict(last_row)
             # Flatten
             flat_preds = {}
             for h, v in predictions.items():
@@ -107,17 +210,19 @@ def main():
             print("No data found.")
             return
 
-        # 2. Features
-        fe = FeatureEngineer()
-        df = fe.compute_features(df)
+        # 2. Features (cached; bars and features line up on the valid rows)
+        fm = FeatureCache().get(df)
+        df = df[fm.valid]
+        if df.empty:
+            print("Not enough bars to compute features.")
+            return
         
         # 3. Model
         model = SymbolModel(symbol)
         # Prepare last row
-        feature_cols = [c for c in df.columns if c not in ['Open', 'High', 'Low', 'Close', 'Volume'] and not c.startswith('target') and not c.startswith('future_ret')]
-        last_row = df.iloc[[-1]][feature_cols]
+        last_row = fm.rows()[-1]
         
-        predictions = model.predict(last_row)
+        predictions = model.compiled().predict(last_row)
         # Flatten predictions if they are arrays
         flat_preds = {}
         for h, v in predictions.items():
@@ -130,7 +235,7 @@ def main():
         viz.plot_forecast(df, symbol, flat_preds)
         
     elif args.command == "backtest":
-        bt = Backtester(args.symbol)
+        bt = Backtester(args.symbol, seed=args.seed, signal_source="walk_forward" if args.walk_forward else None)
         trades = bt.run()
         print(f"Backtest finished. {len(trades)} trades executed.")
         
@@ -140,9 +245,60 @@ def main():
             t['tags'] = 'backtest'
             journal.log_trade(t)
             
+    elif args.command == "walk-forward":
+        folds = run_walk_forward(args.symbol, model_type=args.model_type, window=args.window,
+                                 train_bars=args.train_bars, step=args.step)
+        if not folds.empty:
+            print(folds.groupby(["horizon", "refit"])[["seconds", "accuracy"]].mean().to_string())
+            
+    elif args.command == "portfolio":
+        pbt = PortfolioBacktester(args.symbols, seed=args.seed, workers=args.workers)
+        trades = pbt.run()
+        print(f"Portfolio backtest finished. {len(trades)} trades executed.")
+        print(pbt.summary())
+        
+        # Log to each underlying's journal
+        for t in trades:
+            t['tags'] = 'portfolio'
+            TradeJournal(t['contract'].underlying).log_trade(t)
+            
+    elif args.command == "sweep":
+        results = run_sweep(args.symbol, samples=args.samples, workers=args.workers, seed=args.seed)
+        if not results.empty:
+            print(results.head(10).to_string(index=False))
+            
+    elif args.command == "monte-carlo":
+        runs, summary = run_monte_carlo(args.symbol, runs=args.runs, base_seed=args.seed, workers=args.workers)
+        if not runs.empty:
+            print(summary.to_string())
+            print(f"Blow-up probability: {summary.attrs['blow_up_probability']:.1%}")
+            print(f"Probability of ending below ${config.INITIAL_BALANCE:.0f}: {summary.attrs['loss_probability']:.1%}")
+            print("Replay any replication with: python main.py backtest --symbol SYMBOL --seed <seed from the runs CSV>")
+            
+    elif args.command == "models":
+        registry = ModelRegistry()
+        if args.activate is not None:
+            registry.activate(args.symbol, args.activate)
+        elif args.rollback:
+            registry.rollback(args.symbol)
+        current = registry.current_version(args.symbol)
+        versions = registry.versions(args.symbol)
+        if not versions:
+            print(f"No registry versions for {args.symbol}.")
+        for v in versions:
+            m = registry.manifest(args.symbol, v)
+            marker = "*" if v == current else " "
+            print(f"{marker} v{v}  {m['created']}  {m['model_type']}  horizons {m['horizons']}  "
+                  f"schema v{m['feature_schema_version']}  data {str(m['data_hash'])[:12]}")
+            
     elif args.command == "live":
-        lt = LiveTrader(args.symbol)
-        lt.trading_loop()
+        lt = MultiSymbolTrader(args.symbols) if args.symbols else LiveTrader(args.symbol)
+        lt.trading_loop(stream=args.stream)
+
+    elif args.command == "replay":
+        summary = replay_live(args.symbols, args.start, speed=args.speed, limit=args.bars)
+        for key, value in summary.items():
+            print(f"{key:>16}: {value:.2f}" if isinstance(value, float) else f"{key:>16}: {value}")
         
     elif args.command == "plot":
         journal = TradeJournal(args.symbol)
@@ -0,0 +1,258 @@
+import asyncio
+import json
+import time
+import numpy as np
+import pandas as pd
+import config
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed, InvalidHandshake
+from live_engine import interval_seconds, session_closes
+from metrics import METRICS
+
+OHLCV = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+class StreamError(Exception):
+    pass
+
+
+@lru_cache(maxsize=64)
+def _session_bounds(day_ns: int, interval: str) -> np.ndarray:
+    """
+    [open, first close, ..., MARKET_CLOSE] of one session as UTC ns.
+    """
+    day = pd.Timestamp(day_ns, tz="UTC").tz_convert(config.MARKET_TIMEZONE)
+    start = day.replace(hour=config.MARKET_OPEN[0], minute=config.MARKET_OPEN[1])
+    return np.array([start.value] + [t.value for t in session_closes(day, interval)], dtype=np.int64)
+
+
+def bar_bounds(ts_ns: int, interval: str = config.INTERVAL) -> Optional[Tuple[int, int]]:
+    """
+    (start, end) in UTC ns of the session bar of `interval` that contains ts_ns,
+    aligned like the yfinance bars the models are trained on (from MARKET_OPEN,
+    the last bar ending at MARKET_CLOSE). None outside the session.
+    """
+    day = pd.Timestamp(ts_ns, tz="UTC").tz_convert(config.MARKET_TIMEZONE).normalize()
+    bounds = _session_bounds(day.value, interval)
+    k = np.searchsorted(bounds, ts_ns, side='right')
+    if k == 0 or k == len(bounds):
+        return None
+    return int(bounds[k - 1]), int(bounds[k])
+
+
+class BarBuffer:
+    """
+    One symbol's completed bars in a fixed-capacity ring buffer (int64 ns start
+    times, float64 OHLCV), plus the bar still forming and the latest quote.
+
+    Source bars (e.g. 1-minute bars from the feed) are folded into `interval`
+    bars; a bar completes when a source bar reaches its end, or when a source
+    bar of a later bar arrives first.
+    """
+
+    def __init__(self, capacity: int = config.STREAM_BUFFER_BARS, interval: str = config.INTERVAL,
+                 source_interval: str = "1m"):
+        self.capacity = capacity
+        self.interval = interval
+        self.source_ns = interval_seconds(source_interval) * 1_000_000_000
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.ohlcv = np.zeros((capacity, 5))
+        self.n = 0 # completed bars ever appended
+        self._forming = None # [start_ns, end_ns, open, high, low, close, volume]
+        self.bid = self.ask = np.nan
+        self.quote_ns = 0
+
+    @property
+    def last_ns(self) -> int:
+        """
+        Start time of the newest completed bar (0 if none).
+        """
+        return int(self.ts[(self.n - 1) % self.capacity]) if self.n else 0
+
+    def add(self, ts_ns: int, o: float, h: float, l: float, c: float, v: float) -> List[int]:
+        """
+        Folds one source bar in. Returns the start times of the bars it completed (usually none or one).
+        """
+        bounds = bar_bounds(ts_ns, self.interval)
+        if bounds is None or bounds[0] <= self.last_ns:
+            return [] # outside the session, or a bar already completed (e.g. replayed after a reconnect)
+
+        completed = []
+        bar = self._forming
+        if bar is not None and bar[0] != bounds[0]:
+            # The previous bar's last source bar never came
+            completed.append(self._append(bar))
+            bar = None
+        if bar is None:
+            bar = self._forming = [bounds[0], bounds[1], o, h, l, c, v]
+        else:
+            bar[3] = max(bar[3], h)
+            bar[4] = min(bar[4], l)
+            bar[5] = c
+            bar[6] += v
+        if ts_ns + self.source_ns >= bar[1]:
+            completed.append(self._append(bar))
+            self._forming = None
+        return completed
+
+    def seed(self, df: pd.DataFrame):
+        """
+        Loads completed bars from history (e.g. fetch_data) before the feed starts.
+        """
+        df = df.iloc[-self.capacity:]
+        ts = df.index.values.astype('datetime64[ns]').view('int64')
+        for t, row in zip(ts, df[OHLCV].to_numpy(dtype=np.float64)):
+            if t > self.last_ns:
+                self._append([int(t), 0, *row])
+        self._forming = None
+
+    def _append(self, bar) -> int:
+        pos = self.n % self.capacity
+        self.ts[pos] = bar[0]
+        self.ohlcv[pos] = bar[2:]
+        self.n += 1
+        return bar[0]
+
+    def quote(self, ts_ns: int, bid: float, ask: float):
+        self.bid, self.ask, self.quote_ns = bid, ask, ts_ns
+
+    def latest_price(self) -> float:
+        """
+        Quote midpoint if a quote came in after the newest completed bar started, else its close.
+        """
+        if self.quote_ns and self.quote_ns >= self.last_ns and self.bid > 0 and self.ask > 0:
+            return (self.bid + self.ask) / 2
+        return float(self.ohlcv[(self.n - 1) % self.capacity, 3]) if self.n else np.nan
+
+    def frame(self, n: int = None, until: int = None) -> pd.DataFrame:
+        """
+        The last n (default: all buffered) completed bars, oldest first, like
+        fetch_data's frame; only those starting at or before `until` (ns) if given.
+        """
+        oldest, end = max(self.n - self.capacity, 0), self.n
+        if until is not None:
+            # Bars newer than `until` arrived while the engine was behind (e.g. a fast replay)
+            while end > oldest and self.ts[(end - 1) % self.capacity] > until:
+                end -= 1
+        k = end - oldest if n is None else min(n, end - oldest)
+        idx = np.arange(end - k, end) % self.capacity
+        return pd.DataFrame(self.ohlcv[idx], columns=OHLCV, index=pd.to_datetime(self.ts[idx], utc=True))
+
+
+class MarketStream:
+    """
+    Bar and quote messages from an Alpaca-style market data websocket (a JSON
+    array of {"T": "b"|"q", "S": symbol, ...} per message) into one BarBuffer
+    per symbol. Each completed bar is put on `bars` as (symbol, start ns), so
+    the live engine acts on bar events instead of re-polling. Reconnects with
+    backoff and subscribes again; bars already buffered are not applied twice.
+    """
+
+    def __init__(self, symbols: List[str], url: str = config.ALPACA_STREAM_URL, key_id: str = config.ALPACA_KEY_ID,
+                 secret_key: str = config.ALPACA_SECRET_KEY, capacity: int = config.STREAM_BUFFER_BARS,
+                 interval: str = config.INTERVAL, source_interval: str = "1m", quotes: bool = True):
+        self.symbols = list(symbols)
+        self.url = url
+        self.key_id = key_id
+        self.secret_key = secret_key
+        self.quotes = quotes
+        self.buffers = {s: BarBuffer(capacity, interval, source_interval) for s in self.symbols}
+        self.bars = asyncio.Queue()
+        # perf_counter time the first bar of each pending bar start arrived (popped by the consumer)
+        self.received_at: Dict[int, float] = {}
+        self.stats = {"messages": 0, "bars": 0, "quotes": 0, "reconnects": 0}
+        self._new_bar = asyncio.Event()
+
+    def frame(self, symbol: str, until: int = None) -> pd.DataFrame:
+        return self.buffers[symbol].frame(until=until)
+
+    def seed(self, symbol: str, df: pd.DataFrame):
+        self.buffers[symbol].seed(df)
+
+    def latest_price(self, symbol: str) -> float:
+        return self.buffers[symbol].latest_price()
+
+    async def run(self):
+        """
+        Consumes the feed until cancelled. Connection failures and malformed
+        messages reconnect with backoff; a rejected handshake (bad keys, too
+        many connections, unknown feed) raises StreamError, since retrying
+        would not fix it.
+        """
+        delay = config.STREAM_RECONNECT_SECONDS
+        while True:
+            try:
+                async with connect(self.url, max_size=None) as ws:
+                    await self._handshake(ws)
+                    delay = config.STREAM_RECONNECT_SECONDS
+                    async for raw in ws:
+                        self._dispatch(json.loads(raw))
+                reason = "closed by server"
+            except (OSError, ConnectionClosed, InvalidHandshake, asyncio.TimeoutError) as e:
+                reason = str(e) or type(e).__name__
+            except (KeyError, TypeError, ValueError) as e: # ValueError covers JSONDecodeError
+                reason = f"malformed message: {type(e).__name__}: {e}"
+            self.stats["reconnects"] += 1
+            METRICS.incr("stream_reconnects", ",".join(self.symbols))
+            METRICS.event("stream_disconnected", ",".join(self.symbols), reason=reason)
+            print(f"Market stream disconnected ({reason}), reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+    async def _handshake(self, ws):
+        await self._expect(ws, "connected")
+        await ws.send(json.dumps({"action": "auth", "key": self.key_id, "secret": self.secret_key}))
+        await self._expect(ws, "authenticated")
+        request = {"action": "subscribe", "bars": self.symbols}
+        if self.quotes:
+            request["quotes"] = self.symbols
+        await ws.send(json.dumps(request))
+
+    async def _expect(self, ws, msg: str):
+        for m in json.loads(await ws.recv()):
+            if m.get("T") == "error":
+                raise StreamError(f"Market stream error {m.get('code')}: {m.get('msg')}")
+            if m.get("T") == "success" and m.get("msg") == msg:
+                return
+        raise StreamError(f"Market stream: expected '{msg}'")
+
+    def _dispatch(self, messages: list):
+        self.stats["messages"] += 1
+        received = time.perf_counter()
+        for m in messages:
+            kind = m.get("T")
+            buffer = self.buffers.get(m.get("S"))
+            if buffer is None:
+                if kind == "error":
+                    print(f"Market stream error {m.get('code')}: {m.get('msg')}")
+                continue
+            ts_ns = pd.Timestamp(m["t"]).value
+            if kind == "b":
+                self.stats["bars"] += 1
+                for start in buffer.add(ts_ns, m["o"], m["h"], m["l"], m["c"], m["v"]):
+                    self.received_at.setdefault(start, received)
+                    self.bars.put_nowait((m["S"], start))
+                    self._new_bar.set()
+            elif kind == "q":
+                self.stats["quotes"] += 1
+                buffer.quote(ts_ns, m["bp"], m["ap"])
+
+    async def wait_for_bar(self, start_ns: int, timeout: float) -> bool:
+        """
+        Waits (at most `timeout` seconds) until every symbol has completed the bar
+        starting at start_ns, so one bar event covers all symbols. False on timeout.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while any(b.last_ns < start_ns for b in self.buffers.values()):
+            self._new_bar.clear()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._new_bar.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
@@ -0,0 +1,229 @@
+import bisect
+import json
+import logging
+import threading
+import time
+import config
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional
+
+# Histogram bucket upper bounds in seconds (0.1ms to 1 min, about x2.5 apart)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram: observe() is one bisect and a few adds, so
+    it can stay on in the hot path. Quantiles are interpolated within a bucket.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # last: above the largest bound
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for k, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.bounds[k - 1] if k else 0.0
+                upper = self.bounds[k] if k < len(self.bounds) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self) -> dict:
+        return {"count": self.count, "mean": self.sum / self.count if self.count else 0.0,
+                "p50": self.quantile(0.5), "p95": self.quantile(0.95), "p99": self.quantile(0.99), "max": self.max}
+
+
+class Metrics:
+    """
+    Live trading telemetry: a latency histogram per (stage, symbol), counters
+    (bars, decisions, orders, errors, missed bars) and a rotating JSON-lines
+    event log. Thread-safe; the LiveEngine stages run on thread pools.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms: Dict[tuple, Histogram] = {}
+        self.counters: Dict[tuple, int] = {}
+        self.started = time.time()
+        self._log: Optional[logging.Logger] = None
+        self._server = None
+
+    def observe(self, stage: str, symbol: str, seconds: float):
+        key = (stage, symbol)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram()
+            hist.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str, symbol: str):
+        """
+        Times the block; an exception leaving it is tagged with the stage (see stage_of).
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            tag_stage(e, stage)
+            raise
+        finally:
+            self.observe(stage, symbol, time.perf_counter() - start)
+
+    def incr(self, name: str, symbol: str, n: int = 1, **labels):
+        key = (name, symbol, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def event(self, kind: str, symbol: str, **fields):
+        """
+        One line in the structured log (a no-op until open_log()).
+        """
+        if self._log is not None:
+            self._log.info(json.dumps({"time": datetime.now().isoformat(), "event": kind, "symbol": symbol, **fields},
+                                      default=str))
+
+    def error(self, symbol: str, stage: str, error: BaseException):
+        self.incr("errors", symbol, stage=stage)
+        self.event("error", symbol, stage=stage, error=f"{type(error).__name__}: {error}")
+
+    def missed(self, symbol: str, reason: str, stage: str = None):
+        labels = {"reason": reason} if stage is None else {"reason": reason, "stage": stage}
+        self.incr("missed_bars", symbol, **labels)
+        self.event("missed_bar", symbol, **labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {f"{stage}/{symbol}": h.summary() for (stage, symbol), h in sorted(self.histograms.items())}
+            counters = [{"name": name, "symbol": symbol, **dict(labels), "value": v}
+                        for (name, symbol, labels), v in sorted(self.counters.items())]
+        return {"uptime_seconds": time.time() - self.started, "stages": stages, "counters": counters}
+
+    def prometheus(self) -> str:
+        """
+        Prometheus text exposition of the histograms and counters.
+        """
+        lines = ["# TYPE live_stage_seconds histogram"]
+        with self._lock:
+            for (stage, symbol), h in sorted(self.histograms.items()):
+                labels = f'stage="{stage}",symbol="{symbol}"'
+                cumulative = 0
+                for bound, n in zip([repr(b) for b in h.bounds] + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f'live_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f"live_stage_seconds_sum{{{labels}}} {h.sum}")
+                lines.append(f"live_stage_seconds_count{{{labels}}} {h.count}")
+            names = sorted({key[0] for key in self.counters})
+            for name in names:
+                lines.append(f"# TYPE live_{name}_total counter")
+                for (n, symbol, extra), v in sorted(self.counters.items()):
+                    if n == name:
+                        labels = ",".join([f'symbol="{symbol}"'] + [f'{k}="{val}"' for k, val in extra])
+                        lines.append(f"live_{name}_total{{{labels}}} {v}")
+        lines.append("# TYPE live_uptime_seconds gauge")
+        lines.append(f"live_uptime_seconds {time.time() - self.started:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def open_log(self, path=config.METRICS_LOG_PATH, max_bytes: int = config.METRICS_LOG_MAX_BYTES,
+                 backups: int = config.METRICS_LOG_BACKUPS):
+        """
+        Starts the structured event log (one JSON object per line), rotated at max_bytes.
+        """
+        if self._log is not None:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        log = logging.getLogger("live_metrics")
+        log.setLevel(logging.INFO)
+        log.propagate = False
+        log.addHandler(handler)
+        self._log = log
+
+    def serve(self, port: int = config.METRICS_PORT, host: str = config.METRICS_HOST):
+        """
+        Serves /metrics (Prometheus text) and /metrics.json on a daemon thread.
+        Returns the bound (host, port); port 0 picks a free one.
+        """
+        if self._server is None:
+            self._server = ThreadingHTTPServer((host, port), _handler(self))
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        return self._server.server_address[:2]
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def tag_stage(error: BaseException, stage: str):
+    """
+    Records the stage an exception came from, unless an inner stage already did.
+    """
+    if getattr(error, "metrics_stage", None) is None:
+        error.metrics_stage = stage
+
+
+def stage_of(error: BaseException, default: str = "bar") -> str:
+    return getattr(error, "metrics_stage", None) or default
+
+
+def _handler(metrics: Metrics):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, kind = metrics.prometheus(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, kind = json.dumps(metrics.snapshot()), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass # scrapes every few seconds would flood stdout
+
+    return Handler
+
+
+# Shared by every LiveTrader and LiveEngine in the process
+METRICS = Metrics()
+
+
+def start_metrics(port: int = config.METRICS_PORT):
+    """
+    Opens the event log and, unless port is None, the HTTP endpoint.
+    """
+    METRICS.open_log()
+    if port is not None:
+        host, port = METRICS.serve(port)
+        print(f"Metrics at http://{host}:{port}/metrics")
@@ -0,0 +1,183 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import joblib
+import sklearn
+import config
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+from features import FEATURE_COLUMNS, FEATURE_SCHEMA_VERSION
+from tree_export import CompiledEnsemble, export_ensemble
+
+# Loaded versions shared by every SymbolModel in the process: (root, symbol, version) -> ModelVersion.
+# Versions are immutable once published, so entries never go stale; release() drops the superseded ones.
+_LOADED: Dict[tuple, "ModelVersion"] = {}
+_LOCK = threading.Lock()
+
+
+class ModelVersion:
+    """
+    One published version of a symbol's models. The horizon models and the
+    compiled ensemble are loaded on first use only. The compiled arrays are
+    memory-mapped; the sklearn models are not (unpickling a tree copies its
+    node arrays into memory it owns), so they are loaded once per process.
+    """
+
+    def __init__(self, path: Path, manifest: dict):
+        self.path = path
+        self.manifest = manifest
+        self.version = manifest["version"]
+        self._models = None
+        self._compiled = None
+        self._lock = threading.Lock()
+
+    def models(self) -> Dict[int, object]:
+        with self._lock:
+            if self._models is None:
+                # A model shared by several horizons is stored (and loaded) once
+                files = self.manifest.get("files") or {str(h): f"{h}h.joblib" for h in self.manifest["horizons"]}
+                loaded = {name: joblib.load(self.path / name) for name in sorted(set(files.values()))}
+                self._models = {h: loaded[files[str(h)]] for h in self.manifest["horizons"]}
+            return self._models
+
+    def compiled(self) -> CompiledEnsemble:
+        with self._lock:
+            if self._compiled is None:
+                self._compiled = CompiledEnsemble.load(self.path / "compiled", mmap_mode='r')
+            return self._compiled
+
+
+class ModelRegistry:
+    """
+    Versioned model store: models/registry/{symbol}/v{N}/ holds one joblib file
+    per horizon (one per model if horizons share a model), the compiled tree
+    ensemble as .npy arrays, and manifest.json (training data hash, feature
+    schema, model type, sklearn version).
+    {symbol}/CURRENT names the active version and is swapped atomically, so a
+    running LiveTrader can roll forward or back without a restart.
+    """
+
+    def __init__(self, root: Path = config.MODEL_REGISTRY_DIR):
+        self.root = Path(root)
+
+    def _symbol_dir(self, symbol: str) -> Path:
+        return self.root / symbol
+
+    def versions(self, symbol: str) -> List[int]:
+        folder = self._symbol_dir(symbol)
+        if not folder.exists():
+            return []
+        return sorted(int(p.name[1:]) for p in folder.glob("v*") if p.name[1:].isdigit())
+
+    def current_version(self, symbol: str) -> Optional[int]:
+        try:
+            return int((self._symbol_dir(symbol) / "CURRENT").read_text().strip().lstrip("v"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def manifest(self, symbol: str, version: int) -> dict:
+        return json.loads((self._symbol_dir(symbol) / f"v{version}" / "manifest.json").read_text())
+
+    def publish(self, symbol: str, models: Dict[int, object], model_type: str = None,
+                data_hash: str = None, activate: bool = True) -> int:
+        """
+        Writes models as a new version and (by default) makes it current.
+        """
+        folder = self._symbol_dir(symbol)
+        folder.mkdir(parents=True, exist_ok=True)
+        tmp_dir = Path(tempfile.mkdtemp(dir=folder, prefix=".tmp-"))
+        try:
+            files = {}
+            for h, model in sorted(models.items()):
+                # A model shared by several horizons is written once, named after all of them
+                horizons = [k for k, m in sorted(models.items()) if m is model]
+                files[str(h)] = "_".join(f"{k}h" for k in horizons) + ".joblib"
+                if h == horizons[0]:
+                    joblib.dump(model, tmp_dir / files[str(h)])
+            export_ensemble(models, len(FEATURE_COLUMNS)).save(tmp_dir / "compiled")
+
+            manifest = {
+                "symbol": symbol,
+                "horizons": sorted(int(h) for h in models),
+                "files": files,
+                "model_type": model_type,
+                "data_hash": data_hash,
+                "feature_schema_version": FEATURE_SCHEMA_VERSION,
+                "feature_columns": FEATURE_COLUMNS,
+                "sklearn_version": sklearn.__version__,
+                "created": datetime.now().isoformat(timespec="seconds"),
+            }
+            # Claim the next version number; a concurrent publisher makes rename fail, so retry
+            while True:
+                version = max(self.versions(symbol), default=0) + 1
+                manifest["version"] = version
+                (tmp_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+                try:
+                    os.rename(tmp_dir, folder / f"v{version}")
+                    break
+                except OSError:
+                    if not (folder / f"v{version}").exists():
+                        raise
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+
+        print(f"Published {symbol} models as v{version} in {folder}")
+        if activate:
+            self.activate(symbol, version)
+        return version
+
+    def activate(self, symbol: str, version: int):
+        """
+        Points CURRENT at `version` (temp file + os.replace: readers see old or new, never neither).
+        """
+        if version not in self.versions(symbol):
+            raise ValueError(f"{symbol} has no model version v{version}")
+        folder = self._symbol_dir(symbol)
+        fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".CURRENT-")
+        with os.fdopen(fd, "w") as f:
+            f.write(f"v{version}\n")
+        os.replace(tmp_path, folder / "CURRENT")
+
+    def rollback(self, symbol: str) -> int:
+        """
+        Activates the newest version older than the current one.
+        """
+        current = self.current_version(symbol)
+        older = [v for v in self.versions(symbol) if current is None or v < current]
+        if not older:
+            raise ValueError(f"No version of {symbol} older than v{current} to roll back to")
+        self.activate(symbol, older[-1])
+        return older[-1]
+
+    def load(self, symbol: str, version: int = None) -> Optional[ModelVersion]:
+        """
+        The given (default: current) version from the process-wide cache.
+        Returns None if the symbol has nothing in the registry.
+        """
+        version = version if version is not None else self.current_version(symbol)
+        if version is None:
+            return None
+        key = (str(self.root), symbol, version)
+        with _LOCK:
+            entry = _LOADED.get(key)
+            if entry is None:
+                path = self._symbol_dir(symbol) / f"v{version}"
+                manifest = json.loads((path / "manifest.json").read_text())
+                if manifest["feature_schema_version"] != FEATURE_SCHEMA_VERSION:
+                    print(f"Warning: {symbol} v{version} was trained on feature schema "
+                          f"v{manifest['feature_schema_version']}, current is v{FEATURE_SCHEMA_VERSION}")
+                entry = _LOADED[key] = ModelVersion(path, manifest)
+        return entry
+
+    def release(self, symbol: str, keep: int):
+        """
+        Drops the symbol's cached versions other than `keep` (e.g. after a live
+        switch), so old models are freed once no SymbolModel holds them.
+        """
+        with _LOCK:
+            for key in [k for k in _LOADED if k[:2] == (str(self.root), symbol) and k[2] != keep]:
+                del _LOADED[key]
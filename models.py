@@ -1,30 +1,75 @@
 import os
+import json
+import warnings
 import joblib
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
-from sklearn.model_selection import TimeSeriesSplit, RandomizedSearchCV
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
 from sklearn.metrics import accuracy_score, classification_report
 import config
+from features import FEATURE_COLUMNS, FEATURE_SCHEMA_VERSION
+from tree_export import export_ensemble
+from model_registry import ModelRegistry
+from multi_horizon import MultiHorizonClassifier, target_columns
+
+# Backends accepted by SymbolModel(model_type=...)
+MODEL_TYPES = ("rf", "gb", "hgb")
+
+def params_path(symbol: str):
+    return config.MODELS_DIR / f"{symbol}_params.json"
 
 class SymbolModel:
     """
     Wrapper for symbol-specific ML models (Multi-Horizon).
     """
     
-    def __init__(self, symbol: str, model_type: str = "rf"):
+    def __init__(self, symbol: str, model_type: str = "rf", shared: bool = config.SHARED_HORIZON_MODEL):
         self.symbol = symbol
         self.model_type = model_type
+        # One MultiHorizonClassifier for all horizons instead of one model per horizon
+        self.shared = shared
         # Dictionary to hold models for each horizon: {1: model_obj, 4: model_obj}
+        # (with shared=True every horizon maps to the same MultiHorizonClassifier)
         self.models = {} 
+        # Flattened copy of self.models for fast single-bar inference (see compiled())
+        self._compiled = None
+        self._compiled_from = []
+        # Registry version the models were loaded from or published as (None: legacy .pkl files)
+        self.version = None
+        # Hash of the bars the models were trained on, recorded in the registry manifest
+        self.data_hash = None
+        # Tuned hyperparameters per horizon, read from {symbol}_params.json on first use
+        self._tuned = None
+        self._untuned_noted = False
         
-    def _get_base_model(self):
+    def _get_base_model(self, horizon: int = None, params: dict = None):
         if self.model_type == "rf":
-            return RandomForestClassifier(n_estimators=200, class_weight='balanced', random_state=42)
+            model = RandomForestClassifier(n_estimators=200, class_weight='balanced', random_state=42)
         elif self.model_type == "gb":
-            return GradientBoostingClassifier(n_estimators=100, random_state=42)
+            model = GradientBoostingClassifier(n_estimators=100, random_state=42)
+        elif self.model_type == "hgb":
+            # Histogram-binned boosting: multithreaded (OpenMP), scales to minute bars.
+            # max_iter is an upper bound; early stopping picks the actual number of trees.
+            model = HistGradientBoostingClassifier(max_iter=500, learning_rate=0.1, early_stopping=True,
+                                                   n_iter_no_change=20, random_state=42)
         else:
             raise ValueError(f"Unknown model type: {self.model_type}")
+        # Hyperparameters found by `main.py tune` for this horizon, unless given explicitly
+        return model.set_params(**(params if params is not None else self.tuned_params(horizon)))
+
+    def tuned_params(self, horizon: int = None) -> dict:
+        """
+        Best parameters saved by tuning.py for this symbol, backend and horizon ({} if none).
+        Tuning is per horizon, so a shared model (horizon None) gets the defaults.
+        """
+        if self._tuned is None:
+            path = params_path(self.symbol)
+            self._tuned = json.loads(path.read_text()).get(self.model_type, {}) if path.exists() else {}
+        if horizon is None and self._tuned and not self._untuned_noted:
+            self._untuned_noted = True
+            print(f"[{self.symbol}] Tuned {self.model_type} parameters are per horizon and not used by the "
+                  f"shared model; it trains with the defaults.")
+        return dict(self._tuned.get(str(horizon), {}).get("params", {}))
 
     def train(self, df: pd.DataFrame):
         """
@@ -33,9 +78,12 @@ class SymbolModel:
         """
         print(f"Training models for {self.symbol}...")
         
-        feature_cols = [c for c in df.columns if c not in ['Open', 'High', 'Low', 'Close', 'Volume'] and not c.startswith('target') and not c.startswith('future_ret')]
-        
-        X = df[feature_cols]
+        X = df[FEATURE_COLUMNS]
+
+        if self.shared:
+            self._train_shared(X, df)
+            self.save()
+            return
 
         for h in config.TARGET_HORIZONS:
             target_col = f"target_{h}h"
@@ -47,27 +95,84 @@ class SymbolModel:
             
             print(f"--- Training {h}h Horizon ---")
             
-            # Simple split for validation metrics (last 20%)
-            split_idx = int(len(X) * 0.8)
-            X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
-            y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
-            
-            model = self._get_base_model()
-            model.fit(X_train, y_train)
-            
-            # Evaluate
-            preds = model.predict(X_test)
-            acc = accuracy_score(y_test, preds)
+            acc, report = self.evaluate_horizon(X, y, h)
             print(f"[{self.symbol} {h}h] Test Accuracy: {acc:.4f}")
-            print(classification_report(y_test, preds))
+            print(report)
             
             # Retrain on full data
             print(f"[{self.symbol} {h}h] Retraining on full dataset...")
-            model.fit(X, y)
-            self.models[h] = model
+            self.models[h] = self.fit_horizon(X, y, h)
             
         self.save()
 
+    def _train_shared(self, X: pd.DataFrame, df: pd.DataFrame):
+        horizons = [h for h in config.TARGET_HORIZONS if f"target_{h}h" in df.columns]
+        Y = df[target_columns(horizons)]
+        print(f"--- Training shared model for horizons {horizons} ---")
+        for h, (acc, report) in self.evaluate_shared(X, Y).items():
+            print(f"[{self.symbol} {h}h] Test Accuracy: {acc:.4f}")
+            print(report)
+        print(f"[{self.symbol}] Retraining on full dataset...")
+        model = self.fit_horizon(X, Y)
+        self.models = {h: model for h in horizons}
+
+    def evaluate_shared(self, X: pd.DataFrame, Y: pd.DataFrame) -> dict:
+        """
+        evaluate_horizon for one shared model over the target columns of Y.
+        Returns {horizon: (accuracy, classification report)}.
+        """
+        split_idx = int(len(X) * 0.8)
+        model = self._fit(X.iloc[:split_idx], Y.iloc[:split_idx])
+        preds = model.predict(X.iloc[split_idx:])
+        y_test = Y.iloc[split_idx:].to_numpy()
+        return {h: (accuracy_score(y_test[:, k], preds[:, k]), classification_report(y_test[:, k], preds[:, k]))
+                for k, h in enumerate(model.horizons)}
+
+    def evaluate_horizon(self, X: pd.DataFrame, y: pd.Series, horizon: int = None):
+        """
+        Fits on the first 80% of rows and scores the last 20%.
+        Returns (accuracy, classification report).
+        """
+        split_idx = int(len(X) * 0.8)
+        X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
+        y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
+        
+        model = self._fit(X_train, y_train, horizon)
+        preds = model.predict(X_test)
+        return accuracy_score(y_test, preds), classification_report(y_test, preds)
+
+    def fit_horizon(self, X: pd.DataFrame, y: pd.Series, horizon: int = None):
+        """
+        Fits a fresh model for one horizon on all rows.
+        """
+        model = self._fit(X, y, horizon)
+        if self.model_type == "hgb":
+            # Early stopping held out the most recent bars; refit on everything
+            # with the number of iterations it chose.
+            n_iter = model.estimator.n_iter_ if isinstance(model, MultiHorizonClassifier) else model.n_iter_
+            model = self._wrap(self._get_base_model(horizon).set_params(max_iter=n_iter, early_stopping=False), y)
+            model.fit(X, y)
+        return model
+
+    @staticmethod
+    def _wrap(model, y):
+        """
+        A DataFrame of target_{h}h columns means one model for all those horizons.
+        """
+        if isinstance(y, pd.DataFrame):
+            return MultiHorizonClassifier(model, [int(c[len("target_"):-1]) for c in y.columns])
+        return model
+
+    def _fit(self, X: pd.DataFrame, y: pd.Series, horizon: int = None, params: dict = None):
+        model = self._wrap(self._get_base_model(horizon, params), y)
+        if self.model_type == "hgb":
+            # Early stopping on a time-ordered tail, not a shuffled sample of the past
+            split = int(len(X) * (1 - config.HGB_VALIDATION_FRACTION))
+            model.fit(X.iloc[:split], y.iloc[:split], X_val=X.iloc[split:], y_val=y.iloc[split:])
+        else:
+            model.fit(X, y)
+        return model
+
     def predict(self, X_new: pd.DataFrame) -> dict:
         """
         Returns predictions for all horizons: {1: pred_array, 4: pred_array}
@@ -76,29 +181,106 @@ class SymbolModel:
             self.load()
             
         results = {}
-        for h, model in self.models.items():
-            if model:
-                results[h] = model.predict(X_new)
+        for model, horizons in self._distinct_models():
+            if isinstance(model, MultiHorizonClassifier):
+                # One pass for every horizon the shared model covers
+                preds = model.predict(X_new)
+                for h in horizons:
+                    results[h] = preds[:, model.horizons.index(h)]
+            else:
+                results[horizons[0]] = model.predict(X_new)
         return results
     
+    def predict_matrix(self, fm) -> dict:
+        """
+        Predictions for the valid rows of a FeatureMatrix (feature_kernel), in bar order.
+        The float32 rows go to the estimators as they are, with no DataFrame
+        rebuilt per call; the columns are checked here instead of by sklearn.
+        """
+        if not self.models:
+            self.load()
+        if fm.schema_version != FEATURE_SCHEMA_VERSION or fm.columns != FEATURE_COLUMNS:
+            raise ValueError(f"Feature schema v{fm.schema_version} does not match models (v{FEATURE_SCHEMA_VERSION})")
+        for model, horizons in self._distinct_models():
+            trained_on = getattr(model, "feature_names_in_", None)
+            if trained_on is not None and list(trained_on) != FEATURE_COLUMNS:
+                raise ValueError(f"{self.symbol} {horizons[0]}h model was trained on other feature columns")
+        with warnings.catch_warnings():
+            # Checked above; sklearn would warn on every call that an array has no feature names
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            return self.predict(fm.rows())
+    
     def predict_proba(self, X_new: pd.DataFrame) -> dict:
         if not self.models:
             self.load()
             
         results = {}
-        for h, model in self.models.items():
-            if model:
-                results[h] = model.predict_proba(X_new)
+        for model, horizons in self._distinct_models():
+            if isinstance(model, MultiHorizonClassifier):
+                probas = model.predict_proba(X_new)
+                for h in horizons:
+                    results[h] = probas[model.horizons.index(h)]
+            else:
+                results[horizons[0]] = model.predict_proba(X_new)
         return results
 
-    def save(self):
+    def _distinct_models(self):
+        """
+        (model, [horizons]) for each fitted model object, in horizon order.
+        """
+        groups = []
         for h, model in self.models.items():
-            path = config.MODELS_DIR / f"{self.symbol}_model_{h}h.pkl"
-            joblib.dump(model, path)
-            print(f"Model saved to {path}")
+            if not model:
+                continue
+            for existing, horizons in groups:
+                if existing is model:
+                    horizons.append(h)
+                    break
+            else:
+                groups.append((model, [h]))
+        return groups
+
+    def compiled(self):
+        """
+        All horizon models exported to one CompiledEnsemble (tree_export). It gives the
+        same labels as predict() at a fraction of the per-call overhead, for the live
+        loop and one-off predictions. Built on first use and whenever models change.
+        """
+        if not self.models:
+            self.load()
+        models = {h: m for h, m in self.models.items() if m}
+        current = list(models.values())
+        if (self._compiled is None or len(current) != len(self._compiled_from)
+                or any(a is not b for a, b in zip(current, self._compiled_from))):
+            self._compiled = export_ensemble(models, len(FEATURE_COLUMNS))
+            self._compiled_from = current
+        return self._compiled
+
+    def save(self):
+        """
+        Publishes all horizon models as a new registry version and activates it.
+        """
+        self.version = ModelRegistry().publish(self.symbol, self.models, self.model_type, self.data_hash)
+
+    def load(self, version: int = None):
+        """
+        Loads the current (or given) registry version, shared process-wide (the
+        compiled ensemble memory-mapped, the sklearn models in memory). Symbols
+        trained before the registry fall back to the legacy
+        models/{symbol}_model_{h}h.pkl files.
+        """
+        entry = ModelRegistry().load(self.symbol, version)
+        if entry is not None:
+            self.models = dict(entry.models())
+            self.version = entry.version
+            self.model_type = entry.manifest.get("model_type") or self.model_type
+            # The registry stores the compiled ensemble alongside the models
+            self._compiled = entry.compiled()
+            self._compiled_from = list(self.models.values())
+            return
 
-    def load(self):
         self.models = {}
+        self.version = None
         for h in config.TARGET_HORIZONS:
             path = config.MODELS_DIR / f"{self.symbol}_model_{h}h.pkl"
             if path.exists():
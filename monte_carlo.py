@@ -0,0 +1,65 @@
+import time
+import numpy as np
+import pandas as pd
+import config
+from typing import List, Optional, Tuple
+from backtest import Backtester
+from sweep import run_parallel
+
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def replication_seeds(base_seed: int, runs: int) -> List[int]:
+    """
+    Independent, deterministic seeds for each replication, spawned from one base seed.
+    Replication i always gets the same seed, so Backtester(symbol, seed=seeds[i]) replays it exactly.
+    """
+    children = np.random.SeedSequence(base_seed).spawn(runs)
+    # 63 bits so the seeds fit in an int64 CSV column
+    return [int(child.generate_state(1, dtype=np.uint64)[0] >> np.uint64(1)) for child in children]
+
+
+def summarize_runs(runs: pd.DataFrame) -> pd.DataFrame:
+    """
+    Percentile table of final equity and max drawdown across replications,
+    plus blow-up and loss probabilities.
+    """
+    rows = {}
+    for col in ["final_equity", "max_drawdown", "trades"]:
+        values = np.percentile(runs[col], PERCENTILES)
+        rows[col] = {f"p{p}": v for p, v in zip(PERCENTILES, values)}
+        rows[col]["mean"] = runs[col].mean()
+    summary = pd.DataFrame(rows).T
+    summary.attrs["blow_up_probability"] = float(runs["blown_up"].mean())
+    summary.attrs["loss_probability"] = float((runs["final_equity"] < config.INITIAL_BALANCE).mean())
+    return summary
+
+
+def run_monte_carlo(symbol: str, runs: int = config.MONTE_CARLO_RUNS, base_seed: int = config.MONTE_CARLO_SEED,
+                    workers: Optional[int] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Runs `runs` independently seeded replications of the backtest in parallel,
+    reusing one set of prices, features and predictions.
+    Returns (one row per replication, percentile summary) and writes the
+    replications to data/monte_carlo/{symbol}_runs.csv.
+    """
+    inputs = Backtester(symbol).prepare()
+    if inputs is None:
+        return pd.DataFrame(), pd.DataFrame()
+
+    seeds = replication_seeds(base_seed, runs)
+    print(f"Running {runs} Monte Carlo replications for {symbol}...")
+    start = time.perf_counter()
+    rows = run_parallel(inputs, [({}, seed) for seed in seeds], workers)
+    print(f"Monte Carlo finished in {time.perf_counter() - start:.1f}s")
+
+    results = pd.DataFrame(rows)
+    results.insert(0, "replication", range(runs))
+
+    out_dir = config.DATA_DIR / "monte_carlo"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"{symbol}_runs.csv"
+    results.to_csv(out_path, index=False)
+    print(f"Saved replications to {out_path}")
+
+    return results, summarize_runs(results)
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from typing import List
+from sklearn.ensemble import RandomForestClassifier
+
+
+def target_columns(horizons: List[int]) -> List[str]:
+    return [f"target_{h}h" for h in horizons]
+
+
+class MultiHorizonClassifier:
+    """
+    One estimator that predicts every horizon's label in a single pass.
+
+    Random forests are fitted natively multi-output: each tree splits on all
+    horizons' labels at once and stores one class distribution per horizon.
+    Boosted backends have no multi-output mode, so the horizons' labels are
+    encoded as one joint class (e.g. 1h up & 4h flat) and the per-horizon labels
+    and probabilities are read back from it. predict() returns the labels of the
+    most likely joint outcome; predict_proba() sums joint probabilities per horizon.
+    """
+
+    def __init__(self, estimator, horizons: List[int]):
+        self.estimator = estimator
+        self.horizons = list(horizons)
+        # Joint encoding (boosted backends): row j = each horizon's label for joint class j
+        self.joint_ = None
+        self.classes_ = None
+
+    @property
+    def native(self) -> bool:
+        return isinstance(self.estimator, RandomForestClassifier)
+
+    def fit(self, X: pd.DataFrame, Y, X_val: pd.DataFrame = None, y_val=None):
+        """
+        Y has one column per horizon (in self.horizons order). X_val/y_val are
+        passed on for early stopping (HistGradientBoosting).
+        """
+        Y = np.asarray(Y)
+        self.classes_ = [np.unique(Y[:, k]) for k in range(Y.shape[1])]
+        extra = {}
+        if self.native:
+            target = Y
+        else:
+            self.joint_, target = np.unique(Y, axis=0, return_inverse=True)
+            target = target.ravel()
+            if X_val is not None:
+                # Early-stopping rows whose joint outcome never occurs in training cannot be scored
+                codes = {tuple(row): j for j, row in enumerate(self.joint_)}
+                val_codes = np.array([codes.get(tuple(row), -1) for row in np.asarray(y_val)])
+                keep = val_codes >= 0
+                extra = {"X_val": X_val[keep], "y_val": val_codes[keep]}
+        self.estimator.fit(X, target, **extra)
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        """
+        Labels of shape (n_rows, n_horizons).
+        """
+        if self.native:
+            return self.estimator.predict(X)
+        return self.joint_[self.estimator.predict(X)]
+
+    def predict_proba(self, X) -> List[np.ndarray]:
+        """
+        One (n_rows, n_classes) array per horizon, columns ordered as classes_[k].
+        """
+        if self.native:
+            return self.estimator.predict_proba(X)
+        joint = self.estimator.predict_proba(X)
+        return [np.stack([joint[:, self.joint_[:, k] == c].sum(axis=1) for c in classes], axis=1)
+                for k, classes in enumerate(self.classes_)]
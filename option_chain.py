@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+import config
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Optional
+from pricing import CALL, PUT, NS_PER_DAY, black_scholes, option_prices, time_to_expiry
+from contracts import OptionContract
+
+
+def _wall_clock_ns(current_date: datetime) -> int:
+    """
+    current_date as int64 ns on the wall clock (tz dropped).
+    """
+    ts = pd.Timestamp(current_date)
+    if ts.tz is not None:
+        ts = ts.tz_localize(None)
+    return ts.value
+
+
+@lru_cache(maxsize=config.OPTION_CHAIN_CACHE_SIZE)
+def _chain_grid(symbol: str, min_strike: int, max_strike: int, strike_step: float, day_ns: int):
+    """
+    Builds the (dte, strike, right) grid for a rounded price band on a given day.
+    Layout matches the legacy generator: DTE outer, strike inner, call before put.
+    """
+    dte_min, dte_max = config.DTE_RULES.get(symbol, config.DTE_RULES["DEFAULT"])
+
+    strikes = np.arange(min_strike, max_strike + strike_step, strike_step)
+    dtes = np.arange(dte_min, dte_max + 1)
+
+    shape = (len(dtes), len(strikes), 2)
+    grid = {
+        "strikes": strikes,
+        "dte": np.broadcast_to(dtes[:, None, None], shape).ravel(),
+        "strike": np.broadcast_to(strikes[None, :, None], shape).ravel(),
+        "right": np.broadcast_to(np.array([CALL, PUT], dtype=np.int8)[None, None, :], shape).ravel(),
+    }
+    grid["expiry_ns"] = day_ns + grid["dte"] * NS_PER_DAY
+
+    for arr in grid.values():
+        arr.setflags(write=False)
+    return dte_min, grid
+
+
+class OptionChain:
+    """
+    Array-backed simulated option chain: strikes x DTE x {call, put}.
+    Contracts are addressed by position; no per-contract dict or string is built
+    unless to_frame() or contract_id() is asked for.
+    """
+
+    def __init__(self, symbol: str, current_price: float, current_date: datetime, vol: Optional[float] = None):
+        self.symbol = symbol
+        self.current_date = current_date
+        self.current_price = current_price
+        self.vol = vol
+
+        # Generate strikes: +/- 5% range, step 1.0 (approx)
+        self.strike_step = 1.0 if current_price < 100 else 5.0
+        self.min_strike = int(current_price * 0.95)
+        max_strike = int(current_price * 1.05)
+        self.now_ns = _wall_clock_ns(current_date)
+        self.day_ns = self.now_ns // NS_PER_DAY * NS_PER_DAY
+
+        # Grid arrays are cached on (symbol, rounded price band, date) and read-only
+        self.dte_min, grid = _chain_grid(symbol, self.min_strike, max_strike, self.strike_step, self.day_ns)
+        self.strike_values = grid["strikes"]
+        self.dte = grid["dte"]
+        self.strike = grid["strike"]
+        self.right = grid["right"]
+        self.expiry_ns = grid["expiry_ns"] # midnight of the expiry date
+
+        self._price = None
+
+    def __len__(self) -> int:
+        return len(self.strike)
+
+    @property
+    def price(self) -> np.ndarray:
+        """
+        Prices of every contract, computed on first access.
+        Black-Scholes when a volatility is known, else the legacy placeholder price.
+        """
+        if self._price is None:
+            self._price = option_prices(self.current_price, self.strike, self.right, self.now_ns, self.expiry_ns, self.vol)
+        return self._price
+
+    def price_of(self, i: int) -> float:
+        """
+        Price of a single contract without pricing the rest of the chain.
+        """
+        if self._price is not None:
+            return self._price[i]
+        return option_prices(self.current_price, self.strike[i:i + 1], self.right[i:i + 1], self.now_ns, self.expiry_ns[i:i + 1], self.vol)[0]
+
+    def greeks(self) -> Dict[str, np.ndarray]:
+        """
+        Black-Scholes price and Greeks for every contract in the chain.
+        """
+        vol = self.vol if self.vol is not None else config.DEFAULT_VOLATILITY
+        t = time_to_expiry(self.now_ns, self.expiry_ns)
+        return black_scholes(self.current_price, self.strike, t, vol, right=self.right)
+
+    def select(self, right: int, current_price: float, near_money: float = 0.01) -> int:
+        """
+        Index of the first contract of the given right within near_money of spot,
+        falling back to the first contract of that right. Returns -1 if none.
+        """
+        of_right = self.right == right
+        near = of_right & (np.abs(self.strike - current_price) / current_price < near_money)
+        for mask in (near, of_right):
+            hits = np.flatnonzero(mask)
+            if len(hits):
+                return int(hits[0])
+        return -1
+
+    def locate(self, right: int, strike: float, expiry_day_ns: int) -> int:
+        """
+        Index of the contract with the given fields, or -1 if it is not listed.
+        Computed arithmetically from the grid layout instead of scanning ids.
+        """
+        n_strikes = len(self.strike_values)
+        d = (expiry_day_ns - self.day_ns) // NS_PER_DAY - self.dte_min
+        k = int(round((strike - self.min_strike) / self.strike_step))
+        if d < 0 or d * n_strikes * 2 >= len(self) or not 0 <= k < n_strikes:
+            return -1
+        idx = int((d * n_strikes + k) * 2 + (0 if right == CALL else 1))
+        if self.strike[idx] != strike:
+            return -1
+        return idx
+
+    def contract(self, i: int) -> OptionContract:
+        """
+        Structured record for the contract at index i.
+        """
+        return OptionContract(self.symbol, self.right[i], self.strike[i], self.expiry_ns[i])
+
+    def contract_id(self, i: int) -> str:
+        return self.contract(i).id
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Legacy DataFrame view (one row per contract, with string ids).
+        """
+        expiry = pd.Timestamp(self.current_date) + pd.to_timedelta(self.dte, unit='D')
+        return pd.DataFrame({
+            "symbol": self.symbol,
+            "type": np.where(self.right == CALL, "call", "put"),
+            "strike": self.strike,
+            "expiry": expiry,
+            "dte": self.dte,
+            "price": self.price,
+            "id": [self.contract_id(i) for i in range(len(self))]
+        })
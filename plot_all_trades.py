@@ -4,6 +4,7 @@ import matplotlib.dates as mdates
 import matplotlib.patches as patches
 import config
 from data_loader import DataManager
+from contracts import parse_contract_ids
 import argparse
 from datetime import datetime, timedelta
 
@@ -23,6 +24,9 @@ def plot_all_trades(symbol="IWM"):
     df_trades['entry_time'] = pd.to_datetime(df_trades['entry_time'])
     df_trades['exit_time'] = pd.to_datetime(df_trades['exit_time'])
     
+    # Parse option ids (e.g. iwm_C_212.0_2025-02-28) once for all trades
+    contracts = parse_contract_ids(df_trades['symbol'])
+    
     # Filter for symbol if needed (though mostly IWM)
     # df_trades = df_trades[df_trades['symbol'].str.contains(symbol, case=False)]
     
@@ -64,7 +68,7 @@ def plot_all_trades(symbol="IWM"):
     # Plot Trades
     print(f"Plotting {len(df_trades)} trades...")
     
-    for _, trade in df_trades.iterrows():
+    for row_idx, trade in df_trades.iterrows():
         entry_time = trade['entry_time']
         exit_time = trade['exit_time']
         entry_price = trade['entry_price'] # Option Price?
@@ -135,12 +139,11 @@ def plot_all_trades(symbol="IWM"):
         # Text Annotation
         # "[date] [call/put] [strike] [pnl%]"
         # Strike is in symbol: iwm_C_212.0_...
-        try:
-            parts = trade['symbol'].split('_') 
-            # e.g. iwm_C_212.0_2025-02-28
-            otype = "CALL" if parts[1]=='C' else "PUT"
-            strike = parts[2]
-        except:
+        contract = contracts.loc[row_idx]
+        if pd.notna(contract['right']):
+            otype = "CALL" if contract['right'] == 1 else "PUT"
+            strike = contract['strike']
+        else:
             otype = "OPT"
             strike = "?"
             
@@ -0,0 +1,136 @@
+import os
+import random
+import numpy as np
+import config
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from backtest import Backtester, BacktestInputs, max_drawdown
+from broker_client import PaperBroker
+from pricing import NS_PER_DAY
+
+
+def _prepare_symbol(symbol: str) -> Optional[BacktestInputs]:
+    return Backtester(symbol, verbose=False).prepare()
+
+
+class PortfolioBacktester:
+    """
+    Backtests several symbols from one account.
+    Per-symbol features and predictions are prepared in parallel, then every
+    symbol's bars are merged into one time-ordered event stream and run against
+    a shared PaperBroker with portfolio-wide position and daily-trade limits.
+    """
+
+    def __init__(self, symbols: List[str] = None, seed: int = None, workers: int = None, verbose: bool = True):
+        self.symbols = list(symbols or config.SYMBOLS)
+        self.workers = workers
+        self.verbose = verbose
+        self.broker = PaperBroker(initial_balance=config.INITIAL_BALANCE)
+        # One SL/TP stream for the whole portfolio so a seeded run is reproducible
+        self.rng = random.Random(seed) if seed is not None else random
+        self.max_open_positions = config.PORTFOLIO_MAX_OPEN_POSITIONS
+        self.max_trades_per_day = config.PORTFOLIO_MAX_TRADES_PER_DAY
+
+    def prepare(self) -> Dict[str, BacktestInputs]:
+        """
+        Features and predictions for every symbol, computed in a process pool.
+        """
+        workers = min(len(self.symbols), self.workers or os.cpu_count() or 1)
+        if workers <= 1:
+            prepared = [_prepare_symbol(s) for s in self.symbols]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                prepared = list(pool.map(_prepare_symbol, self.symbols))
+
+        inputs = {}
+        for symbol, symbol_inputs in zip(self.symbols, prepared):
+            if symbol_inputs is None:
+                print(f"Skipping {symbol}: no data or model.")
+                continue
+            inputs[symbol] = symbol_inputs
+        return inputs
+
+    def run(self):
+        print(f"Starting portfolio backtest for {', '.join(self.symbols)}...")
+        inputs = self.prepare()
+        if not inputs:
+            return []
+        return self.simulate(inputs)
+
+    def simulate(self, inputs: Dict[str, BacktestInputs]):
+        """
+        Runs the merged event stream. Each symbol keeps its own Backtester for
+        entry/exit logic and price paths; cash, positions and limits are shared.
+        """
+        symbols = list(inputs)
+        books = []
+        for symbol in symbols:
+            book = Backtester(symbol, verbose=False, broker=self.broker, rng=self.rng)
+            book.bind(inputs[symbol])
+            books.append(book)
+
+        # Merge: one event per (symbol, bar), ordered by time then symbol
+        sym_id = np.concatenate([np.full(len(inputs[s]), k, dtype=np.int32) for k, s in enumerate(symbols)])
+        bar = np.concatenate([np.arange(len(inputs[s]), dtype=np.int64) for s in symbols])
+        ts_ns = np.concatenate([inputs[s].ts_ns for s in symbols])
+        order = np.lexsort((sym_id, ts_ns))
+        sym_id, bar, ts_ns = sym_id[order], bar[order], ts_ns[order]
+
+        # Per-event flags gathered once from the per-symbol arrays
+        tradable = np.concatenate([inputs[s].tradable for s in symbols])[order]
+        wants_entry = np.concatenate([inputs[s].entry_mask & (inputs[s].signal != 0) for s in symbols])[order]
+        sym_new_day = np.concatenate([inputs[s].new_day for s in symbols])[order]
+        day_id = ts_ns // NS_PER_DAY
+        new_day = np.r_[True, day_id[1:] != day_id[:-1]]
+
+        lookback = config.LOOKBACK_PERIOD
+        positions = self.broker.positions
+        trades_today = 0
+        self.equity_curve = np.full(len(ts_ns), self.broker.cash, dtype=np.float64)
+        equity = self.equity_curve
+
+        for k in range(len(ts_ns)):
+            if self.broker.get_account_balance() <= 0:
+                if self.verbose:
+                    s, i = sym_id[k], bar[k]
+                    print(f"!!! ACCOUNT BLOWN UP at {inputs[symbols[s]].index[i]} !!! Balance: ${self.broker.get_account_balance():.2f}")
+                equity[k:] = equity[k - 1] if k else self.broker.cash
+                break
+
+            if new_day[k]:
+                trades_today = 0
+
+            s, i = sym_id[k], bar[k]
+            book = books[s]
+            if i >= lookback:
+                if sym_new_day[k] or i == lookback:
+                    book.trades_today = 0
+
+                if tradable[k]:
+                    if book.position_ids:
+                        book._process_exits(i)
+                    if (wants_entry[k] and trades_today < self.max_trades_per_day
+                            and len(positions) < self.max_open_positions):
+                        if book._process_entry(i):
+                            trades_today += 1
+
+                # Mark-to-market: the broker keeps the account's running total, O(1) to read
+                if book.position_ids:
+                    book.mark(i)
+
+            equity[k] = self.broker.equity()
+
+        if self.verbose:
+            print(f"Portfolio backtest complete. Final Balance: ${self.broker.get_account_balance():.2f}")
+        return self.broker.trade_history
+
+    def summary(self) -> dict:
+        trades = self.broker.trade_history
+        return {
+            "final_balance": self.broker.get_account_balance(),
+            "final_equity": float(self.equity_curve[-1]) if len(self.equity_curve) else self.broker.cash,
+            "trades": len(trades),
+            "win_rate": float(np.mean([t['pnl'] > 0 for t in trades])) if trades else 0.0,
+            "max_drawdown": max_drawdown(self.equity_curve),
+            "blown_up": bool(self.broker.get_account_balance() <= 0),
+        }
@@ -0,0 +1,71 @@
+import numpy as np
+from scipy.special import ndtr
+from typing import Dict
+import config
+
+CALL = 1
+PUT = -1
+
+NS_PER_DAY = 86_400_000_000_000
+NS_PER_YEAR = 365 * NS_PER_DAY
+
+# Contracts stop trading at the close on their expiry date (wall clock)
+EXPIRY_CLOSE_NS = (config.OPTION_EXPIRY_TIME[0] * 60 + config.OPTION_EXPIRY_TIME[1]) * 60_000_000_000
+
+_INV_SQRT_2PI = 1.0 / np.sqrt(2.0 * np.pi)
+
+
+def black_scholes(spot, strike, t, vol, rate: float = config.RISK_FREE_RATE, right=CALL) -> Dict[str, np.ndarray]:
+    """
+    Black-Scholes prices and Greeks for whole arrays of contracts in one call.
+    All inputs broadcast against each other. t is in years, vol and rate are annualized,
+    right is CALL (1) or PUT (-1) per contract.
+    Returns price, delta, gamma, theta (per year) and vega (per 1.00 of vol).
+    """
+    spot = np.asarray(spot, dtype=np.float64)
+    strike = np.asarray(strike, dtype=np.float64)
+    t = np.maximum(np.asarray(t, dtype=np.float64), config.MIN_TIME_TO_EXPIRY)
+    vol = np.maximum(np.asarray(vol, dtype=np.float64), config.MIN_VOLATILITY)
+    w = np.asarray(right, dtype=np.float64)
+
+    sqrt_t = np.sqrt(t)
+    vol_sqrt_t = vol * sqrt_t
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * t) / vol_sqrt_t
+    d2 = d1 - vol_sqrt_t
+
+    discounted_strike = strike * np.exp(-rate * t)
+    nd1 = ndtr(w * d1)
+    nd2 = ndtr(w * d2)
+    pdf_d1 = _INV_SQRT_2PI * np.exp(-0.5 * d1 * d1)
+
+    return {
+        "price": w * (spot * nd1 - discounted_strike * nd2),
+        "delta": w * nd1,
+        "gamma": pdf_d1 / (spot * vol_sqrt_t),
+        "theta": -spot * pdf_d1 * vol / (2 * sqrt_t) - w * rate * discounted_strike * nd2,
+        "vega": spot * pdf_d1 * sqrt_t,
+    }
+
+
+def time_to_expiry(now_ns, expiry_day_ns) -> np.ndarray:
+    """
+    Years from now_ns until the close on the expiry date (both int64 ns, wall clock).
+    """
+    remaining = np.asarray(expiry_day_ns) + EXPIRY_CLOSE_NS - np.asarray(now_ns)
+    return remaining / NS_PER_YEAR
+
+
+def option_prices(spot, strike, right, now_ns, expiry_day_ns, vol=None) -> np.ndarray:
+    """
+    Simulated option prices for arrays of contracts and/or bars.
+    Uses Black-Scholes when a volatility is supplied and OPTION_PRICING_MODEL is
+    "black_scholes"; otherwise the legacy intrinsic + (dte + 1) * 0.5 placeholder.
+    """
+    if vol is None or config.OPTION_PRICING_MODEL != "black_scholes":
+        dte = (np.asarray(expiry_day_ns) - (np.asarray(now_ns) // NS_PER_DAY) * NS_PER_DAY) // NS_PER_DAY
+        intrinsic = np.maximum(np.asarray(right) * (np.asarray(spot) - strike), 0)
+        return np.maximum(intrinsic + (dte + 1) * 0.5, 0.01)
+
+    t = time_to_expiry(now_ns, expiry_day_ns)
+    price = black_scholes(spot, strike, t, vol, right=right)["price"]
+    return np.maximum(price, 0.01)
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import time
+import pandas as pd
+import config
+from typing import Dict, List
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+from live_engine import interval_seconds
+from metrics import METRICS, Histogram
+
+
+def _iso(ts_ns: int) -> str:
+    return pd.Timestamp(ts_ns, tz="UTC").strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ReplayServer:
+    """
+    Local websocket server speaking the Alpaca market data stream protocol, for
+    testing MarketStream and the live engine offline. Streams stored bars (e.g.
+    from DataManager.fetch_many) in time order: each step sends a quote and then
+    the bars of every subscribed symbol starting at that time, `speed` times
+    faster than real time (0: as fast as the client reads).
+
+    Every connection replays from the start; `sent_at` records when each step's
+    bars went out (perf_counter), for end-to-end latency.
+    """
+
+    def __init__(self, bars: Dict[str, pd.DataFrame], speed: float = config.REPLAY_SPEED,
+                 interval: str = config.INTERVAL, quotes: bool = True, key_id: str = None, secret_key: str = None):
+        self.speed = speed
+        self.interval = interval
+        self.quotes = quotes
+        self.key_id = key_id
+        self.secret_key = secret_key
+        steps = {}
+        for symbol, df in bars.items():
+            ts = df.index.values.astype('datetime64[ns]').view('int64') # UTC (naive indexes taken as UTC)
+            for t, (o, h, l, c, v) in zip(ts, df[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy()):
+                steps.setdefault(int(t), []).append(
+                    {"T": "b", "S": symbol, "o": o, "h": h, "l": l, "c": c, "v": v, "t": _iso(t)})
+        self.steps = sorted(steps.items())
+        self.sent_at: Dict[int, float] = {}
+        self.messages_sent = 0
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Serves on the running event loop; returns the ws:// URL (a free port by default).
+        """
+        self._server = await serve(self._handler, host, port, max_size=None)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"ws://{host}:{port}"
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _send(self, ws, messages: List[dict]):
+        await ws.send(json.dumps(messages))
+        self.messages_sent += 1
+
+    async def _handler(self, ws):
+        try:
+            await self._replay(ws)
+        except ConnectionClosed:
+            pass # the client stopped (or reconnects and gets the replay from the start)
+
+    async def _replay(self, ws):
+        await self._send(ws, [{"T": "success", "msg": "connected"}])
+        auth = json.loads(await ws.recv())
+        if self.key_id is not None and (auth.get("key"), auth.get("secret")) != (self.key_id, self.secret_key):
+            await self._send(ws, [{"T": "error", "code": 402, "msg": "auth failed"}])
+            return
+        await self._send(ws, [{"T": "success", "msg": "authenticated"}])
+        request = json.loads(await ws.recv())
+        symbols = set(request.get("bars", []))
+        quote_symbols = set(request.get("quotes", []))
+        await self._send(ws, [{"T": "subscription", "bars": sorted(symbols), "quotes": sorted(quote_symbols)}])
+
+        delay = interval_seconds(self.interval) / self.speed if self.speed else 0.0
+        for ts_ns, step in self.steps:
+            step = [m for m in step if m["S"] in symbols]
+            if not step:
+                continue
+            if delay:
+                await asyncio.sleep(delay)
+            if self.quotes and quote_symbols:
+                # Spread of one basis point around the bar's open, stamped at the bar start
+                await self._send(ws, [{"T": "q", "S": m["S"], "bp": m["o"] * 0.99995, "ap": m["o"] * 1.00005, "t": m["t"]}
+                                      for m in step if m["S"] in quote_symbols])
+            self.sent_at[ts_ns] = time.perf_counter()
+            await self._send(ws, step)
+        await ws.wait_closed()
+
+
+def replay_live(symbols: List[str], start: str, speed: float = config.REPLAY_SPEED, limit: int = None) -> dict:
+    """
+    Offline end-to-end run of the streaming live path: stored bars from `start`
+    on are replayed through a local ReplayServer into a MarketStream and traded
+    by the live engine on a paper account (indicators warmed up on the bars
+    before `start`). Returns throughput and per-bar latency: `latency_*` from
+    a bar's arrival to the trade decision (at high speeds mostly time queued
+    behind earlier bars), `bar_*` the engine's own processing time per bar.
+    """
+    from broker_client import PaperBroker
+    from live_engine import LiveEngine
+    from live_trading import MultiSymbolTrader
+    from market_stream import MarketStream, bar_bounds
+
+    trader = MultiSymbolTrader(symbols, broker=PaperBroker(initial_balance=config.INITIAL_BALANCE))
+    history = trader.dm.fetch_many(symbols)
+    warm, replay = {}, {}
+    begin = pd.Timestamp(start)
+    for s, df in history.items():
+        first = df.index.searchsorted(begin.tz_localize(df.index.tz) if df.index.tz is not None else begin)
+        warm[s] = df.iloc[:first + 1] # warm_up() commits all but the last row: everything before `start`
+        replay[s] = df.iloc[first:first + limit] if limit else df.iloc[first:]
+
+    async def run():
+        server = ReplayServer(replay, speed=speed)
+        stream = MarketStream(symbols, url=await server.start(), source_interval=config.INTERVAL)
+        trader.warm_up(warm, stream)
+        engine = LiveEngine([trader])
+        started = time.perf_counter()
+        # Each step inside the session completes one bar (extended-hours bars are dropped by the stream)
+        bars = len({bar_bounds(ts_ns)[0] for ts_ns, _ in server.steps if bar_bounds(ts_ns) is not None})
+        try:
+            await engine.run_stream(stream, bars=bars, warm_up=False)
+        finally:
+            await server.stop()
+        elapsed = time.perf_counter() - started
+        latency = pd.Series(engine.bar_latency, dtype=float) * 1e3
+        processing = METRICS.histograms.get(("bar", trader.symbol), Histogram()).summary()
+        return {
+            "bars": bars,
+            "symbol_bars": int(sum(len(df) for df in replay.values())),
+            "messages": stream.stats["messages"],
+            "seconds": elapsed,
+            "bars_per_second": bars / elapsed if elapsed else 0.0,
+            "latency_p50_ms": latency.quantile(0.5),
+            "latency_p95_ms": latency.quantile(0.95),
+            "latency_max_ms": latency.max(),
+            "bar_p50_ms": processing["p50"] * 1e3,
+            "bar_p95_ms": processing["p95"] * 1e3,
+            "bar_max_ms": processing["max"] * 1e3,
+            "trades": len(trader.broker.trade_history),
+            "equity": trader.broker.equity(),
+        }
+
+    return asyncio.run(run())
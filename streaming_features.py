@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+from features import FEATURE_COLUMNS
+
+# Longest lookback any indicator needs (SMA_200), plus the bar that leaves the window
+_CAPACITY = 256
+# Recompute running sums from the ring buffers this often to stop float drift
+_RESYNC_EVERY = 1024
+
+
+class IncrementalFeatures:
+    """
+    Streaming version of FeatureEngineer.compute_features for the live loop.
+    Holds ring buffers, running window sums and EWM states, and updates every
+    indicator in O(1) per new bar (independent of history length).
+
+    update() commits a completed bar. preview() evaluates a still-forming bar
+    against the committed state without changing it, so the live loop can score
+    the latest partial bar and commit it once it closes.
+    """
+
+    SMA_PERIODS = (9, 20, 50, 200)
+
+    def __init__(self):
+        self.n = 0 # committed bars
+        self._close = np.zeros(_CAPACITY)
+        self._gain = np.zeros(_CAPACITY)
+        self._loss = np.zeros(_CAPACITY)
+        self._tr = np.zeros(_CAPACITY)
+        self._sma_sum = {p: 0.0 for p in self.SMA_PERIODS}
+        self._gain_sum = 0.0
+        self._loss_sum = 0.0
+        self._tr_sum = 0.0
+        self._ema12 = self._ema26 = self._macd_signal = None
+        self._prev_close = np.nan
+        self._prev_volume = np.nan
+        self.last_timestamp = None
+
+    def warm_up(self, df: pd.DataFrame) -> "IncrementalFeatures":
+        """
+        Feeds stored history once (e.g. at startup). EWM states depend on the
+        whole series, so this must start from the same first bar compute_features sees.
+        """
+        cols = df[['Open', 'High', 'Low', 'Close', 'Volume']].to_numpy(dtype=np.float64)
+        for row in cols:
+            self._step(*row, commit=True)
+        if len(df):
+            self.last_timestamp = df.index[-1]
+        return self
+
+    def update(self, bar: pd.Series, timestamp=None) -> Optional[np.ndarray]:
+        """
+        Commits a completed bar (Open/High/Low/Close/Volume) and returns its
+        feature vector in FEATURE_COLUMNS order, or None while indicators are warming up.
+        """
+        out = self._step(bar['Open'], bar['High'], bar['Low'], bar['Close'], bar['Volume'], commit=True)
+        self.last_timestamp = timestamp if timestamp is not None else getattr(bar, 'name', None)
+        return out
+
+    def preview(self, bar: pd.Series) -> Optional[np.ndarray]:
+        """
+        Feature vector for a bar that has not closed yet; state is left untouched.
+        """
+        return self._step(bar['Open'], bar['High'], bar['Low'], bar['Close'], bar['Volume'], commit=False)
+
+    def to_frame(self, features: np.ndarray, timestamp=None) -> pd.DataFrame:
+        """
+        One-row frame with the column names the models were trained on.
+        """
+        return pd.DataFrame([features], columns=FEATURE_COLUMNS, index=[timestamp])
+
+    def _window(self, buf: np.ndarray, x: float, period: int) -> np.ndarray:
+        """
+        Last `period` values of buf (committed) with x appended as the newest.
+        """
+        idx = np.arange(self.n - period + 1, self.n) % _CAPACITY
+        return np.append(buf[idx], x)
+
+    def _step(self, o, h, l, c, v, commit: bool) -> Optional[np.ndarray]:
+        n = self.n + 1 # bars including this one
+        pos = self.n % _CAPACITY
+
+        def leaving(buf, period):
+            return buf[(self.n - period) % _CAPACITY] if self.n >= period else 0.0
+
+        # 1. log Returns
+        pc = self._prev_close
+        log_ret = np.log(c / pc) if n > 1 else np.nan
+
+        # 2. Moving Averages (running window sums)
+        sma_sum = {p: self._sma_sum[p] + c - leaving(self._close, p) for p in self.SMA_PERIODS}
+        sma = {p: sma_sum[p] / p if n >= p else np.nan for p in self.SMA_PERIODS}
+
+        # 3. RSI (14): the first bar's diff is NaN and counts as zero gain/loss
+        delta = c - pc if n > 1 else np.nan
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        gain_sum = self._gain_sum + gain - leaving(self._gain, 14)
+        loss_sum = self._loss_sum + loss - leaving(self._loss, 14)
+        if n >= 14:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rs = np.float64(gain_sum / 14) / np.float64(loss_sum / 14)
+                rsi = 100 - (100 / (1 + rs))
+        else:
+            rsi = np.nan
+
+        # 4. MACD (EWM, adjust=False)
+        if self._ema12 is None:
+            ema12, ema26 = c, c
+        else:
+            ema12 = self._ema12 + (2 / 13) * (c - self._ema12)
+            ema26 = self._ema26 + (2 / 27) * (c - self._ema26)
+        macd = ema12 - ema26
+        macd_signal = macd if self._macd_signal is None else self._macd_signal + (2 / 10) * (macd - self._macd_signal)
+
+        # 5. Bollinger Bands (20)
+        if n >= 20:
+            window20 = self._window(self._close, c, 20)
+            bb_std = window20.std(ddof=1)
+        else:
+            window20 = None
+            bb_std = np.nan
+        bb_mid = sma[20]
+        bb_upper = bb_mid + 2 * bb_std
+        bb_lower = bb_mid - 2 * bb_std
+        bb_width = (bb_upper - bb_lower) / bb_mid
+
+        # 6. ATR (14); the first bar has no previous close, so its true range is High - Low
+        if n > 1:
+            tr = max(h - l, abs(h - pc), abs(l - pc))
+        else:
+            tr = h - l
+        tr_sum = self._tr_sum + tr - leaving(self._tr, 14)
+        atr = tr_sum / 14 if n >= 14 else np.nan
+
+        # 7. Volume Change
+        pv = self._prev_volume
+        with np.errstate(divide='ignore', invalid='ignore'):
+            vol_change = np.float64(v) / np.float64(pv) - 1 if n > 1 else np.nan
+
+        # 8. Momentum (ROC)
+        momentum = c / self._close[(self.n - 10) % _CAPACITY] - 1 if n > 10 else np.nan
+
+        # 9. Volatility Ratio (Short term / Long term)
+        vol_ratio = window20[-5:].std(ddof=1) / bb_std if window20 is not None else np.nan
+
+        if commit:
+            self._close[pos] = c
+            self._gain[pos] = gain
+            self._loss[pos] = loss
+            self._tr[pos] = tr
+            self._sma_sum = sma_sum
+            self._gain_sum, self._loss_sum, self._tr_sum = gain_sum, loss_sum, tr_sum
+            self._ema12, self._ema26, self._macd_signal = ema12, ema26, macd_signal
+            self._prev_close, self._prev_volume = c, v
+            self.n = n
+            if n % _RESYNC_EVERY == 0:
+                self._resync()
+
+        features = np.array([
+            log_ret, sma[9], sma[20], sma[50], sma[200], rsi, macd, macd_signal,
+            bb_mid, bb_std, bb_upper, bb_lower, bb_width, atr, vol_change, momentum, vol_ratio
+        ], dtype=np.float64)
+        if not np.isfinite(features).all() or not np.isfinite([o, h, l, c, v]).all():
+            return None
+        return features
+
+    def _resync(self):
+        def window_sum(buf, period):
+            idx = np.arange(self.n - period, self.n) % _CAPACITY
+            return float(buf[idx].sum())
+
+        self._sma_sum = {p: window_sum(self._close, p) for p in self.SMA_PERIODS}
+        self._gain_sum = window_sum(self._gain, 14)
+        self._loss_sum = window_sum(self._loss, 14)
+        self._tr_sum = window_sum(self._tr, 14)
@@ -0,0 +1,108 @@
+import itertools
+import os
+import random
+import time
+import pandas as pd
+import config
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from backtest import Backtester, BacktestInputs
+
+# Inputs shared read-only by every run in a worker process (set by _init_worker)
+_SHARED_INPUTS = None
+
+
+def grid_configs(grid: Dict[str, list]) -> List[Dict]:
+    """
+    Every combination of the grid values.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+
+
+def sample_configs(grid: Dict[str, list], samples: int, seed: Optional[int] = None) -> List[Dict]:
+    """
+    Random configurations drawn from the grid. A (low, high) tuple is sampled
+    uniformly (as an int if both ends are ints); a list is sampled by choice.
+    """
+    rng = random.Random(seed)
+    configs = []
+    for _ in range(samples):
+        cfg = {}
+        for name, values in grid.items():
+            if isinstance(values, tuple):
+                low, high = values
+                cfg[name] = rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+            else:
+                cfg[name] = rng.choice(values)
+        configs.append(cfg)
+    return configs
+
+
+def is_valid(cfg: Dict) -> bool:
+    """
+    Drops configurations whose min bound exceeds the matching max bound.
+    """
+    merged = {name: getattr(config, name) for name in ("MIN_STOP_LOSS_PERCENT", "MAX_STOP_LOSS_PERCENT",
+                                                      "MIN_TAKE_PROFIT_PERCENT", "MAX_TAKE_PROFIT_PERCENT")}
+    merged.update(cfg)
+    return (merged["MIN_STOP_LOSS_PERCENT"] <= merged["MAX_STOP_LOSS_PERCENT"]
+            and merged["MIN_TAKE_PROFIT_PERCENT"] <= merged["MAX_TAKE_PROFIT_PERCENT"])
+
+
+def _init_worker(inputs: BacktestInputs):
+    global _SHARED_INPUTS
+    _SHARED_INPUTS = inputs
+
+
+def _run_job(job: Tuple[Dict, Optional[int]]) -> Dict:
+    risk, seed = job
+    bt = Backtester(_SHARED_INPUTS.symbol, seed=seed, risk=risk, verbose=False)
+    bt.simulate(_SHARED_INPUTS)
+    return {**risk, "seed": seed, **bt.summary()}
+
+
+def run_parallel(inputs: BacktestInputs, jobs: List[Tuple[Dict, Optional[int]]], workers: Optional[int] = None) -> List[Dict]:
+    """
+    Runs one Backtester per (risk overrides, seed) job in a process pool.
+    The inputs are handed to each worker once at startup, not per job.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        _init_worker(inputs)
+        return [_run_job(job) for job in jobs]
+
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(inputs,)) as pool:
+        return list(pool.map(_run_job, jobs, chunksize=chunksize))
+
+
+def run_sweep(symbol: str, samples: Optional[int] = None, workers: Optional[int] = None,
+              seed: int = config.SWEEP_SEED, grid: Dict[str, list] = None) -> pd.DataFrame:
+    """
+    Backtests every configuration of config.SWEEP_GRID (or `samples` random draws from it)
+    against one set of prices, features and predictions.
+    Every configuration uses the same SL/TP random stream so results are comparable.
+    Writes one summary row per configuration to data/sweeps/{symbol}_sweep.csv.
+    """
+    grid = grid or config.SWEEP_GRID
+    configs = sample_configs(grid, samples, seed) if samples else grid_configs(grid)
+    configs = [c for c in configs if is_valid(c)]
+    configs = list({tuple(sorted(c.items())): c for c in configs}.values()) # drop repeated draws
+
+    inputs = Backtester(symbol).prepare()
+    if inputs is None:
+        return pd.DataFrame()
+
+    print(f"Sweeping {len(configs)} configurations for {symbol}...")
+    start = time.perf_counter()
+    rows = run_parallel(inputs, [(cfg, seed) for cfg in configs], workers)
+    print(f"Sweep finished in {time.perf_counter() - start:.1f}s")
+
+    results = pd.DataFrame(rows).sort_values("final_equity", ascending=False)
+    out_dir = config.DATA_DIR / "sweeps"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"{symbol}_sweep.csv"
+    results.to_csv(out_path, index=False)
+    print(f"Saved sweep results to {out_path}")
+    return results
@@ -1,15 +1,20 @@
 import argparse
+import os
+import time
 import config
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Optional
 from data_loader import DataManager
-from features import FeatureEngineer
-from models import SymbolModel
+from feature_cache import FeatureCache, bars_digest
+from features import FEATURE_COLUMNS
+from models import SymbolModel, MODEL_TYPES
+from multi_horizon import target_columns
 
-def run_training_pipeline(symbol: str):
+def run_training_pipeline(symbol: str, model_type: str = config.MODEL_TYPE, shared: bool = config.SHARED_HORIZON_MODEL):
     """
     Full training pipeline: fetch data -> clean -> feature engineer -> train -> save.
     """
     dm = DataManager()
-    fe = FeatureEngineer()
     
     # 1. Fetch Data
     df = dm.fetch_data(symbol)
@@ -17,25 +22,142 @@ def run_training_pipeline(symbol: str):
         print(f"Error: No data for {symbol}")
         return
 
-    # 2. Features
-    df = fe.compute_features(df)
-    
-    # 3. Targets
-    df = fe.generate_targets(df)
-    
-    # CLEAN DATA: distinct handling for infinite values which might break sklearn
-    import numpy as np
-    df.replace([np.inf, -np.inf], np.nan, inplace=True)
-    df.dropna(inplace=True)
+    # 2. Features + 3. Targets (cached on disk; unchanged bars skip featurization)
+    # Invalid rows are already masked out, so the frame is NaN/inf free for sklearn.
+    data_hash = bars_digest(df)
+    df = FeatureCache().get(df).training_frame()
     
     # 4. Train
-    model = SymbolModel(symbol, model_type="gb")
+    model = SymbolModel(symbol, model_type=model_type, shared=shared)
+    model.data_hash = data_hash
     model.train(df)
     print(f"Training complete for {symbol}")
 
+def _train_job(job) -> dict:
+    """
+    One (symbol, horizon, fit) job; horizon None fits one shared model for all
+    horizons. The worker maps the symbol's cached feature/label entry read-only,
+    so only the rows it trains on are copied.
+    """
+    symbol, key, h, kind, model_type = job
+    start = time.perf_counter()
+    fm = FeatureCache(enabled=True).read(key)
+    if fm is None:
+        raise FileNotFoundError(f"Feature cache entry {key} for {symbol} is missing (removed while training?)")
+    df = fm.training_frame()
+    X = df[FEATURE_COLUMNS]
+    y = df[target_columns(config.TARGET_HORIZONS)] if h is None else df[f"target_{h}h"]
+    
+    model = SymbolModel(symbol, model_type=model_type)
+    result = {"symbol": symbol, "horizon": h, "fit": kind, "rows": len(X)}
+    if kind == "eval":
+        if h is None:
+            result["accuracy"] = {k: acc for k, (acc, _) in model.evaluate_shared(X, y).items()}
+        else:
+            acc, result["report"] = model.evaluate_horizon(X, y, h)
+            result["accuracy"] = {h: acc}
+    else:
+        # Returned to the parent, which publishes all horizons of a symbol as one version
+        result["model"] = model.fit_horizon(X, y, h)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _format_accuracy(accuracy: dict) -> str:
+    return ", ".join(f"{h}h {acc:.4f}" for h, acc in accuracy.items())
+
+
+def run_training_all(symbols: List[str] = None, workers: Optional[int] = None, model_type: str = config.MODEL_TYPE,
+                     shared: bool = config.SHARED_HORIZON_MODEL) -> List[dict]:
+    """
+    Trains every symbol and horizon in parallel.
+    Each horizon's 80/20 evaluation fit and full-data fit are separate jobs, so
+    a universe of S symbols and H horizons runs as 2*S*H jobs in one process pool
+    (2*S with shared=True: one model per symbol covers every horizon).
+    Features and labels are computed once per symbol into the feature cache;
+    workers memory-map them instead of receiving pickled frames, so those entries
+    are pinned against eviction until training ends. Each symbol's models are
+    published to the registry as one version once its fits are done; a failed
+    job only keeps its own symbol from being published.
+    """
+    symbols = list(symbols or config.SYMBOLS)
+    dm = DataManager()
+    cache = FeatureCache(enabled=True)
+    
+    jobs = []
+    data_hashes = {}
+    pinned = set() # cache keys of symbols with jobs; an entry evicted before its jobs run fails them
+    for symbol in symbols:
+        df = dm.fetch_data(symbol)
+        if df.empty:
+            print(f"Error: No data for {symbol}")
+            continue
+        key = cache.key(df)
+        data_hashes[symbol] = bars_digest(df)
+        rows = int(cache.get(df, pinned=pinned).valid.sum())
+        pinned.add(key)
+        for h in ([None] if shared else config.TARGET_HORIZONS):
+            for kind in ("final", "eval"):
+                jobs.append((rows, (symbol, key, h, kind, model_type)))
+    
+    # Longest jobs first (full-data fits on the longest histories) to shorten the tail
+    jobs = [job for _, job in sorted(jobs, key=lambda j: (-j[0], j[1][3] != "final"))]
+    workers = max(1, min(len(jobs), workers or os.cpu_count() or 1))
+    per_symbol = "1 shared model" if shared else f"{len(config.TARGET_HORIZONS)} horizons"
+    print(f"Training {len(jobs)} jobs ({len(symbols)} symbols x {per_symbol} x 2 fits) on {workers} workers...")
+    
+    start = time.perf_counter()
+    results = []
+    finals = {symbol: {} for symbol in data_hashes}
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_train_job, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            symbol, _, h, kind, _ = futures[future]
+            try:
+                r = future.result()
+            except Exception as e:
+                label = "all horizons" if h is None else f"{h}h"
+                print(f"[{done}/{len(jobs)}] {symbol} {label} {kind} fit FAILED: {type(e).__name__}: {e}")
+                if kind == "final" and symbol in finals:
+                    finals.pop(symbol) # an incomplete version is never published
+                    failed.append(symbol)
+                continue
+            detail = f" accuracy {_format_accuracy(r['accuracy'])}" if r["fit"] == "eval" else ""
+            label = "all horizons" if r["horizon"] is None else f"{r['horizon']}h"
+            print(f"[{done}/{len(jobs)}] {r['symbol']} {label} {r['fit']} fit: {r['seconds']:.1f}s{detail}")
+            if r["fit"] == "final":
+                model = r.pop("model")
+                horizons = config.TARGET_HORIZONS if r["horizon"] is None else [r["horizon"]]
+                fitted = finals.get(r["symbol"]) # None once another of its final fits failed
+                if fitted is not None:
+                    fitted.update({h: model for h in horizons})
+                    if len(fitted) == len(config.TARGET_HORIZONS):
+                        model = SymbolModel(r["symbol"], model_type=model_type)
+                        model.models, model.data_hash = finals.pop(r["symbol"]), data_hashes[r["symbol"]]
+                        model.save()
+            results.append(r)
+    elapsed = time.perf_counter() - start
+    cache.evict() # workers are done with the pinned entries
+    
+    print("\n--- Training Summary ---")
+    for symbol in symbols:
+        rows = sorted((r for r in results if r["symbol"] == symbol), key=lambda r: (r["horizon"], r["fit"]))
+        if not rows:
+            continue
+        accuracy = ", ".join(_format_accuracy(r["accuracy"]) for r in rows if r["fit"] == "eval")
+        print(f"{symbol}: {sum(r['seconds'] for r in rows):.1f}s of fits, test accuracy {accuracy}")
+    busy = sum(r["seconds"] for r in results)
+    if failed:
+        print(f"Not published (a final fit failed): {', '.join(failed)}")
+    print(f"Wall time {elapsed:.1f}s for {busy:.1f}s of fits ({busy / elapsed if elapsed else 0:.1f}x parallel speedup)")
+    return results
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--symbol", type=str, default="SPY", help="Symbol to train")
+    parser.add_argument("--model-type", type=str, default=config.MODEL_TYPE, choices=MODEL_TYPES, help="Model backend")
+    parser.add_argument("--shared", action="store_true", default=config.SHARED_HORIZON_MODEL, help="One model for all horizons")
     args = parser.parse_args()
     
-    run_training_pipeline(args.symbol)
+    run_training_pipeline(args.symbol, model_type=args.model_type, shared=args.shared)
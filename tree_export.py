@@ -0,0 +1,330 @@
+import numpy as np
+from pathlib import Path
+from typing import Dict, List
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, HistGradientBoostingClassifier
+from multi_horizon import MultiHorizonClassifier
+
+# How each exported model turns leaf values into a class
+_FOREST, _BOOSTED, _HIST_BOOSTED = 0, 1, 2
+
+
+class CompiledEnsemble:
+    """
+    Every horizon's tree ensemble flattened into one set of node arrays
+    (feature, threshold, children, NaN direction, leaf values) and evaluated
+    with vectorized NumPy traversal: one call scores all horizons for a row or
+    a batch, without sklearn input validation or DataFrames.
+
+    Predictions are bit-identical to the sklearn models. Inputs are compared the
+    way each estimator does it (float32 for sklearn trees, float64 for histogram
+    boosting), and leaf values are summed tree by tree in sklearn's order.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.left = arrays['left']
+        self.right = arrays['right']
+        self.missing_left = arrays['missing_left']
+        self.value = arrays['value']
+        self.roots = arrays['roots']
+        self.depth = int(arrays['depth'])
+        self.n_features = int(arrays['n_features'])
+        # One row per horizon: horizon, kind, first tree, tree count, outputs per stage, classes,
+        # first leaf value column (horizons of a shared model use the same trees)
+        models = np.asarray(arrays['models'])
+        if models.shape[1] == 6:
+            # Saved before shared models: every horizon's values start at column 0
+            models = np.hstack([models, np.zeros((len(models), 1), dtype=models.dtype)])
+        self.models = models
+        self.classes = arrays['classes']
+        self.baseline = arrays['baseline']
+
+    @property
+    def horizons(self):
+        return [int(h) for h in self.models[:, 0]]
+
+    def _leaves(self, X: np.ndarray, tree_rows: np.ndarray = None) -> np.ndarray:
+        """
+        Leaf node of every tree for every row, shape (n_trees, n_rows); or, given
+        the row each tree reads (tree_rows), one leaf per tree, shape (n_trees, 1).
+        """
+        X64 = np.asarray(X, dtype=np.float64)
+        # Columns [0, F) as float64 (histogram boosting), [F, 2F) rounded through float32 (sklearn trees)
+        Xcat = np.concatenate([X64, X64.astype(np.float32).astype(np.float64)], axis=1)
+        if tree_rows is not None:
+            # One row per tree: each step only walks the trees that have not reached a leaf
+            node = self.roots.copy()
+            active = np.arange(len(node))
+            for _ in range(self.depth):
+                if not len(active):
+                    break
+                current = node[active]
+                x = Xcat[tree_rows[active], self.feature[current]]
+                go_left = np.where(np.isnan(x), self.missing_left[current], x <= self.threshold[current])
+                node[active] = np.where(go_left, self.left[current], self.right[current])
+                active = active[self.left[node[active]] != node[active]] # leaves point to themselves
+            return node[:, None]
+
+        rows = np.arange(len(Xcat))
+        node = np.repeat(self.roots[:, None], len(Xcat), axis=1)
+        # Leaves point to themselves, so every tree can take the same number of steps
+        for _ in range(self.depth):
+            x = Xcat[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_left[node], x <= self.threshold[node])
+            node = np.where(go_left, self.left[node], self.right[node])
+        return node
+
+    def predict(self, X: np.ndarray) -> Dict[int, np.ndarray]:
+        """
+        Class labels per horizon for X (n_rows x n_features, or one row), like SymbolModel.predict.
+        """
+        X = np.atleast_2d(X)
+        leaves = self._leaves(X)
+        return {int(self.models[m][0]): self._labels(m, leaves) for m in range(len(self.models))}
+
+    def _labels(self, m: int, leaves: np.ndarray) -> np.ndarray:
+        """
+        Class labels of model row m from the leaves its trees reached (n_trees x n_rows).
+        """
+        h, kind, first, count, k_out, n_classes, col = self.models[m]
+        n = leaves.shape[1]
+        classes = self.classes[m][:n_classes]
+        values = self.value[leaves[first:first + count]] # (trees, rows, width)
+        if kind == _FOREST:
+            # Sequential sum over trees (cumsum, not pairwise np.sum), then the mean
+            proba = np.cumsum(values[:, :, col:col + k_out], axis=0)[-1] / count
+            encoded = np.argmax(proba, axis=1)
+        else:
+            stages = values[:, :, col].reshape(count // k_out, k_out, n)
+            start = np.broadcast_to(self.baseline[m][:k_out, None], (1, k_out, n))
+            raw = np.cumsum(np.concatenate([start, stages]), axis=0)[-1] # (k_out, rows)
+            if k_out == 1:
+                # Binary: GradientBoosting predicts raw >= 0, HistGradientBoosting raw > 0
+                encoded = (raw[0] > 0 if kind == _HIST_BOOSTED else raw[0] >= 0).astype(int)
+            else:
+                encoded = np.argmax(raw, axis=0)
+        return classes[encoded]
+
+    _FIELDS = ['feature', 'threshold', 'left', 'right', 'missing_left', 'value', 'roots',
+               'models', 'classes', 'baseline', 'depth', 'n_features']
+
+    def save(self, folder: Path):
+        """
+        One .npy file per array, so load() can memory-map them.
+        """
+        folder = Path(folder)
+        folder.mkdir(parents=True, exist_ok=True)
+        for name in self._FIELDS:
+            np.save(folder / f"{name}.npy", np.asarray(getattr(self, name)), allow_pickle=False)
+
+    @classmethod
+    def load(cls, folder: Path, mmap_mode: str = None) -> "CompiledEnsemble":
+        folder = Path(folder)
+        return cls({name: np.load(folder / f"{name}.npy", mmap_mode=mmap_mode) for name in cls._FIELDS})
+
+
+class EnsembleBatch:
+    """
+    Several symbols' CompiledEnsembles merged into one set of node arrays, so
+    the newest bar of every symbol is scored in one traversal: each tree reads
+    only its own symbol's row. Labels match each ensemble's predict().
+    """
+
+    def __init__(self, ensembles: List[CompiledEnsemble]):
+        self.ensembles = list(ensembles)
+        n_features = {int(e.n_features) for e in self.ensembles}
+        if len(n_features) > 1:
+            raise ValueError(f"Ensembles were built for different feature counts: {sorted(n_features)}")
+        width = max([e.value.shape[1] for e in self.ensembles] + [1])
+        n_classes = max([e.classes.shape[1] for e in self.ensembles] + [0])
+        n_baseline = max([e.baseline.shape[1] for e in self.ensembles] + [0])
+
+        def padded(a, cols):
+            return np.pad(np.asarray(a), ((0, 0), (0, cols - a.shape[1])))
+
+        node_offset, tree_offset = 0, 0
+        parts = {name: [] for name in ['feature', 'threshold', 'left', 'right', 'missing_left', 'value',
+                                       'roots', 'models', 'classes', 'baseline']}
+        for e in self.ensembles:
+            parts['feature'].append(e.feature)
+            parts['threshold'].append(e.threshold)
+            parts['left'].append(e.left + node_offset)
+            parts['right'].append(e.right + node_offset)
+            parts['missing_left'].append(e.missing_left)
+            parts['value'].append(padded(e.value, width))
+            parts['roots'].append(e.roots + node_offset)
+            models = np.array(e.models, dtype=np.int64)
+            models[:, 2] += tree_offset # first tree
+            parts['models'].append(models)
+            parts['classes'].append(padded(e.classes, n_classes))
+            parts['baseline'].append(padded(e.baseline, n_baseline))
+            node_offset += len(e.feature)
+            tree_offset += len(e.roots)
+
+        arrays = {name: np.concatenate(values) for name, values in parts.items()}
+        arrays['models'] = arrays['models'].reshape(-1, 7)
+        arrays['depth'] = max([int(e.depth) for e in self.ensembles] + [0])
+        arrays['n_features'] = n_features.pop() if n_features else 0
+        self.merged = CompiledEnsemble(arrays)
+        # Which input row (symbol) each tree and each model row belongs to
+        self.tree_owner = np.repeat(np.arange(len(self.ensembles)), [len(e.roots) for e in self.ensembles])
+        self.model_owner = np.repeat(np.arange(len(self.ensembles)), [len(e.models) for e in self.ensembles])
+
+    def predict(self, X: np.ndarray) -> List[Dict[int, np.ndarray]]:
+        """
+        One row per ensemble, in order; returns each ensemble's {horizon: labels (1,)}.
+        """
+        X = np.atleast_2d(X)
+        leaves = self.merged._leaves(X, self.tree_owner)
+        results = [{} for _ in self.ensembles]
+        for m, owner in enumerate(self.model_owner):
+            results[owner][int(self.merged.models[m][0])] = self.merged._labels(m, leaves)
+        return results
+
+
+def _sklearn_tree_nodes(tree, n_features: int, normalize: bool):
+    t = tree.tree_
+    leaf = t.children_left == -1
+    idx = np.arange(t.node_count)
+    value = t.value.astype(np.float64) # (nodes, outputs, classes)
+    if normalize:
+        # Tree class fractions as DecisionTreeClassifier.predict_proba returns them
+        # (older sklearn stores counts and normalizes at predict time)
+        sums = value.sum(axis=2, keepdims=True)
+        if not np.allclose(sums[leaf], 1.0):
+            sums[sums == 0.0] = 1.0
+            value = value / sums
+    # Multi-output forests: output k's classes are columns [k * classes, (k + 1) * classes)
+    value = value.reshape(t.node_count, -1)
+    missing = getattr(t, 'missing_go_to_left', np.zeros(t.node_count, dtype=np.uint8))
+    return {
+        'feature': np.where(leaf, 0, t.feature + n_features), # float32-rounded block of inputs
+        'threshold': np.where(leaf, 0.0, t.threshold),
+        'left': np.where(leaf, idx, t.children_left),
+        'right': np.where(leaf, idx, t.children_right),
+        'missing_left': missing.astype(bool),
+        'value': value,
+        'depth': t.max_depth,
+    }
+
+
+def _hgb_predictor_nodes(predictor):
+    nodes = predictor.nodes
+    if nodes['is_categorical'].any():
+        raise ValueError("Categorical splits are not supported by the compiled evaluator")
+    leaf = nodes['is_leaf'].astype(bool)
+    idx = np.arange(len(nodes))
+    return {
+        'feature': np.where(leaf, 0, nodes['feature_idx']).astype(np.int64),
+        'threshold': np.where(leaf, 0.0, nodes['num_threshold']),
+        'left': np.where(leaf, idx, nodes['left']).astype(np.int64),
+        'right': np.where(leaf, idx, nodes['right']).astype(np.int64),
+        'missing_left': nodes['missing_go_to_left'].astype(bool),
+        'value': nodes['value'].astype(np.float64)[:, None],
+        'depth': int(nodes['depth'].max()),
+    }
+
+
+def _estimator_trees(model, n_features: int):
+    """
+    Node arrays of a fitted estimator's trees, plus its kind, outputs per stage and baseline.
+    """
+    if isinstance(model, RandomForestClassifier):
+        trees = [_sklearn_tree_nodes(e, n_features, normalize=True) for e in model.estimators_]
+        return trees, _FOREST, None, np.zeros(0)
+    if isinstance(model, GradientBoostingClassifier):
+        trees = []
+        for stage in model.estimators_:
+            for est in stage:
+                nodes = _sklearn_tree_nodes(est, n_features, normalize=False)
+                # Same product predict_stages adds: learning_rate * leaf value
+                nodes['value'] = model.learning_rate * nodes['value']
+                trees.append(nodes)
+        # The init estimator's raw prediction is the same constant for every row
+        init = model._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))
+        return trees, _BOOSTED, model.estimators_.shape[1], init[0].astype(np.float64)
+    if isinstance(model, HistGradientBoostingClassifier):
+        trees = [_hgb_predictor_nodes(p) for iteration in model._predictors for p in iteration]
+        return trees, _HIST_BOOSTED, model.n_trees_per_iteration_, np.asarray(model._baseline_prediction, dtype=np.float64).ravel()
+    raise ValueError(f"Cannot export {type(model).__name__}")
+
+
+def export_ensemble(models: Dict[int, object], n_features: int) -> CompiledEnsemble:
+    """
+    Flattens fitted {horizon: estimator} models (RandomForest, GradientBoosting
+    or HistGradientBoosting classifiers, or a MultiHorizonClassifier shared by
+    several horizons) into a CompiledEnsemble. A shared model's trees are
+    exported once and evaluated once per call for all its horizons.
+    """
+    if not models:
+        # Nothing trained yet: an ensemble that predicts no horizons, like SymbolModel.predict
+        empty_int, empty_float = np.zeros(0, dtype=np.int32), np.zeros(0)
+        return CompiledEnsemble({
+            'feature': empty_int, 'threshold': empty_float, 'left': empty_int, 'right': empty_int,
+            'missing_left': np.zeros(0, dtype=bool), 'value': np.zeros((0, 1)), 'roots': empty_int,
+            'depth': 0, 'n_features': n_features, 'models': np.zeros((0, 7), dtype=np.int64),
+            'classes': np.zeros((0, 0), dtype=np.int64), 'baseline': np.zeros((0, 0)),
+        })
+
+    trees, rows, baselines, classes = [], [], [], []
+    exported = [] # (model, first tree, tree count, kind, outputs per stage, baseline)
+    for h, model in sorted(models.items()):
+        entry = next((e for e in exported if e[0] is model), None)
+        if entry is None:
+            estimator = model.estimator if isinstance(model, MultiHorizonClassifier) else model
+            new_trees, kind, k_out, baseline = _estimator_trees(estimator, n_features)
+            entry = (model, len(trees), len(new_trees), kind, k_out, baseline)
+            exported.append(entry)
+            trees += new_trees
+        _, first, count, kind, k_out, baseline = entry
+
+        col = 0
+        if isinstance(model, MultiHorizonClassifier):
+            k = model.horizons.index(h)
+            if kind == _FOREST:
+                # Native multi-output forest: this horizon's class fractions
+                labels = model.classes_[k]
+                col = k * model.estimator.estimators_[0].tree_.value.shape[2]
+            else:
+                # Joint classes: this horizon's label for each joint outcome
+                labels = model.joint_[:, k]
+        else:
+            labels = model.classes_
+        rows.append((h, kind, first, count, len(labels) if kind == _FOREST else k_out, len(labels), col))
+        baselines.append(baseline)
+        classes.append(np.asarray(labels))
+
+    sizes = np.array([len(t['feature']) for t in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    width = max(t['value'].shape[1] for t in trees)
+
+    def stack(name, shift=False):
+        return np.concatenate([t[name] + (o if shift else 0) for t, o in zip(trees, offsets)])
+
+    value = np.zeros((sizes.sum(), width))
+    for t, o in zip(trees, offsets):
+        value[o:o + len(t['value']), :t['value'].shape[1]] = t['value']
+
+    n_classes = max(len(c) for c in classes)
+    class_table = np.zeros((len(classes), n_classes), dtype=np.result_type(*classes))
+    for m, c in enumerate(classes):
+        class_table[m, :len(c)] = c
+    baseline_table = np.zeros((len(baselines), max(n_classes, 1)))
+    for m, b in enumerate(baselines):
+        baseline_table[m, :len(b)] = b
+
+    return CompiledEnsemble({
+        'feature': stack('feature').astype(np.int32),
+        'threshold': stack('threshold').astype(np.float64),
+        'left': stack('left', shift=True).astype(np.int32),
+        'right': stack('right', shift=True).astype(np.int32),
+        'missing_left': stack('missing_left'),
+        'value': value,
+        'roots': offsets.astype(np.int32),
+        'depth': max(t['depth'] for t in trees),
+        'n_features': n_features,
+        'models': np.array(rows, dtype=np.int64),
+        'classes': class_table,
+        'baseline': baseline_table,
+    })
@@ -0,0 +1,180 @@
+import json
+import math
+import os
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+import config
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import TimeSeriesSplit
+from threadpoolctl import threadpool_limits
+from data_loader import DataManager
+from feature_cache import FeatureCache
+from features import FEATURE_COLUMNS
+from models import SymbolModel, MODEL_TYPES, params_path
+from sweep import grid_configs, sample_configs
+
+# Symbol data shared read-only by every fit in a worker process (set by _init_worker)
+_SHARED = None
+
+
+def time_series_folds(n: int, n_folds: int, horizon: int) -> List[Tuple[int, int, int]]:
+    """
+    (train_end, test_start, test_end) row bounds of expanding-window folds.
+    The `horizon` rows before each test fold are left out: their labels look into it.
+    """
+    splitter = TimeSeriesSplit(n_splits=n_folds, gap=horizon)
+    return [(int(train[-1]) + 1, int(test[0]), int(test[-1]) + 1) for train, test in splitter.split(np.zeros(n))]
+
+
+def candidate_params(model_type: str, candidates: Optional[int], seed: int) -> List[Dict]:
+    """
+    The backend's defaults ({}) followed by `candidates` random draws from
+    config.TUNE_GRIDS (or the full grid if candidates is None), without repeats.
+    """
+    grid = config.TUNE_GRIDS[model_type]
+    configs = [{}] + (sample_configs(grid, candidates, seed) if candidates else grid_configs(grid))
+    return list({tuple(sorted(c.items())): c for c in configs}.values())
+
+
+def halving_budgets(n_candidates: int, factor: int) -> List[float]:
+    """
+    Share of each fold's training rows used per round: the last round uses all of
+    them, each earlier one 1/factor of the next. Rounds keep the best 1/factor
+    candidates, so the full-data fits are only paid for the last few.
+    """
+    rounds = max(1, math.ceil(math.log(max(n_candidates, 1), factor)))
+    return [factor ** (r - rounds + 1) for r in range(rounds)]
+
+
+def _init_worker(shared: dict, single_thread: bool):
+    global _SHARED
+    _SHARED = shared
+    if single_thread:
+        # Candidates already run one per core; stop histogram boosting from spawning a thread per core each
+        threadpool_limits(1)
+
+
+def _score_job(job: Tuple[int, Dict, int, float]) -> float:
+    """
+    Accuracy of one candidate on one fold, trained on the most recent `budget` share of the fold's rows.
+    """
+    h, params, fold, budget = job
+    X, y = _SHARED["X"], _SHARED["y"][h]
+    train_end, test_start, test_end = _SHARED["folds"][h][fold]
+    rows = max(min(train_end, config.TUNE_MIN_TRAIN_ROWS), int(train_end * budget))
+    sm = SymbolModel(_SHARED["symbol"], model_type=_SHARED["model_type"])
+    model = sm._fit(X.iloc[train_end - rows:train_end], y.iloc[train_end - rows:train_end], h, params)
+    return accuracy_score(y.iloc[test_start:test_end], model.predict(X.iloc[test_start:test_end]))
+
+
+def _map(pool, jobs: list) -> list:
+    if pool is None:
+        return [_score_job(job) for job in jobs]
+    return list(pool.map(_score_job, jobs))
+
+
+def tune_horizon(pool, h: int, candidates: List[Dict], n_folds: int, factor: int, label: str = "") -> List[Dict]:
+    """
+    Successive halving over `candidates` for one horizon. Each round scores the
+    surviving candidates on every fold in parallel and keeps the best 1/factor.
+    Returns the last round's rows (params, mean and per-fold accuracy), best first.
+    """
+    survivors = list(enumerate(candidates))
+    budgets = halving_budgets(len(candidates), factor)
+    for r, budget in enumerate(budgets):
+        start = time.perf_counter()
+        jobs = [(h, params, fold, budget) for _, params in survivors for fold in range(n_folds)]
+        scores = np.array(_map(pool, jobs)).reshape(len(survivors), n_folds)
+        # Ties keep the earlier candidate, so the defaults win unless something beats them
+        order = sorted(range(len(survivors)), key=lambda i: (-scores[i].mean(), survivors[i][0]))
+        results = [{"candidate": survivors[i][0], "params": survivors[i][1], "cv_accuracy": float(scores[i].mean()),
+                    "fold_accuracy": [float(s) for s in scores[i]]} for i in order]
+        print(f"{label} round {r + 1}/{len(budgets)}: {len(survivors)} candidates x {n_folds} folds "
+              f"on {budget:.0%} of rows, best {results[0]['cv_accuracy']:.4f} ({time.perf_counter() - start:.1f}s)")
+        if r < len(budgets) - 1:
+            survivors = [survivors[i] for i in order[:max(1, math.ceil(len(survivors) / factor))]]
+    return results
+
+
+def save_params(symbol: str, model_type: str, best: Dict[int, dict]):
+    """
+    Merges the best parameters per horizon into models/{symbol}_params.json,
+    which SymbolModel reads when it builds a model for `train`.
+    """
+    path = params_path(symbol)
+    saved = json.loads(path.read_text()) if path.exists() else {}
+    saved.setdefault(model_type, {}).update({str(h): entry for h, entry in best.items()})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{symbol}_params-")
+    with os.fdopen(fd, "w") as f:
+        json.dump(saved, f, indent=2)
+    os.replace(tmp_path, path)
+    print(f"Saved tuned parameters to {path}")
+
+
+def run_tuning(symbol: str, model_type: str = config.MODEL_TYPE, candidates: Optional[int] = config.TUNE_CANDIDATES,
+               n_folds: int = config.TUNE_FOLDS, factor: int = config.TUNE_HALVING_FACTOR,
+               workers: Optional[int] = None, seed: int = config.TUNE_SEED) -> pd.DataFrame:
+    """
+    Time-series cross-validated hyperparameter search for one symbol, per horizon.
+    Features and labels come from the feature cache once; each worker process
+    receives them once at startup and slices the folds from them, so no candidate
+    recomputes or re-sends data. The backend's current defaults are always a
+    candidate, and are kept unless another candidate scores higher.
+    Returns one row per (horizon, candidate) of the final round.
+    """
+    if model_type not in MODEL_TYPES:
+        raise ValueError(f"Unknown model type: {model_type}")
+    df = DataManager().fetch_data(symbol)
+    if df.empty:
+        print(f"Error: No data for {symbol}")
+        return pd.DataFrame()
+    df = FeatureCache().get(df).training_frame()
+    shared = {"symbol": symbol, "model_type": model_type, "X": df[FEATURE_COLUMNS],
+              "y": {h: df[f"target_{h}h"] for h in config.TARGET_HORIZONS},
+              "folds": {h: time_series_folds(len(df), n_folds, h) for h in config.TARGET_HORIZONS}}
+    params = candidate_params(model_type, candidates, seed)
+
+    workers = workers or os.cpu_count() or 1
+    print(f"Tuning {model_type} for {symbol}: {len(params)} candidates, {n_folds} folds, {len(df)} rows, {workers} workers")
+    start = time.perf_counter()
+    rows, best = [], {}
+    pool = None
+    if workers > 1:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared, True))
+    else:
+        _init_worker(shared, False)
+    try:
+        for h in config.TARGET_HORIZONS:
+            results = tune_horizon(pool, h, params, n_folds, factor, label=f"[{symbol} {h}h]")
+            default = next((r["cv_accuracy"] for r in results if r["candidate"] == 0), None)
+            best[h] = {"params": results[0]["params"], "cv_accuracy": results[0]["cv_accuracy"],
+                       "default_cv_accuracy": default, "candidates": len(params), "folds": n_folds,
+                       "tuned_at": datetime.now().isoformat(timespec="seconds")}
+            print(f"[{symbol} {h}h] best {results[0]['params'] or 'defaults'}: {results[0]['cv_accuracy']:.4f}")
+            rows += [{"horizon": h, "rank": rank + 1, **r} for rank, r in enumerate(results)]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    save_params(symbol, model_type, best)
+    print(f"Tuning for {symbol} finished in {time.perf_counter() - start:.1f}s")
+    return pd.DataFrame(rows)
+
+
+def run_tuning_all(symbols: List[str] = None, model_type: str = config.MODEL_TYPE, **kwargs) -> pd.DataFrame:
+    """
+    run_tuning for every symbol (default: config.SYMBOLS), one after another,
+    each using all workers.
+    """
+    reports = []
+    for symbol in symbols or config.SYMBOLS:
+        report = run_tuning(symbol, model_type, **kwargs)
+        if not report.empty:
+            reports.append(report.assign(symbol=symbol))
+    return pd.concat(reports, ignore_index=True) if reports else pd.DataFrame()
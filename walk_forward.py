@@ -0,0 +1,190 @@
+import time
+import warnings
+import numpy as np
+import pandas as pd
+import config
+from typing import List, Optional, Tuple
+from sklearn.ensemble import HistGradientBoostingClassifier
+from sklearn.metrics import accuracy_score
+from data_loader import DataManager
+from feature_cache import FeatureCache, bars_digest
+from features import FEATURE_COLUMNS, FEATURE_SCHEMA_VERSION
+from models import SymbolModel
+
+# Rebuild from scratch once warm starts have grown an ensemble past this multiple of its base size
+_MAX_GROWTH = 3
+
+
+def oos_path(symbol: str):
+    return config.DATA_DIR / "walk_forward" / f"{symbol}_oos.npz"
+
+
+def fold_bounds(n: int, train_bars: int, step: int) -> List[Tuple[int, int]]:
+    """
+    (test_start, test_end) row ranges: the first fold tests right after
+    `train_bars` rows, then every `step` rows until the data runs out.
+    """
+    return [(start, min(start + step, n)) for start in range(train_bars, n, step)]
+
+
+def _warm_startable(model) -> bool:
+    """
+    HistGradientBoosting refits its bin mapper on every fit(), so trees added by a
+    warm start would be fitted on residuals binned differently from the old trees.
+    """
+    return not isinstance(model, HistGradientBoostingClassifier)
+
+
+def _tree_count(model) -> int:
+    return model.n_iter_ if isinstance(model, HistGradientBoostingClassifier) else len(model.estimators_)
+
+
+def _grow(model, X: pd.DataFrame, y: pd.Series, added: int):
+    """
+    Warm start (random forest and gradient boosting only): keeps the fitted
+    trees and fits `added` more on (X, y).
+    """
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + added)
+    with warnings.catch_warnings():
+        # RandomForest(class_weight='balanced') warns that new trees see a different class balance
+        warnings.filterwarnings("ignore", message="class_weight presets")
+        model.fit(X, y)
+    return model
+
+
+def _drop_oldest_trees(model, keep: int):
+    """
+    Rolling window for random forests: trees are independent, so the ones
+    fitted on data that has left the window can simply be removed.
+    """
+    excess = len(model.estimators_) - keep
+    if excess > 0:
+        del model.estimators_[:excess]
+        model.n_estimators = len(model.estimators_)
+
+
+def run_walk_forward(symbol: str, model_type: str = config.MODEL_TYPE, window: str = config.WALK_FORWARD_WINDOW,
+                     train_bars: int = config.WALK_FORWARD_TRAIN_BARS, step: int = config.WALK_FORWARD_STEP_BARS) -> pd.DataFrame:
+    """
+    Walk-forward training: fit on the first `train_bars` rows, predict the next
+    `step` rows out of sample, move forward `step` rows and repeat.
+
+    window="expanding" keeps all past rows; "rolling" keeps the last `train_bars`.
+    After the first fold, estimators are warm-started: trees are added in
+    proportion to the new rows (base size * step / train_bars) and fitted on the
+    last `train_bars` rows only, so each retrain costs the same however long the
+    history gets. Ensembles that outgrow _MAX_GROWTH x their base size are rebuilt.
+    HistGradientBoosting ("hgb") cannot be warm-started on new rows (see
+    _warm_startable), so it is refit from scratch on every fold.
+
+    Training rows whose h-bar label would look into the test fold are purged.
+    Out-of-sample predictions are saved to data/walk_forward/{symbol}_oos.npz
+    (see load_oos_signals); the final models, updated through the last bar, are saved
+    as the symbol's models. Returns one row per (horizon, fold).
+    """
+    df = DataManager().fetch_data(symbol)
+    if df.empty:
+        print(f"Error: No data for {symbol}")
+        return pd.DataFrame()
+
+    fm = FeatureCache().get(df)
+    X_all = pd.DataFrame(fm.rows(), columns=FEATURE_COLUMNS)
+    n = len(X_all)
+    folds = fold_bounds(n, train_bars, step)
+    if not folds:
+        print(f"Not enough rows for walk-forward: {n} rows, {train_bars} needed for the first fold.")
+        return pd.DataFrame()
+
+    sm = SymbolModel(symbol, model_type=model_type)
+    sm.data_hash = bars_digest(df)
+    oos = np.zeros((n, len(fm.horizons)), dtype=np.int8)
+    has_oos = np.zeros(n, dtype=bool)
+    stats = []
+
+    print(f"Walk-forward ({window}) for {symbol}: {len(folds)} folds of {step} rows...")
+    for k, h in enumerate(fm.horizons):
+        y_all = pd.Series(fm.labels[:, k])
+        model = None
+        base_trees = added = None
+        for fold, (test_start, test_end) in enumerate(folds + [(n, n)]):
+            # Purge: a training row's label needs h future rows, all before test_start
+            train_end = test_start - h
+            train_start = 0 if window == "expanding" else max(0, train_end - train_bars)
+
+            start = time.perf_counter()
+            if (model is None or not _warm_startable(model)
+                    or _tree_count(model) + added > _MAX_GROWTH * base_trees):
+                model = sm._fit(X_all.iloc[train_start:train_end], y_all.iloc[train_start:train_end], h)
+                refit = "full"
+                if base_trees is None:
+                    # Trees per refit scale with the share of new rows
+                    base_trees = _tree_count(model)
+                    added = max(1, round(base_trees * step / train_bars))
+            else:
+                recent = slice(max(train_start, train_end - train_bars), train_end)
+                y_recent = y_all.iloc[recent]
+                if set(np.unique(y_recent)) != set(model.classes_):
+                    # A class is missing from the recent rows; warm start needs the same classes
+                    model = sm._fit(X_all.iloc[train_start:train_end], y_all.iloc[train_start:train_end], h)
+                    refit = "full"
+                else:
+                    model = _grow(model, X_all.iloc[recent], y_recent, added)
+                    if window == "rolling" and model_type == "rf":
+                        _drop_oldest_trees(model, base_trees)
+                    refit = "warm"
+            seconds = time.perf_counter() - start
+
+            if test_start >= n:
+                break # final update through the last labeled row, nothing left to test
+            preds = model.predict(X_all.iloc[test_start:test_end])
+            oos[test_start:test_end, k] = preds
+            has_oos[test_start:test_end] = True
+
+            labeled = min(test_end, n - h) # the last h rows have no label yet
+            acc = accuracy_score(y_all.iloc[test_start:labeled], preds[:labeled - test_start]) if labeled > test_start else np.nan
+            stats.append({"horizon": h, "fold": fold, "train_start": train_start, "train_end": train_end,
+                          "test_start": test_start, "test_end": test_end, "refit": refit,
+                          "trees": _tree_count(model), "seconds": seconds, "accuracy": acc})
+            print(f"[{symbol} {h}h] fold {fold}: {refit} refit on rows {train_start}-{train_end} "
+                  f"({seconds:.2f}s, {_tree_count(model)} trees), OOS accuracy {acc:.4f}")
+        sm.models[h] = model
+
+    sm.save()
+    _save_oos(symbol, fm.index[fm.valid], oos, has_oos, fm.horizons)
+    return pd.DataFrame(stats)
+
+
+def _save_oos(symbol: str, index: pd.DatetimeIndex, preds: np.ndarray, has_oos: np.ndarray, horizons: List[int]):
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    path = oos_path(symbol)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(path, ts=index.values.astype('datetime64[ns]').view('int64')[has_oos], preds=preds[has_oos],
+             horizons=np.array(horizons), schema_version=np.array(FEATURE_SCHEMA_VERSION))
+    print(f"Saved out-of-sample predictions to {path}")
+
+
+def load_oos_signals(symbol: str, index: pd.DatetimeIndex, horizon: int = 1) -> Optional[np.ndarray]:
+    """
+    Walk-forward predictions for `horizon` aligned to `index`; bars without an
+    out-of-sample prediction (e.g. the first training window) get 0 (no trade).
+    Returns None if no walk-forward run has been saved for the symbol.
+    """
+    path = oos_path(symbol)
+    if not path.exists():
+        return None
+    with np.load(path) as data:
+        if int(data['schema_version']) != FEATURE_SCHEMA_VERSION:
+            print(f"Walk-forward predictions in {path} use another feature schema; rerun walk-forward.")
+            return None
+        ts, horizons = data['ts'], list(data['horizons'])
+        if horizon not in horizons:
+            return None
+        preds = data['preds'][:, horizons.index(horizon)]
+
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    wanted = index.values.astype('datetime64[ns]').view('int64')
+    pos = np.clip(np.searchsorted(ts, wanted), 0, max(len(ts) - 1, 0))
+    found = (ts[pos] == wanted) if len(ts) else np.zeros(len(wanted), dtype=bool)
+    return np.where(found, preds[pos], 0).astype(np.int64)